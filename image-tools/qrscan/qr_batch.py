@@ -0,0 +1,434 @@
+"""
+QR碼批量解碼模塊
+輸入文件收集、單張處理與並行批量執行，不依賴GUI，供桌面工具與命令列共用
+"""
+import cv2
+import fnmatch
+import os
+import sys
+import glob
+import threading
+import time
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from qr_core import ImagePreprocessor, QRDecoder
+from qr_cache import DecodeCache
+from qr_documents import DEFAULT_DPI, is_document, iter_pages
+
+SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.pdf')
+
+
+def is_image_file(path):
+    """是否為支持的圖像格式 (含 PDF 與多頁 TIFF)"""
+    return path.lower().endswith(SUPPORTED_FORMATS)
+
+
+def _matches(rel_path, name, patterns):
+    """相對路徑或文件名是否匹配任一 glob 模式"""
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def scan_directory(root, recursive=True, include=None, exclude=None):
+    """
+    逐一產出目錄中的圖像路徑 (惰性遍歷)
+
+    使用 os.scandir 逐個目錄讀取, 文件類型取自目錄項本身, 不對每個文件額外 stat;
+    找到第一張圖像即可開始處理, 內存只與單個目錄的大小有關
+
+    Args:
+        root: 目錄
+        recursive: 是否包含子目錄
+        include: glob 模式列表, 指定時只產出匹配的文件 (匹配相對路徑或文件名, 如 '*.png', '2024*/*')
+        exclude: glob 模式列表, 匹配的文件被略過, 匹配的子目錄整個不進入 (如 '*_enhanced.png', 'thumbs')
+    """
+    include = include or []
+    exclude = exclude or []
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if recursive and not _matches(rel_path, entry.name, exclude):
+                    subdirs.append(rel_path)
+                continue
+            if not is_image_file(entry.name):
+                continue
+            if include and not _matches(rel_path, entry.name, include):
+                continue
+            if exclude and _matches(rel_path, entry.name, exclude):
+                continue
+            yield entry.path
+        # 逆序入棧, 子目錄按名稱順序處理
+        stack.extend(reversed(subdirs))
+
+
+def iter_input_files(inputs, recursive=False, stdin=None, include=None, exclude=None):
+    """
+    逐一產出輸入圖像路徑
+
+    inputs 中每一項可以是:
+    - 圖像文件路徑
+    - 目錄 (recursive=True 時包含子目錄)
+    - glob 模式, 如 'scans/**/*.png'
+    - '-' 表示從標準輸入讀取文件列表 (每行一個路徑)
+
+    include / exclude 為 glob 模式列表, 用於篩選目錄與 glob 中找到的文件 (見 scan_directory)
+    """
+    include = include or []
+    exclude = exclude or []
+    for item in inputs:
+        if item == '-':
+            for line in (stdin or sys.stdin):
+                path = line.strip()
+                if path:
+                    yield path
+        elif os.path.isdir(item):
+            yield from scan_directory(item, recursive=recursive, include=include, exclude=exclude)
+        elif glob.has_magic(item):
+            for path in glob.iglob(item, recursive=True):
+                name = os.path.basename(path)
+                if not is_image_file(name) or not os.path.isfile(path):
+                    continue
+                if include and not _matches(path, name, include):
+                    continue
+                if exclude and _matches(path, name, exclude):
+                    continue
+                yield path
+        else:
+            yield item
+
+
+def parse_roi(text):
+    """解析 'x,y,w,h' 格式的ROI"""
+    x, y, w, h = (int(v) for v in text.split(','))
+    if w <= 0 or h <= 0:
+        raise ValueError("ROI 寬高必須大於0")
+    return x, y, w, h
+
+
+def crop_roi(image, roi):
+    """按ROI裁剪圖像 (自動限制在圖像範圍內)"""
+    x, y, w, h = roi
+    height, width = image.shape[:2]
+    x = max(0, min(x, width - 1))
+    y = max(0, min(y, height - 1))
+    w = min(w, width - x)
+    h = min(h, height - y)
+    return image[y:y+h, x:x+w]
+
+
+def process_image_file(input_path, decoder, preprocessor, preprocess='smart', methods=None,
+                       roi=None, early_stop=True, output_dir=None, multi=False, decode_cache=None,
+                       dpi=DEFAULT_DPI, page_workers=1, retry_failed=False):
+    """
+    處理單張圖像文件 (PDF 與多頁 TIFF 逐頁處理)
+
+    Args:
+        input_path: 圖像路徑
+        decoder: QRDecoder
+        preprocessor: ImagePreprocessor
+        preprocess: 'smart' 智能預處理 / 'none' 直接解碼 / 'custom' 使用 methods
+        methods: 自訂預處理方法列表 (preprocess='custom' 時使用)
+        roi: (x, y, w, h) 解碼前先裁剪 (多頁文件對每頁裁剪)
+        early_stop: 解碼成功後立即停止
+        output_dir: 保存預處理後圖像的目錄 (None 則不保存)
+        multi: 多碼模式, 解碼圖像中的所有QR碼 (qr_codes 含每個碼的位置)
+        decode_cache: DecodeCache, 文件未變且選項相同時直接返回上次的結果 (不讀取圖像)
+        dpi: PDF 柵格化解析度
+        page_workers: 多頁文件並行柵格化的子進程數 (預設1, 在當前進程中依次柵格化; 大於1時每個PDF
+                      各自啟動子進程池, 只適合文件之間沒有並行時使用, 見 qr_documents.iter_pages)
+        retry_failed: 不使用緩存中 "未檢測到" 的結果, 重新解碼 (任務清單重試失敗文件時使用)
+
+    Returns:
+        結果字典 (欄位與GUI批量結果表格一致, 另含所有解碼內容);
+        多頁文件的 qr_codes 每項含頁碼 page, 並另有總頁數 pages
+    """
+    start_time = time.time()
+    filename = os.path.basename(input_path)
+    base_name = os.path.splitext(filename)[0]
+    document = is_document(input_path)
+
+    def enhanced_path(page=None):
+        if not output_dir:
+            return None
+        suffix = f"_p{page}" if page else ''
+        return os.path.join(output_dir, f"{base_name}{suffix}_enhanced.png")
+
+    cache_key = None
+    if decode_cache is not None:
+        cache_options = {
+            'preprocess': preprocess,
+            'methods': methods if preprocess == 'custom' else None,
+            'roi': roi,
+            'early_stop': early_stop,
+            'multi': multi,
+            'decoder': decoder.result_options(),
+        }
+        if document:
+            cache_options['dpi'] = dpi
+        try:
+            cache_key = decode_cache.make_key(input_path, cache_options)
+        except OSError:
+            cache_key = None
+        # 需要輸出預處理圖像而輸出文件不存在時, 仍須重新處理
+        first_output = enhanced_path(1 if document else None)
+        if cache_key and (not first_output or os.path.exists(first_output)):
+            cached = decode_cache.get(cache_key)
+            if cached is not None and (cached['success'] or not retry_failed):
+                return dict(cached, path=input_path, filename=filename,
+                            processing_time=time.time() - start_time, cached=True)
+
+    try:
+        if document:
+            pages = iter_pages(input_path, dpi=dpi, workers=page_workers)
+        else:
+            image = cv2.imread(input_path)
+            if image is None:
+                raise ValueError("無法讀取圖像")
+            pages = [(None, image)]
+
+        results = []
+        methods_used = []
+        page_count = 0
+        for page, image in pages:
+            page_count += 1
+            if roi:
+                image = crop_roi(image, roi)
+
+            if preprocess == 'smart':
+                processed, page_methods = preprocessor.smart_preprocess(image)
+            elif preprocess == 'custom' and methods:
+                processed = preprocessor.preprocess_pipeline(image, methods)
+                page_methods = list(methods)
+            else:
+                processed, page_methods = image, []
+            methods_used.extend(m for m in page_methods if m not in methods_used)
+
+            if output_dir:
+                cv2.imwrite(enhanced_path(page), processed)
+
+            page_results = decoder.decode_multi_strategy(processed, early_stop=early_stop, multi=multi)
+            if page is not None:
+                page_results = [dict(r, page=page) for r in page_results]
+            results.extend(page_results)
+
+        if results:
+            result = {
+                'path': input_path,
+                'filename': filename,
+                'success': True,
+                'status': '成功',
+                'data': results[0]['data'],
+                'engine': results[0]['engine'],
+                'processing_time': time.time() - start_time,
+                'preprocess_methods': methods_used,
+                'qr_codes': results
+            }
+        else:
+            result = {
+                'path': input_path,
+                'filename': filename,
+                'success': False,
+                'status': '失敗',
+                'data': '未檢測到QR碼',
+                'engine': '-',
+                'processing_time': time.time() - start_time,
+                'preprocess_methods': methods_used,
+                'qr_codes': []
+            }
+        if document:
+            result['pages'] = page_count
+
+    except Exception as e:
+        return {
+            'path': input_path,
+            'filename': filename,
+            'success': False,
+            'status': '錯誤',
+            'data': str(e),
+            'engine': '-',
+            'processing_time': time.time() - start_time,
+            'preprocess_methods': [],
+            'qr_codes': []
+        }
+
+    # 成功與 "未檢測到" 都緩存 (讀取錯誤不緩存, 下次重試)
+    if cache_key:
+        decode_cache.put(cache_key, result)
+    return result
+
+
+def run_batch(files, decoder=None, preprocessor=None, max_workers=4, backend='thread',
+              chunksize=4, decoder_options=None, cache_path=None, pool=None, max_in_flight=None,
+              **options):
+    """
+    並行批量處理, 按完成順序逐一產出結果
+
+    files 按需讀取, 已提交但未取回結果的文件數不超過 max_in_flight;
+    輸入可以是惰性遍歷的生成器, 百萬級文件的目錄也不會一次展開或一次提交
+
+    Args:
+        files: 圖像路徑的可迭代對象
+        decoder / preprocessor: 線程模式下所有線程共用的解碼器與預處理器
+                                (進程模式下每個子進程各自建立, 忽略此參數)
+        max_workers: 線程數或進程數
+        backend: 'thread' 線程池 / 'process' 進程池
+        chunksize: 進程模式下每次派發給子進程的文件數
+        decoder_options: 建立 QRDecoder 時的參數 (如 adaptive, stats_path)
+        cache_path: 持久化解碼緩存文件 (None 則不使用)
+        pool: 常駐的 WorkerPool (指定時使用進程模式並重複使用其中已預熱的子進程)
+        max_in_flight: 同時在處理中的文件數上限 (預設線程模式 max_workers*4, 進程模式 max_workers*chunksize*4)
+        **options: 傳給 process_image_file 的選項
+    """
+    decoder_options = decoder_options or {}
+    if pool is not None:
+        yield from pool.imap(files, chunksize=chunksize, cache_path=cache_path,
+                             max_in_flight=max_in_flight, **options)
+        return
+    if backend == 'process':
+        with WorkerPool(max_workers, decoder_options) as pool:
+            yield from pool.imap(files, chunksize=chunksize, cache_path=cache_path,
+                                 max_in_flight=max_in_flight, **options)
+        return
+
+    decoder = decoder or QRDecoder(**decoder_options)
+    preprocessor = preprocessor or ImagePreprocessor()
+    if cache_path:
+        options['decode_cache'] = DecodeCache(cache_path)
+    try:
+        limit = max_in_flight or max_workers * 4
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for path in files:
+                if len(pending) >= limit:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        yield future.result()
+                pending.add(executor.submit(process_image_file, path, decoder, preprocessor, **options))
+            for future in as_completed(pending):
+                yield future.result()
+    finally:
+        decoder.save_strategy_stats()
+
+
+# 進程池子進程狀態: 每個子進程一份解碼器/預處理器, 跨圖像、跨批次重用
+_worker_state = {}
+
+
+def _init_worker(decoder_options):
+    """子進程初始化: 建立該進程專屬的解碼器與預處理器, 並在背景預熱代價高的引擎"""
+    decoder = QRDecoder(**decoder_options)
+    decoder.warm_up(background=True)
+    _worker_state['decoder'] = decoder
+    _worker_state['preprocessor'] = ImagePreprocessor()
+    _worker_state['caches'] = {}
+    # 子進程正常退出時保存策略統計
+    multiprocessing.util.Finalize(None, decoder.save_strategy_stats, exitpriority=10)
+
+
+def _process_in_worker(task):
+    """在子進程中處理單張圖像"""
+    input_path, cache_path, options = task
+    if cache_path:
+        caches = _worker_state['caches']
+        if cache_path not in caches:
+            caches[cache_path] = DecodeCache(cache_path)
+        options = dict(options, decode_cache=caches[cache_path])
+    return process_image_file(
+        input_path,
+        _worker_state['decoder'],
+        _worker_state['preprocessor'],
+        **options
+    )
+
+
+class WorkerPool:
+    """
+    解碼進程池
+
+    pyzbar 與 NumPy/OpenCV 之間的轉換會持有GIL, 線程數增加後吞吐量停滯;
+    改用進程池, 文件以 chunksize 為單位派發, 結果經由進程池的結果隊列按完成順序流回。
+    使用 spawn 以避免在GUI或已有線程的進程中 fork。
+
+    子進程在啟動時建立解碼器並在背景預熱 pyzxing/QReader; 進程池可跨多次批量處理保留
+    (如GUI中), 後續批次直接使用已預熱的引擎。
+
+    用法:
+        with WorkerPool(8) as pool:
+            for result in pool.imap(files, output_dir='out'):
+                ...
+    """
+
+    def __init__(self, max_workers, decoder_options=None):
+        self.max_workers = max_workers
+        self.decoder_options = decoder_options or {}
+        ctx = multiprocessing.get_context('spawn')
+        self._pool = ctx.Pool(processes=max_workers, initializer=_init_worker,
+                              initargs=(self.decoder_options,))
+
+    def imap(self, files, chunksize=4, cache_path=None, max_in_flight=None, **options):
+        """
+        按完成順序產出結果
+
+        進程池的派發線程會盡快讀完整個輸入並全部放入任務隊列; 此處以信號量限制已派發但未取回的文件數,
+        輸入為惰性生成器時內存保持恆定
+        """
+        limit = max(max_in_flight or self.max_workers * chunksize * 4, chunksize)
+        slots = threading.Semaphore(limit)
+        cancelled = threading.Event()
+
+        def tasks():
+            for path in files:
+                slots.acquire()
+                if cancelled.is_set():
+                    return
+                yield (path, cache_path, options)
+
+        results = self._pool.imap_unordered(_process_in_worker, tasks(), chunksize=chunksize)
+        return self._drain(results, slots, cancelled)
+
+    @staticmethod
+    def _drain(results, slots, cancelled):
+        try:
+            for result in results:
+                slots.release()
+                yield result
+        finally:
+            # 提前停止取結果時讓派發線程退出, 不阻塞在信號量上
+            cancelled.set()
+            slots.release()
+
+    def matches(self, max_workers, decoder_options=None):
+        """是否可直接用於指定的並行數與解碼器參數"""
+        return max_workers == self.max_workers and (decoder_options or {}) == self.decoder_options
+
+    def close(self):
+        """正常關閉: 讓子進程自行退出 (觸發退出時的統計保存)"""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,355 @@
+"""
+QR碼解碼基準測試
+離線生成合成測試集 (多個QR版本, 受控的模糊、噪聲、透視、反色、低對比度與小模塊),
+對每個 (預處理策略, 引擎) 組合統計解碼率與耗時, 並測量 decode_multi_strategy 的整體表現;
+結果可保存為基準, 修改解碼器後與基準比較, 解碼率下降或明顯變慢時返回非零狀態
+
+範例:
+    python qr_benchmark.py                                  # 生成測試集並輸出矩陣
+    python qr_benchmark.py --save-corpus bench/ --save baseline.json
+    python qr_benchmark.py --corpus bench/ --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from qr_core import QRDecoder, STRATEGIES
+
+# 預設的QR版本 (模塊數 21 / 33 / 57 / 97)
+DEFAULT_VERSIONS = (1, 4, 10, 20)
+
+# 一般樣本的模塊邊長 (像素) 與 small_module 條件的模塊邊長
+MODULE_SIZE = 6
+SMALL_MODULE_SIZE = 2
+
+CORPUS_MANIFEST = 'corpus.json'
+
+
+def _render(data, version, module_size):
+    """生成QR碼並放在白紙上 (四周留白兩倍靜區), 返回 BGR 圖像"""
+    params = cv2.QRCodeEncoder.Params()
+    params.version = version
+    code = cv2.QRCodeEncoder.create(params).encode(data)
+    code = cv2.resize(code, None, fx=module_size, fy=module_size, interpolation=cv2.INTER_NEAREST)
+    margin = 4 * module_size
+    code = cv2.copyMakeBorder(code, margin, margin, margin, margin, cv2.BORDER_CONSTANT, value=255)
+    return cv2.cvtColor(code, cv2.COLOR_GRAY2BGR)
+
+
+def _blur(image, rng):
+    sigma = rng.uniform(1.2, 2.0) * MODULE_SIZE / 4
+    return cv2.GaussianBlur(image, (0, 0), sigma)
+
+
+def _noise(image, rng):
+    noisy = image.astype(np.float32) + rng.normal(0, 40, image.shape[:2])[..., None]
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def _perspective(image, rng):
+    """傾斜拍攝: 白紙 (含QR碼) 經透視變換後放在深色桌面上"""
+    h, w = image.shape[:2]
+    pad = max(h, w) // 3
+    canvas = (w + 2 * pad, h + 2 * pad)
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    jitter = rng.uniform(-0.18, 0.18, (4, 2)) * [w, h]
+    dst = np.float32(src + pad + jitter)
+    matrix = cv2.getPerspectiveTransform(src, dst)
+    return cv2.warpPerspective(image, matrix, canvas, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=(60, 55, 50))
+
+
+def _inverted(image, rng):
+    return 255 - image
+
+
+def _low_contrast(image, rng):
+    low = rng.uniform(90, 110)
+    return cv2.convertScaleAbs(image, alpha=50 / 255, beta=low)
+
+
+# 退化條件: 名稱 -> (模塊邊長, 處理函數)
+CONDITIONS = {
+    'clean': (MODULE_SIZE, None),
+    'blur': (MODULE_SIZE, _blur),
+    'noise': (MODULE_SIZE, _noise),
+    'perspective': (MODULE_SIZE, _perspective),
+    'inverted': (MODULE_SIZE, _inverted),
+    'low_contrast': (MODULE_SIZE, _low_contrast),
+    'small_module': (SMALL_MODULE_SIZE, None),
+}
+
+
+def generate_corpus(versions=DEFAULT_VERSIONS, conditions=None, samples=2, seed=0):
+    """
+    生成合成測試集 (同一 seed 每次生成相同的圖像)
+
+    Args:
+        versions: QR版本列表
+        conditions: 退化條件名稱列表 (None 則全部)
+        samples: 每個 (版本, 條件) 的樣本數
+        seed: 隨機種子
+
+    Returns:
+        樣本列表, 每項 {'name', 'condition', 'version', 'data', 'image'}
+    """
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for condition in conditions or CONDITIONS:
+        module_size, degrade = CONDITIONS[condition]
+        for version in versions:
+            for index in range(samples):
+                # 內容短到版本1也能容納, 較高版本由編碼器填充到指定版本
+                data = f"QRB-{len(corpus):05d}"
+                image = _render(data, version, module_size)
+                if degrade:
+                    image = degrade(image, rng)
+                corpus.append({
+                    'name': f"{condition}_v{version}_{index}",
+                    'condition': condition,
+                    'version': version,
+                    'data': data,
+                    'image': image,
+                })
+    return corpus
+
+
+def save_corpus(corpus, directory):
+    """保存測試集 (PNG 與清單), 作為固定的基準輸入"""
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    for sample in corpus:
+        filename = f"{sample['name']}.png"
+        cv2.imwrite(os.path.join(directory, filename), sample['image'])
+        manifest.append({key: sample[key] for key in ('name', 'condition', 'version', 'data')}
+                        | {'file': filename})
+    with open(os.path.join(directory, CORPUS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def load_corpus(directory):
+    """讀取 save_corpus 保存的測試集"""
+    with open(os.path.join(directory, CORPUS_MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    corpus = []
+    for entry in manifest:
+        image = cv2.imread(os.path.join(directory, entry['file']))
+        if image is None:
+            raise ValueError(f"無法讀取測試圖像: {entry['file']}")
+        corpus.append(dict(entry, image=image))
+    return corpus
+
+
+def strategy_name(methods):
+    """策略的顯示名稱"""
+    return '+'.join(methods) if methods else 'original'
+
+
+def _summarize(records, conditions):
+    """records: [(condition, 成功, 耗時ms)] -> 解碼率、各條件解碼率與耗時分位數"""
+    times = np.array([ms for _, _, ms in records]) if records else np.zeros(1)
+    summary = {
+        'rate': round(sum(ok for _, ok, _ in records) / max(len(records), 1), 4),
+        'median_ms': round(float(np.median(times)), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3),
+        'conditions': {},
+    }
+    for condition in conditions:
+        hits = [ok for c, ok, _ in records if c == condition]
+        if hits:
+            summary['conditions'][condition] = round(sum(hits) / len(hits), 4)
+    return summary
+
+
+def _matches(results, data):
+    return any(result.get('data') == data for result in results)
+
+
+def run_benchmark(corpus, strategies=STRATEGIES, engines=None, repeat=1, decoder=None, pipeline=True):
+    """
+    運行基準測試
+
+    每個組合的耗時包含計算該預處理版本的時間 (與 decode_multi_strategy 中單次嘗試的代價一致);
+    整體測試使用固定順序 (不受策略統計影響), 每次調用前清空結果緩存
+
+    Args:
+        corpus: generate_corpus / load_corpus 的樣本列表
+        strategies: 預處理策略列表
+        engines: 引擎列表 (None 則使用所有可用引擎)
+        repeat: 每個樣本重複次數 (耗時分位數與解碼率按所有次數計算)
+        decoder: QRDecoder (None 則建立不學習、不保存統計的解碼器)
+        pipeline: 是否同時測量 decode_multi_strategy 的整體表現
+
+    Returns:
+        報告字典 {'engines', 'conditions', 'samples', 'matrix': {'策略|引擎': 摘要}, 'pipeline': 摘要}
+    """
+    decoder = decoder or QRDecoder(adaptive=False, stats_path=None)
+    engines = engines or decoder.available_engines()
+    conditions = list(dict.fromkeys(sample['condition'] for sample in corpus))
+    preprocessor = decoder.preprocessor
+
+    matrix = {}
+    for methods in strategies:
+        records = {engine: [] for engine in engines}
+        for sample in corpus:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                variant = preprocessor.preprocess_pipeline(sample['image'], methods)
+                preprocess_ms = (time.perf_counter() - start) * 1000
+                for engine in engines:
+                    start = time.perf_counter()
+                    ok = _matches(decoder.engine_funcs[engine](variant), sample['data'])
+                    elapsed = preprocess_ms + (time.perf_counter() - start) * 1000
+                    records[engine].append((sample['condition'], ok, elapsed))
+        for engine in engines:
+            matrix[f"{strategy_name(methods)}|{engine}"] = _summarize(records[engine], conditions)
+
+    report = {'engines': engines, 'conditions': conditions, 'samples': len(corpus), 'matrix': matrix}
+
+    if pipeline:
+        records = []
+        for sample in corpus:
+            for _ in range(repeat):
+                with decoder._cache_lock:
+                    decoder.decode_cache.clear()
+                start = time.perf_counter()
+                results = decoder.decode_multi_strategy(sample['image'])
+                records.append((sample['condition'], _matches(results, sample['data']),
+                                (time.perf_counter() - start) * 1000))
+        report['pipeline'] = _summarize(records, conditions)
+    return report
+
+
+def compare_to_baseline(report, baseline, rate_tolerance=0.02, latency_tolerance=1.0, min_latency_ms=1.0):
+    """
+    與基準比較
+
+    Args:
+        rate_tolerance: 解碼率允許下降的幅度 (絕對值)
+        latency_tolerance: 中位耗時允許增加的比例 (不同機器間耗時只作參考, 預設較寬鬆)
+        min_latency_ms: 基準耗時低於此值的組合不比較耗時 (計時噪聲大)
+
+    Returns:
+        退步項目的說明列表 (空列表表示沒有退步)
+    """
+    regressions = []
+    entries = [(key, report['matrix'].get(key), old) for key, old in baseline.get('matrix', {}).items()]
+    if 'pipeline' in report and 'pipeline' in baseline:
+        entries.append(('decode_multi_strategy', report['pipeline'], baseline['pipeline']))
+
+    for key, new, old in entries:
+        if new is None:
+            continue
+        if new['rate'] < old['rate'] - rate_tolerance:
+            regressions.append(f"{key}: 解碼率 {old['rate']:.1%} -> {new['rate']:.1%}")
+        for condition, old_rate in old.get('conditions', {}).items():
+            new_rate = new['conditions'].get(condition)
+            if new_rate is not None and new_rate < old_rate - rate_tolerance:
+                regressions.append(f"{key} [{condition}]: 解碼率 {old_rate:.1%} -> {new_rate:.1%}")
+        if (old['median_ms'] >= min_latency_ms
+                and new['median_ms'] > old['median_ms'] * (1 + latency_tolerance)):
+            regressions.append(f"{key}: 中位耗時 {old['median_ms']:.2f}ms -> {new['median_ms']:.2f}ms")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    """矩陣報告文字: 每行一個組合, 各條件的解碼率與耗時 (有基準時附上解碼率變化)"""
+    conditions = report['conditions']
+    width = max([len(key) for key in report['matrix']] + [len('decode_multi_strategy'), 20])
+    header = f"{'策略|引擎':<{width}} {'解碼率':>7} " + ' '.join(f"{c[:12]:>12}" for c in conditions)
+    lines = [header + f" {'中位ms':>8} {'p95ms':>8}", '-' * (len(header) + 18)]
+
+    def row(key, summary, old):
+        cells = ' '.join(f"{summary['conditions'].get(c, 0):>12.0%}" for c in conditions)
+        line = f"{key:<{width}} {summary['rate']:>7.1%} {cells} {summary['median_ms']:>8.2f} {summary['p95_ms']:>8.2f}"
+        if old is not None:
+            line += f"  ({summary['rate'] - old['rate']:+.1%})"
+        return line
+
+    old_matrix = (baseline or {}).get('matrix', {})
+    for key, summary in report['matrix'].items():
+        lines.append(row(key, summary, old_matrix.get(key)))
+    if 'pipeline' in report:
+        lines.append('-' * (len(header) + 18))
+        lines.append(row('decode_multi_strategy', report['pipeline'], (baseline or {}).get('pipeline')))
+    return '\n'.join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="QR碼解碼基準測試 (策略 × 引擎的解碼率與耗時矩陣)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--corpus', metavar='DIR', help="使用已保存的測試集 (預設按 --seed 重新生成)")
+    parser.add_argument('--save-corpus', metavar='DIR', help="保存生成的測試集")
+    parser.add_argument('--versions', default=','.join(map(str, DEFAULT_VERSIONS)),
+                        help="QR版本, 逗號分隔 (預設 %(default)s)")
+    parser.add_argument('--conditions', help=f"退化條件, 逗號分隔 (預設全部: {','.join(CONDITIONS)})")
+    parser.add_argument('--samples', type=int, default=2, help="每個 (版本, 條件) 的樣本數 (預設2)")
+    parser.add_argument('--seed', type=int, default=0, help="隨機種子 (預設0)")
+    parser.add_argument('--engines', help="引擎, 逗號分隔 (預設所有可用引擎)")
+    parser.add_argument('--repeat', type=int, default=1, help="每個樣本重複次數 (預設1)")
+    parser.add_argument('--no-pipeline', action='store_true', help="不測量 decode_multi_strategy 的整體表現")
+    parser.add_argument('--save', metavar='FILE', help="保存報告 (JSON), 可作為之後比較的基準")
+    parser.add_argument('--baseline', metavar='FILE', help="與基準報告比較, 有退步時返回狀態1")
+    parser.add_argument('--rate-tolerance', type=float, default=0.02,
+                        help="解碼率允許下降的幅度 (預設0.02)")
+    parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                        help="中位耗時允許增加的比例 (預設1.0, 即慢一倍以內不算退步)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    conditions = [c.strip() for c in args.conditions.split(',') if c.strip()] if args.conditions else None
+    unknown = [c for c in conditions or [] if c not in CONDITIONS]
+    if unknown:
+        parser.error(f"未知的退化條件: {', '.join(unknown)}")
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        versions = [int(v) for v in args.versions.split(',') if v.strip()]
+        corpus = generate_corpus(versions, conditions, args.samples, args.seed)
+    if args.save_corpus:
+        save_corpus(corpus, args.save_corpus)
+
+    decoder = QRDecoder(adaptive=False, stats_path=None)
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()] if args.engines else None
+    missing = [e for e in engines or [] if e not in decoder.available_engines()]
+    if missing:
+        parser.error(f"引擎不可用: {', '.join(missing)}")
+
+    report = run_benchmark(corpus, engines=engines, repeat=args.repeat, decoder=decoder,
+                           pipeline=not args.no_pipeline)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.rate_tolerance, args.latency_tolerance)
+        if regressions:
+            print(f"\n與基準相比有 {len(regressions)} 項退步:", file=sys.stderr)
+            for item in regressions:
+                print(f"  {item}", file=sys.stderr)
+            return 1
+        print("\n與基準相比沒有退步", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+QR碼解碼緩存模塊
+- 文件指紋: 大小 + 修改時間 + 頭/中/尾取樣塊的哈希, 無需讀取整個文件
+- 持久化解碼緩存: 以文件指紋與解碼選項為鍵保存在 SQLite 中, 按字節預算做 LRU 淘汰,
+  重新掃描已處理過的目錄時直接返回結果
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 可選依賴: xxhash 比 hashlib 快數倍
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# 預設緩存位置
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.qrscan', 'decode_cache.sqlite')
+
+# 指紋取樣塊大小與塊數
+SAMPLE_BLOCK_SIZE = 64 * 1024
+SAMPLE_BLOCKS = 4
+
+
+def new_hasher():
+    """快速哈希對象 (有 xxhash 時使用 xxh64, 否則 blake2b)"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh64()
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_bytes(data):
+    """計算數據的快速哈希"""
+    hasher = new_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def file_fingerprint(path, block_size=SAMPLE_BLOCK_SIZE, blocks=SAMPLE_BLOCKS):
+    """
+    計算文件指紋
+
+    小文件讀取全部內容; 大文件只讀取均勻分佈的 blocks 個取樣塊 (含頭尾),
+    再加上文件大小與修改時間 (納秒), 讀取量與文件大小無關
+
+    Returns:
+        指紋字符串
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    hasher = new_hasher()
+    hasher.update(f"{size}:{stat.st_mtime_ns}".encode())
+
+    with open(path, 'rb') as f:
+        if size <= block_size * blocks:
+            hasher.update(f.read())
+        else:
+            step = (size - block_size) // (blocks - 1)
+            for i in range(blocks):
+                f.seek(i * step)
+                hasher.update(f.read(block_size))
+
+    return hasher.hexdigest()
+
+
+def options_key(options):
+    """影響解碼結果的選項 -> 緩存鍵的一部分"""
+    return json.dumps(options, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class DecodeCache:
+    """
+    持久化解碼緩存
+
+    用法:
+        cache = DecodeCache()
+        key = cache.make_key(path, {'preprocess': 'smart'})
+        result = cache.get(key)
+        if result is None:
+            result = ...
+            cache.put(key, result)
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite 文件路徑 (':memory:' 則只在內存中, 僅限單線程使用)
+            max_bytes: 緩存結果的總字節預算, 超過時淘汰最久未使用的記錄
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._puts_since_evict = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._init_db()
+
+    @property
+    def conn(self):
+        """每個線程一個連接 (SQLite 連接不可跨線程共用)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            if self.path != ':memory:':
+                # WAL 模式允許多個批量子進程同時讀寫
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS decode_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_decode_cache_access ON decode_cache (last_access)'
+            )
+
+    def make_key(self, path, options):
+        """文件指紋 + 解碼選項"""
+        return f"{file_fingerprint(path)}|{options_key(options)}"
+
+    def get(self, key):
+        """讀取緩存結果, 不存在時返回 None"""
+        row = self.conn.execute('SELECT result FROM decode_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute('UPDATE decode_cache SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """寫入結果, 並在超出字節預算時淘汰最久未使用的記錄"""
+        data = json.dumps(result, ensure_ascii=False)
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO decode_cache (key, result, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, data, len(data.encode('utf-8')), time.time())
+            )
+        # 每次寫入都統計總量代價較高, 每 64 次寫入檢查一次
+        with self._write_lock:
+            self._puts_since_evict += 1
+            if self._puts_since_evict < 64:
+                return
+            self._puts_since_evict = 0
+        self.evict()
+
+    def evict(self):
+        """按 LRU 淘汰直到總字節數不超過預算"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM decode_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        excess = total - self.max_bytes
+        rows = self.conn.execute('SELECT key, size FROM decode_cache ORDER BY last_access')
+        stale = []
+        for key, size in rows:
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self.conn:
+            self.conn.executemany('DELETE FROM decode_cache WHERE key = ?', stale)
+        removed = len(stale)
+        self.evictions += removed
+        return removed
+
+    def stats(self):
+        """命中/未命中/淘汰次數與當前記錄數"""
+        count, total = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM decode_cache'
+        ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': total,
+        }
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,198 @@
+"""
+QR碼批量解碼 - 命令列版
+無需圖形界面, 可在無顯示器的伺服器或管線中使用, 每張圖像輸出一行JSON (JSONL)
+
+範例:
+    python qr_cli.py scans/                        # 目錄
+    python qr_cli.py "scans/**/*.jpg" -o out.jsonl # glob
+    find /data -name "*.png" | python qr_cli.py -  # 從標準輸入讀取文件列表
+    python qr_cli.py delivery_notes/ --multi       # PDF/多頁TIFF 逐頁解碼, 結果含頁碼
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from qr_core import PIPELINE_STEPS, ImagePreprocessor, QRDecoder
+from qr_batch import iter_input_files, parse_roi, run_batch
+from qr_strategy import DEFAULT_STATS_PATH
+from qr_cache import DEFAULT_CACHE_PATH
+from qr_documents import DEFAULT_DPI
+from qr_jobs import JobManifest
+from qr_results import ResultWriter, check_export, convert_results, recorded_paths, skip_recorded
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="QR碼批量解碼 (命令列版, 輸出JSONL)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="圖像文件、目錄、glob模式, 或 '-' 從標準輸入讀取文件列表")
+    parser.add_argument('-o', '--output',
+                        help="結果輸出文件, .csv 寫表格欄位, 其餘寫JSONL; 每張處理完即追加 (預設輸出到標準輸出)")
+    parser.add_argument('--resume', action='store_true',
+                        help="續傳: 保留 -o 文件中已有的結果並略過其中已記錄的文件 (指定 --job 時改由任務清單決定)")
+    parser.add_argument('--job', metavar='FILE',
+                        help="任務清單 (SQLite), 記錄每個文件的狀態與指紋; 重新執行時只處理新增、已修改或失敗的文件")
+    parser.add_argument('--export', metavar='FILE',
+                        help="結束後將結果轉換為 CSV/Excel/Parquet (按副檔名 .csv/.xlsx/.parquet); "
+                             "指定 --job 時從任務清單導出, 每個文件一條")
+    parser.add_argument('-r', '--recursive', action='store_true', help="遞迴處理子目錄")
+    parser.add_argument('--include', metavar='GLOB', action='append', default=[],
+                        help="只處理匹配的文件 (匹配相對路徑或文件名, 可重複指定), 如 --include '*.png'")
+    parser.add_argument('--exclude', metavar='GLOB', action='append', default=[],
+                        help="略過匹配的文件與子目錄 (可重複指定), 如 --exclude thumbs --exclude '*_enhanced.png'")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 4,
+                        help="並行進程/線程數 (預設為CPU核心數)")
+    parser.add_argument('--backend', choices=['process', 'thread'], default='process',
+                        help="process: 進程池 (預設, 不受GIL限制) / thread: 線程池")
+    parser.add_argument('--chunksize', type=int, default=4, help="進程模式下每批派發的文件數 (預設4)")
+    parser.add_argument('--preprocess', choices=['smart', 'none'], default='smart',
+                        help="smart: 智能預處理 (預設) / none: 直接解碼原圖")
+    parser.add_argument('--methods',
+                        help=f"自訂預處理方法, 逗號分隔, 如 grayscale,denoise,binarize (覆蓋 --preprocess); "
+                             f"可用: {','.join(PIPELINE_STEPS)}")
+    parser.add_argument('--roi', type=parse_roi, help="解碼前裁剪區域 x,y,w,h")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help=f"PDF 柵格化解析度 (預設 {DEFAULT_DPI})")
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help="單個PDF並行柵格化的子進程數 (預設1; 文件之間已並行, 處理少量大型PDF時可調高)。"
+                             "進程池的子進程不能再建立子進程, 大於1時需要 --backend thread")
+    parser.add_argument('--multi', action='store_true',
+                        help="多碼模式: 解碼每張圖像中的所有QR碼並輸出位置 (如一頁多張標籤)")
+    parser.add_argument('--no-early-stop', action='store_true', help="嘗試所有策略, 不在首次成功後停止")
+    parser.add_argument('--no-localize', action='store_true',
+                        help="大圖不先定位QR碼區域, 直接整圖解碼")
+    parser.add_argument('--no-race', action='store_true',
+                        help="慢速引擎 (QReader 等) 不與快速引擎並行競速, 依次嘗試")
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help="按固定順序嘗試策略 (預設按學習到的成功率與耗時調整順序)")
+    parser.add_argument('--strategy-stats', metavar='FILE', default=DEFAULT_STATS_PATH,
+                        help=f"策略統計文件 (預設 {DEFAULT_STATS_PATH})")
+    parser.add_argument('--cache', metavar='FILE', default=DEFAULT_CACHE_PATH,
+                        help=f"持久化解碼緩存文件, 未變更的文件直接返回上次結果 (預設 {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="不使用持久化解碼緩存")
+    parser.add_argument('--save-processed', metavar='DIR', help="保存預處理後的圖像到指定目錄")
+    parser.add_argument('--stats', action='store_true', help="結束時在標準錯誤輸出吞吐量統計")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error("--resume 需要同時指定 -o 結果文件")
+    if args.export and not (args.output or args.job):
+        parser.error("--export 需要同時指定 -o 結果文件或 --job 任務清單")
+    if args.page_workers > 1 and args.backend == 'process':
+        parser.error("--page-workers 大於1時需要 --backend thread (進程池的子進程中只能依次柵格化)")
+    if args.export:
+        try:
+            check_export(args.export)
+        except (RuntimeError, ValueError) as e:
+            parser.error(str(e))
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()] if args.methods else None
+    if methods:
+        # 方法列表只驗證一次, 不在每個文件上各自報錯
+        try:
+            ImagePreprocessor().compile(methods)
+        except ValueError as e:
+            parser.error(str(e))
+
+    options = {
+        'preprocess': 'custom' if methods else args.preprocess,
+        'methods': methods,
+        'roi': args.roi,
+        'early_stop': not args.no_early_stop,
+        'multi': args.multi,
+        'output_dir': args.save_processed,
+        'dpi': args.dpi,
+        'page_workers': args.page_workers,
+        # 任務清單只重新排入未完成或上次失敗的文件, 這些文件不沿用緩存中的失敗結果
+        'retry_failed': bool(args.job),
+    }
+    decoder_options = {
+        'adaptive': not args.no_adaptive,
+        'stats_path': args.strategy_stats,
+        'localize': not args.no_localize,
+        'race': not args.no_race,
+    }
+    if args.save_processed:
+        os.makedirs(args.save_processed, exist_ok=True)
+
+    # 進程模式下解碼器在子進程中建立
+    preprocessor = decoder = None
+    if args.backend == 'thread':
+        preprocessor = ImagePreprocessor()
+        decoder = QRDecoder(**decoder_options)
+
+    files = iter_input_files(args.inputs, recursive=args.recursive,
+                             include=args.include, exclude=args.exclude)
+    if args.output:
+        # 指定任務清單時由清單決定略過哪些文件, -o 文件只追加
+        if args.resume and not args.job:
+            recorded = recorded_paths(args.output)
+            if recorded:
+                print(f"續傳: 略過已記錄的 {len(recorded)} 個文件", file=sys.stderr)
+            files = skip_recorded(files, recorded)
+        elif not args.resume and not args.job and os.path.exists(args.output):
+            os.remove(args.output)
+        writer = ResultWriter(args.output)
+    else:
+        writer = None
+    job = None
+    if args.job:
+        job = JobManifest(args.job)
+        files = job.plan(files)
+    total = succeeded = cached = 0
+    start_time = time.time()
+
+    try:
+        for result in run_batch(files, decoder, preprocessor, max_workers=args.workers,
+                                backend=args.backend, chunksize=args.chunksize,
+                                decoder_options=decoder_options,
+                                cache_path=None if args.no_cache else args.cache, **options):
+            if writer is not None:
+                writer.write(result)
+            else:
+                sys.stdout.write(json.dumps(result, ensure_ascii=False) + '\n')
+                sys.stdout.flush()
+            if job is not None:
+                job.record(result)
+            total += 1
+            succeeded += result['success']
+            cached += result.get('cached', False)
+    except KeyboardInterrupt:
+        print("已中斷", file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+        if job is not None:
+            job.close()
+
+    if args.export:
+        if job is not None:
+            with JobManifest(args.job) as manifest:
+                rows = convert_results(manifest.iter_results(), args.export)
+        else:
+            rows = convert_results(args.output, args.export)
+        print(f"已導出 {rows} 條結果到 {args.export}", file=sys.stderr)
+
+    if args.stats:
+        elapsed = time.time() - start_time
+        rate = total / elapsed if elapsed > 0 else 0
+        print(f"處理 {total} 張, 成功 {succeeded}, 失敗 {total - succeeded}, "
+              f"耗時 {elapsed:.2f}秒, {rate:.2f} 張/秒", file=sys.stderr)
+        if job is not None:
+            print(f"任務清單: 略過已完成且未修改的 {job.skipped} 個文件", file=sys.stderr)
+        if not args.no_cache:
+            print(f"解碼緩存: 命中 {cached} / 未命中 {total - cached}", file=sys.stderr)
+
+    return 0 if total or args.resume or args.job else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1559 @@
+"""
+QR碼解碼核心模塊
+圖像預處理、多引擎解碼與緩存，不依賴任何GUI，可供桌面工具、命令列與其他程式共用
+"""
+import cv2
+import importlib.util
+import itertools
+import numpy as np
+import os
+import tempfile
+import threading
+import time
+from PIL import Image
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+
+from qr_strategy import StrategyScheduler, DEFAULT_STATS_PATH
+from qr_cache import new_hasher
+from qr_quality import measure_quality
+
+# 可選依賴
+# zxing-cpp: ZXing的C++實現, 直接讀取內存中的NumPy數組, 無需Java與臨時文件 (優先使用)
+try:
+    import zxingcpp
+    ZXINGCPP_AVAILABLE = True
+except ImportError:
+    ZXINGCPP_AVAILABLE = False
+
+# pyzxing (啟動JVM) 與 QReader (載入YOLO模型, 連帶載入torch) 初始化代價高,
+# 此處只檢查是否已安裝, 首次使用或預熱時才導入
+ZXING_AVAILABLE = importlib.util.find_spec('pyzxing') is not None
+QREADER_AVAILABLE = importlib.util.find_spec('qreader') is not None
+
+
+def _create_pyzxing():
+    from pyzxing import BarCodeReader
+    return BarCodeReader()
+
+
+def _create_qreader():
+    from qreader import QReader
+    return QReader()
+
+
+# 多策略解碼的預處理策略 (第一項為原圖直接解碼)
+STRATEGIES = [
+    (),
+    ('grayscale',),
+    ('grayscale', 'upscale'),
+    ('grayscale', 'denoise', 'binarize'),
+    ('grayscale', 'invert'),
+    ('grayscale', 'invert', 'binarize'),
+    ('grayscale', 'sharpen'),
+    ('grayscale', 'upscale', 'sharpen'),
+    ('grayscale', 'contrast'),
+    ('grayscale', 'brightness_adjust', 'contrast'),
+    ('grayscale', 'perspective'),
+    ('grayscale', 'perspective', 'binarize'),
+]
+
+# 視頻幀解碼策略: 連續幀中同一個碼會出現多次, 每幀只做代價最低的嘗試 (原圖, 抗運動模糊的銳化)
+FRAME_STRATEGIES = [
+    (),
+    ('grayscale', 'sharpen'),
+]
+
+
+def _quad(points):
+    """OpenCV 檢測結果的四角座標 -> [[x, y], ...] (可JSON序列化)"""
+    if points is None:
+        return None
+    return [[round(float(x), 1), round(float(y), 1)] for x, y in np.asarray(points).reshape(-1, 2)]
+
+
+def _bbox(points):
+    """四角座標 -> 外接矩形 (x, y, w, h)"""
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+
+
+def _overlap(a, b):
+    """兩個矩形的交集面積佔較小矩形面積的比例"""
+    if not a or not b:
+        return 0.0
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    smaller = min(a[2] * a[3], b[2] * b[3])
+    return ix * iy / smaller if smaller > 0 else 0.0
+
+
+def merge_by_position(merged, results, threshold=0.3):
+    """
+    按位置合併解碼結果
+    
+    - 位置重疊 (交集佔較小框的比例超過 threshold) 的結果視為同一個碼, 保留置信度較高者,
+      並在 engines 中記錄所有解出該碼的引擎
+    - 沒有位置的結果, 只在內容與已有結果都不同時加入
+    
+    Returns:
+        新的合併列表
+    """
+    merged = list(merged)
+    for result in results:
+        bbox = result.get('bbox')
+        match = None
+        for i, existing in enumerate(merged):
+            if bbox and existing.get('bbox'):
+                if _overlap(bbox, existing['bbox']) > threshold:
+                    match = i
+                    break
+            elif existing['data'] == result['data']:
+                match = i
+                break
+        
+        if match is None:
+            merged.append(dict(result, engines=[result['engine']]))
+            continue
+        
+        existing = merged[match]
+        engines = existing['engines'] + [e for e in [result['engine']] if e not in existing['engines']]
+        if result['confidence'] > existing['confidence'] or (bbox and not existing.get('bbox')):
+            merged[match] = dict(result, engines=engines)
+        else:
+            existing['engines'] = engines
+    return merged
+
+
+# 透視校正: 輸出圖像每個模塊的最少像素數, 四周保留的靜區模塊數, 搜索定位圖案時圖像長邊的上限
+PERSPECTIVE_MODULE_PIXELS = 5
+QUIET_ZONE_MODULES = 4
+PERSPECTIVE_SEARCH_SIDE = 1024
+
+
+def find_finder_patterns(gray, max_contours=20000, max_finders=400):
+    """
+    尋找QR碼定位圖案 (回字形三層嵌套輪廓)
+    
+    Returns:
+        [(中心x, 中心y, 外接框邊長, 外框輪廓), ...]; 輪廓或候選過多 (紋理/噪點) 時返回空列表
+    """
+    # 先輕度模糊並使用較高的閾值偏移, 避免紋理與噪點產生大量細碎輪廓
+    binary = cv2.adaptiveThreshold(cv2.GaussianBlur(gray, (3, 3), 0), 255,
+                                   cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 51, 15)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None or len(contours) > max_contours:
+        return []
+    hierarchy = hierarchy[0]
+    
+    finders = []
+    for i, (_, _, child, _) in enumerate(hierarchy):
+        if child < 0 or hierarchy[child][2] < 0:
+            continue
+        x, y, w, h = cv2.boundingRect(contours[i])
+        if w < 5 or h < 5 or not 0.5 < w / h < 2.0:
+            continue
+        inner_area = cv2.contourArea(contours[hierarchy[child][2]])
+        if inner_area <= 0 or not 2.0 < cv2.contourArea(contours[i]) / inner_area < 15:
+            continue
+        finders.append((x + w / 2, y + h / 2, max(w, h), contours[i]))
+        if len(finders) > max_finders:
+            return []
+    return finders
+
+
+def _finder_quad(finder):
+    """定位圖案外框的四個角 (近似四邊形失敗時使用最小外接矩形)"""
+    contour = finder[3]
+    quad = cv2.approxPolyDP(contour, 0.05 * cv2.arcLength(contour, True), True).reshape(-1, 2)
+    if len(quad) != 4:
+        quad = cv2.boxPoints(cv2.minAreaRect(contour))
+    return np.asarray(quad, dtype=np.float64)
+
+
+def _orient_finders(group):
+    """
+    三個定位圖案 -> (左上, 右上, 左下)
+    
+    從左上角指向另外兩個定位圖案的方向都與其外框的邊平行 (其餘兩角各有一個方向沿外框對角線);
+    透視較強時直角不一定是最大角, 按邊的方向判斷比按最長邊可靠。
+    圖像座標中 (右上-左上) × (左下-左上) 為正
+    """
+    def alignment(i):
+        corner = group[i]
+        quad = _finder_quad(corner)
+        edges = np.roll(quad, -1, axis=0) - quad
+        edges /= np.linalg.norm(edges, axis=1, keepdims=True) + 1e-9
+        score = 0.0
+        for other in (group[(i + 1) % 3], group[(i + 2) % 3]):
+            direction = np.subtract(other[:2], corner[:2])
+            direction /= np.linalg.norm(direction) + 1e-9
+            score += float(np.max(np.abs(edges @ direction)))
+        return score
+    
+    corner = max(range(3), key=alignment)
+    tl, a, b = group[corner], group[(corner + 1) % 3], group[(corner + 2) % 3]
+    u = np.subtract(a[:2], tl[:2])
+    v = np.subtract(b[:2], tl[:2])
+    if u[0] * v[1] - u[1] * v[0] < 0:
+        a, b = b, a
+    return tl, a, b
+
+
+def _skewed_finder_triple(finders, max_candidates=12):
+    """
+    透視較強時 (定位圖案大小相差一倍以上、不再構成等腰直角) 的寬鬆配對:
+    在少量候選中找直角頂點夾角最接近90度 (45-135度內) 的三個定位圖案
+    """
+    if not 3 <= len(finders) <= max_candidates:
+        return None
+    best, best_score = None, None
+    for triple in itertools.combinations(finders, 3):
+        sizes = [f[2] for f in triple]
+        if max(sizes) / min(sizes) > 3:
+            continue
+        tl, tr, bl = _orient_finders(triple)
+        u = np.subtract(tr[:2], tl[:2])
+        v = np.subtract(bl[:2], tl[:2])
+        lengths = np.linalg.norm(u), np.linalg.norm(v)
+        if min(lengths) < max(sizes) or max(lengths) / min(lengths) > 3:
+            continue
+        score = abs(float(np.dot(u, v)) / (lengths[0] * lengths[1]))
+        if score < np.cos(np.radians(45)) and (best_score is None or score < best_score):
+            best, best_score = triple, score
+    return best
+
+
+def _finder_corners(finder, u, v, origin):
+    """
+    定位圖案外框四角與其模塊網格座標的對應
+    
+    外框各角按相對中心在 (u, v) 方向上的正負對應到 origin 起 0 或 7 個模塊;
+    無法得到四個不同的角時只使用中心 (origin + 3.5)
+    """
+    cx, cy = finder[:2]
+    basis = np.linalg.inv(np.column_stack([u, v]))
+    src, dst = [], []
+    for point in _finder_quad(finder):
+        s, t = basis @ (point - (cx, cy))
+        src.append(point)
+        dst.append((origin[0] + (7 if s > 0 else 0), origin[1] + (7 if t > 0 else 0)))
+    if len(set(dst)) != 4:
+        return [(cx, cy)], [(origin[0] + 3.5, origin[1] + 3.5)]
+    return src, dst
+
+
+class ImageCache:
+    """
+    圖像緩存管理器
+    
+    - 以文件身份 (路徑、大小、修改時間、inode) 為鍵, 只需 stat, 不讀取文件內容
+    - 按字節預算做 LRU 淘汰 (OrderedDict, O(1)), 大圖不會把內存撐爆
+    - 記錄命中/未命中/淘汰次數
+    """
+    
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.cache = OrderedDict()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def get_key(image_path):
+        """文件身份 (文件被修改後鍵隨之改變)"""
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    
+    def get(self, image_path):
+        """從緩存獲取圖像 (緩存的圖像為共用對象, 調用方不應原地修改)"""
+        try:
+            key = self.get_key(image_path)
+        except OSError:
+            return None
+        with self._lock:
+            image = self.cache.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return image
+    
+    def put(self, image_path, image):
+        """將圖像放入緩存, 超出字節預算時淘汰最久未使用的圖像"""
+        try:
+            key = self.get_key(image_path)
+        except OSError:
+            return
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self.cache[key] = image
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+    
+    def load(self, image_path):
+        """讀取圖像 (優先使用緩存), 無法讀取時返回 None"""
+        image = self.get(image_path)
+        if image is None:
+            image = cv2.imread(image_path)
+            if image is not None:
+                self.put(image_path, image)
+        return image
+    
+    def stats(self):
+        """命中/未命中/淘汰次數與當前佔用"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.cache),
+                'bytes': self.current_bytes,
+            }
+    
+    def clear(self):
+        """清空緩存"""
+        with self._lock:
+            self.cache.clear()
+            self.current_bytes = 0
+
+
+class ImagePreprocessor:
+    """圖像預處理模塊 - 增強版"""
+    
+    def __init__(self):
+        self.debug_mode = True
+        self._pipelines = {}  # 方法列表 -> PreprocessPipeline
+        self._local = threading.local()  # 各線程的暫存緩衝區
+    
+    def assess_quality(self, image):
+        """
+        評估圖像質量
+        
+        指標由 qr_quality 在縮小圖與原解析度取樣塊上一次算出, 並按圖像對象記住,
+        智能預處理與GUI再次評估同一圖像時不重複計算
+        """
+        metrics = measure_quality(image)
+        laplacian_var = metrics['laplacian_var']
+        contrast = metrics['contrast']
+        brightness = metrics['brightness']
+        
+        # 評估等級
+        if laplacian_var < 50:
+            clarity = "嚴重模糊"
+            clarity_score = laplacian_var / 50 * 30
+        elif laplacian_var < 100:
+            clarity = "模糊"
+            clarity_score = 30 + (laplacian_var - 50) / 50 * 20
+        elif laplacian_var < 500:
+            clarity = "一般"
+            clarity_score = 50 + (laplacian_var - 100) / 400 * 30
+        else:
+            clarity = "清晰"
+            clarity_score = min(100, 80 + (laplacian_var - 500) / 500 * 20)
+        
+        return {
+            'clarity': clarity,
+            'clarity_score': round(clarity_score, 2),
+            'laplacian_var': round(laplacian_var, 2),
+            'contrast': round(contrast, 2),
+            'brightness': round(brightness, 2),
+            'noise': round(metrics['noise'], 2),
+            'recommendation': self._get_recommendation(laplacian_var, contrast, brightness)
+        }
+    
+    def _get_recommendation(self, laplacian_var, contrast, brightness):
+        """根據圖像質量給出處理建議"""
+        recommendations = []
+        
+        if laplacian_var < 100:
+            recommendations.append("建議重新拍攝或使用銳化處理")
+        
+        if contrast < 30:
+            recommendations.append("對比度過低,建議使用對比度增強")
+        
+        if brightness < 50:
+            recommendations.append("亮度過低,建議增加亮度")
+        elif brightness > 200:
+            recommendations.append("亮度過高,建議降低亮度")
+        
+        if not recommendations:
+            recommendations.append("圖像質量良好,可直接解碼")
+        
+        return " | ".join(recommendations)
+    
+    def smart_preprocess(self, image):
+        """智能預處理 - 根據圖像質量自動選擇最佳方法"""
+        quality = self.assess_quality(image)
+        methods = ['grayscale']
+        
+        # 根據質量評估選擇處理方法
+        if quality['laplacian_var'] < 100:
+            methods.extend(['denoise', 'sharpen', 'contrast'])
+        elif quality['laplacian_var'] < 500:
+            methods.extend(['denoise', 'binarize'])
+        
+        if quality['contrast'] < 30:
+            if 'contrast' not in methods:
+                methods.append('contrast')
+        
+        if quality['brightness'] < 50 or quality['brightness'] > 200:
+            methods.append('brightness_adjust')
+        
+        return self.preprocess_pipeline(image, methods), methods
+    
+    def to_grayscale(self, image, dst=None):
+        """轉換為灰階圖像 (已是灰階時直接返回, 各步驟都不會原地修改輸入)"""
+        if len(image.shape) == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst)
+        return image
+    
+    def adaptive_binarization(self, image, block_size=11, C=2, dst=None):
+        """自適應二值化"""
+        binary = cv2.adaptiveThreshold(
+            image, 255, 
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+            cv2.THRESH_BINARY, 
+            block_size, C, dst=dst
+        )
+        return binary
+    
+    def otsu_binarization(self, image, dst=None, invert=False):
+        """Otsu自動閾值二值化 (invert=True 時等同先反色再二值化)"""
+        if invert:
+            low, high, _, _ = cv2.minMaxLoc(image)
+            if low == high:
+                # 單一灰階的圖像 Otsu 閾值為0, 反色後除全白外都大於閾值; 反向閾值得不到相同結果
+                binary = dst if dst is not None else np.empty_like(image)
+                binary[...] = 255 if high < 255 else 0
+                return binary
+        flags = cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY
+        _, binary = cv2.threshold(image, 0, 255, flags + cv2.THRESH_OTSU, dst=dst)
+        return binary
+    
+    def gaussian_denoise(self, image, kernel_size=(5, 5), dst=None):
+        """高斯濾波去噪"""
+        denoised = cv2.GaussianBlur(image, kernel_size, 0, dst=dst)
+        return denoised
+    
+    def median_denoise(self, image, kernel_size=5, dst=None):
+        """中值濾波去噪"""
+        denoised = cv2.medianBlur(image, kernel_size, dst=dst)
+        return denoised
+    
+    def sharpen_image(self, image, dst=None):
+        """圖像銳化"""
+        sharpened = cv2.filter2D(image, -1, SHARPEN_KERNEL, dst=dst)
+        return sharpened
+    
+    def enhance_contrast(self, image, alpha=1.5, beta=0, dst=None):
+        """增強對比度"""
+        enhanced = cv2.convertScaleAbs(image, alpha=alpha, beta=beta, dst=dst)
+        return enhanced
+    
+    @staticmethod
+    def _mean_brightness(image):
+        """平均亮度 (cv2.mean 一次遍歷, 彩色圖按灰階權重合成, 不生成灰階圖)"""
+        if len(image.shape) == 2:
+            return cv2.mean(image)[0]
+        b, g, r = cv2.mean(image)[:3]
+        return 0.114 * b + 0.587 * g + 0.299 * r
+    
+    def adjust_brightness(self, image, dst=None, alpha=1.0):
+        """
+        自動調整亮度 (平均亮度調到128)
+        
+        alpha 不為1時在同一次運算中再乘以對比度係數, 即 brightness_adjust + contrast 的融合;
+        融合時亮度偏移取整, 結果與分兩步 (中間結果取整並截斷到0-255) 完全相同
+        """
+        target_brightness = 128
+        adjustment = target_brightness - self._mean_brightness(image)
+        if alpha != 1.0:
+            adjustment = round(adjustment) * alpha
+        
+        adjusted = cv2.convertScaleAbs(image, alpha=alpha, beta=adjustment, dst=dst)
+        return adjusted
+    
+    def invert_image(self, image, dst=None):
+        """反轉圖像顏色 (處理黑底白碼)"""
+        return cv2.bitwise_not(image, dst=dst)
+    
+    def upscale_image(self, image, factor=2.0, dst=None):
+        """放大圖像 (處理過小的QR碼)"""
+        height, width = image.shape[:2]
+        new_size = (int(width * factor), int(height * factor))
+        return cv2.resize(image, new_size, dst=dst, interpolation=cv2.INTER_CUBIC)
+
+    def perspective_correction(self, image, dst=None):
+        """
+        透視校正: 由QR碼本身求單應矩陣, 只把碼所在區域校正為正視圖 (而非畫面中最大的輪廓, 那常是紙張邊緣)
+        
+        1. 找到三個定位圖案時, 各定位圖案外框四角對應到模塊網格座標 (版本由定位圖案間距估計),
+           輸出按模塊網格對齊 (每模塊為整數像素, 至少 PERSPECTIVE_MODULE_PIXELS)、含靜區的正方形圖像
+        2. 否則使用 OpenCV 檢測器找到的四角座標
+        3. 都找不到時返回輸入本身
+        
+        輸出尺寸取決於內容, dst 不使用
+        """
+        gray = self.to_grayscale(image)
+        scale = min(1.0, PERSPECTIVE_SEARCH_SIDE / max(gray.shape[:2]))
+        small = gray if scale == 1.0 else cv2.resize(gray, None, fx=scale, fy=scale,
+                                                       interpolation=cv2.INTER_AREA)
+        try:
+            corrected = self._rectify_by_finders(image, small, scale)
+            if corrected is None:
+                corrected = self._rectify_by_detector(image, small, scale)
+        except (cv2.error, np.linalg.LinAlgError):
+            corrected = None
+        return image if corrected is None else corrected
+    
+    def _rectify_by_finders(self, image, small, scale):
+        """以三個定位圖案校正; 找不到時返回 None"""
+        finders = find_finder_patterns(small)
+        groups = [g for g in QRLocator._group_finders(finders) if len(g) == 3]
+        # 多個碼時校正最大的一個
+        group = max(groups, key=lambda g: sum(f[2] for f in g)) if groups else _skewed_finder_triple(finders)
+        if group is None:
+            return None
+        tl, tr, bl = _orient_finders(group)
+        
+        # 版本估計: 定位圖案外框為 7x7 模塊, 左上與右上/左下中心相距 (模塊數 - 7) 個模塊
+        module = np.mean([np.sqrt(cv2.contourArea(f[3])) for f in (tl, tr, bl)]) / 7
+        if module <= 0:
+            return None
+        u = np.subtract(tr[:2], tl[:2])
+        v = np.subtract(bl[:2], tl[:2])
+        span = (np.linalg.norm(u) + np.linalg.norm(v)) / 2 / module + 7
+        version = int(np.clip(round((span - 17) / 4), 1, 40))
+        modules = 17 + 4 * version
+        
+        src, dst = [], []
+        for finder, origin in ((tl, (0, 0)), (tr, (modules - 7, 0)), (bl, (0, modules - 7))):
+            finder_src, finder_dst = _finder_corners(finder, u, v, origin)
+            src.extend(finder_src)
+            dst.extend(finder_dst)
+        
+        # 每模塊像素數取原圖中的模塊大小 (取整, 避免重採樣使模塊邊界落在像素中間), 限制在 1-2 倍預設值之間
+        pixels = int(np.clip(round(module / scale), PERSPECTIVE_MODULE_PIXELS, 2 * PERSPECTIVE_MODULE_PIXELS))
+        src = np.float32(src) / scale
+        dst = (np.float32(dst) + QUIET_ZONE_MODULES) * pixels
+        side = (modules + 2 * QUIET_ZONE_MODULES) * pixels
+        if len(src) >= 4:
+            matrix, _ = cv2.findHomography(src, dst)
+            if matrix is None:
+                return None
+            return self._warp(image, matrix, side, side)
+        # 三個定位圖案都只有中心時按仿射變換校正
+        matrix = cv2.getAffineTransform(src, dst)
+        return cv2.warpAffine(image, matrix, (side, side), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+    
+    def _rectify_by_detector(self, image, small, scale):
+        """以 OpenCV 檢測器找到的四角 (左上、右上、右下、左下) 校正; 找不到時返回 None"""
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            # QRCodeDetector 不跨線程共用
+            detector = self._local.detector = cv2.QRCodeDetector()
+        found, points = detector.detect(small)
+        if not found or points is None:
+            return None
+        quad = np.float32(points).reshape(4, 2) / scale
+        side = int(max(np.linalg.norm(quad - np.roll(quad, 1, axis=0), axis=1)))
+        if side < 21:
+            return None
+        margin = side // 8
+        target = np.float32([[0, 0], [side, 0], [side, side], [0, side]]) + margin
+        matrix = cv2.getPerspectiveTransform(quad, target)
+        return self._warp(image, matrix, side + 2 * margin, side + 2 * margin)
+    
+    @staticmethod
+    def _warp(image, matrix, width, height):
+        # 超出原圖的部分 (靜區) 填白色
+        return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+
+    def compile(self, methods):
+        """
+        編譯預處理方法列表 (驗證一次並融合可合併的步驟), 相同列表的編譯結果被重複使用
+        
+        Raises:
+            ValueError: 含未知的方法
+        """
+        key = tuple(methods)
+        pipeline = self._pipelines.get(key)
+        if pipeline is None:
+            pipeline = self._pipelines[key] = PreprocessPipeline(self, key)
+        return pipeline
+    
+    def scratch(self, slot, shape):
+        """
+        本線程的暫存緩衝區 (流水線中間結果寫入其中, 形狀不變時重複使用)
+        
+        超過 MAX_SCRATCH_BYTES 的不保留, 返回 None (由 OpenCV 臨時分配)
+        """
+        if int(np.prod(shape)) > MAX_SCRATCH_BYTES:
+            return None
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(slot)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[slot] = np.empty(shape, np.uint8)
+        return buffer
+    
+    def apply_step(self, image, method):
+        """執行單個預處理步驟, 返回新圖像 (不修改輸入)"""
+        return self.compile((method,)).run(image)
+    
+    def preprocess_pipeline(self, image, methods):
+        """完整預處理流水線"""
+        return self.compile(methods).run(image)
+
+
+# 銳化卷積核
+SHARPEN_KERNEL = np.array([[-1, -1, -1],
+                           [-1, 9, -1],
+                           [-1, -1, -1]], dtype=np.float32)
+
+# 每個暫存緩衝區的大小上限 (位元組); 更大的中間結果 (如放大後的大圖) 不常駐內存
+MAX_SCRATCH_BYTES = 64 * 1024 * 1024
+
+
+def _same_shape(shape):
+    return shape
+
+
+def _gray_shape(shape):
+    # 已是灰階時 to_grayscale 直接返回輸入, 不需要緩衝區
+    return shape[:2] if len(shape) == 3 else None
+
+
+def _upscale_shape(shape):
+    return (int(shape[0] * 2.0), int(shape[1] * 2.0)) + tuple(shape[2:])
+
+
+# 預處理方法 -> (ImagePreprocessor 的方法名, 輸出形狀函數; None 表示輸出形狀取決於內容, 不使用緩衝區)
+PIPELINE_STEPS = {
+    'grayscale': ('to_grayscale', _gray_shape),
+    'denoise': ('gaussian_denoise', _same_shape),
+    'median_denoise': ('median_denoise', _same_shape),
+    'binarize': ('adaptive_binarization', _same_shape),
+    'otsu': ('otsu_binarization', _same_shape),
+    'sharpen': ('sharpen_image', _same_shape),
+    'contrast': ('enhance_contrast', _same_shape),
+    'brightness_adjust': ('adjust_brightness', _same_shape),
+    'perspective': ('perspective_correction', None),
+    'invert': ('invert_image', _same_shape),
+    'upscale': ('upscale_image', _upscale_shape),
+}
+
+
+class PreprocessPipeline:
+    """
+    編譯後的預處理流水線
+    
+    - 方法列表在編譯時驗證一次, 執行時不再逐步比對方法名
+    - 相鄰步驟融合為一次運算: brightness_adjust + contrast 為一次 convertScaleAbs,
+      invert + otsu 為反向閾值 (不生成反色圖); 融合後的結果與逐步執行逐像素相同。
+      invert + binarize 不融合: 自適應閾值對高斯均值取整, 反色後取整方向不同, 個別像素會有差異
+    - 中間結果以 dst= 寫入本線程的兩個暫存緩衝區 (交替使用), 只有最終結果另行分配,
+      因為最終結果會被 VariantTree 緩存或交給解碼引擎
+    """
+    
+    def __init__(self, preprocessor, methods):
+        unknown = [method for method in methods if method not in PIPELINE_STEPS]
+        if unknown:
+            raise ValueError(f"未知的預處理方法: {', '.join(unknown)}")
+        self.preprocessor = preprocessor
+        self.methods = tuple(methods)
+        self.steps = self._fuse(preprocessor, self.methods)
+    
+    @staticmethod
+    def _fuse(preprocessor, methods):
+        """方法列表 -> [(函數(image, dst), 輸出形狀函數)]"""
+        steps = []
+        i = 0
+        while i < len(methods):
+            method = methods[i]
+            following = methods[i + 1] if i + 1 < len(methods) else None
+            if method == 'brightness_adjust' and following == 'contrast':
+                steps.append((partial(preprocessor.adjust_brightness, alpha=1.5), _same_shape))
+                i += 2
+            elif method == 'invert' and following == 'otsu':
+                steps.append((partial(preprocessor.otsu_binarization, invert=True), _same_shape))
+                i += 2
+            else:
+                name, shape_func = PIPELINE_STEPS[method]
+                steps.append((getattr(preprocessor, name), shape_func))
+                i += 1
+        return steps
+    
+    def run(self, image):
+        """執行流水線, 返回新圖像 (不修改輸入; 空列表或無需處理時返回輸入本身)"""
+        current, current_slot = image, None
+        last = len(self.steps) - 1
+        for i, (func, shape_func) in enumerate(self.steps):
+            dst = slot = None
+            if i < last and shape_func:
+                shape = shape_func(current.shape)
+                if shape is not None:
+                    # 與當前輸入不同的緩衝區 (多數 OpenCV 濾波不支持原地處理)
+                    slot = 1 if current_slot == 0 else 0
+                    dst = self.preprocessor.scratch(slot, shape)
+            output = func(current, dst=dst)
+            if dst is not None and output is dst:
+                current_slot = slot
+            elif output is not current:
+                current_slot = None
+            current = output
+        if current_slot is not None:
+            # 最後一步直接返回了輸入 (如已是灰階), 結果不能留在暫存緩衝區中
+            current = current.copy()
+        return current
+
+
+class VariantTree:
+    """
+    預處理版本的前綴樹
+    
+    多個策略共享的前綴 (如 grayscale, grayscale+upscale) 只計算一次, 子版本在其結果上繼續處理;
+    給定嘗試計劃時, 某個前綴的所有後代都嘗試完畢後即釋放, 峰值內存只與樹的深度有關
+    """
+    
+    def __init__(self, preprocessor, image, plan=None):
+        """
+        Args:
+            preprocessor: ImagePreprocessor
+            image: 原圖 (樹根)
+            plan: 將要嘗試的策略序列 (可重複, 每次嘗試一項), 用於計算何時可釋放中間結果
+        """
+        self.preprocessor = preprocessor
+        self.nodes = {(): image}
+        self.remaining = {}
+        self._lock = threading.Lock()  # 引擎競速時多個線程共用同一棵樹
+        self._computing = {}  # 正在計算的版本 {key: threading.Event}
+        for methods in plan or []:
+            methods = tuple(methods)
+            for i in range(len(methods) + 1):
+                prefix = methods[:i]
+                self.remaining[prefix] = self.remaining.get(prefix, 0) + 1
+        self.computed = 0
+    
+    def get(self, methods):
+        """
+        取得某個預處理版本 (按需計算並緩存其前綴)
+        
+        只被此版本使用的中間前綴不單獨保存: 從最近的已緩存或仍被其他版本需要的前綴起,
+        其餘步驟編譯為一段流水線一次執行 (可融合步驟, 中間結果寫入暫存緩衝區);
+        沒有嘗試計劃時每個前綴都保存。
+        計算在鎖外進行, 不同版本可在多個線程中同時計算; 同一版本正在計算時等待其結果
+        """
+        key = tuple(methods)
+        while True:
+            with self._lock:
+                node = self.nodes.get(key)
+                if node is not None:
+                    return node
+                event = self._computing.get(key)
+                if event is None:
+                    event = self._computing[key] = threading.Event()
+                    start = len(key) - 1
+                    while start > 0 and key[:start] not in self.nodes and not self._shared(key[:start], key):
+                        start -= 1
+                    break
+            # 等待後重新檢查 (計算失敗或結果已被釋放時由本線程重新計算)
+            event.wait()
+        
+        try:
+            parent = self.get(key[:start])
+            node = self.preprocessor.compile(key[start:]).run(parent)
+            with self._lock:
+                self.nodes[key] = node
+                self.computed += 1
+            return node
+        finally:
+            with self._lock:
+                del self._computing[key]
+            event.set()
+    
+    def _shared(self, prefix, key):
+        """前綴除了經由 key 之外是否還會被嘗試 (本身是策略, 或有其他後代)"""
+        return not self.remaining or self.remaining.get(prefix, 0) > self.remaining.get(key, 0)
+    
+    def done(self, methods):
+        """標記一次對該版本的嘗試已完成, 釋放不再需要的中間結果"""
+        key = tuple(methods)
+        with self._lock:
+            for i in range(len(key) + 1):
+                prefix = key[:i]
+                if prefix not in self.remaining:
+                    continue
+                self.remaining[prefix] -= 1
+                if self.remaining[prefix] <= 0:
+                    self.nodes.pop(prefix, None)
+
+
+class QRLocator:
+    """
+    QR碼定位器
+    
+    在縮小的金字塔層上尋找候選QR碼區域 (三層嵌套輪廓的定位圖案 + OpenCV detect, 不解碼),
+    再映射回原圖並加上邊距; 之後的預處理與解碼只在原解析度的裁剪區域上進行
+    """
+    
+    def __init__(self, min_side=1600, levels=(1024, 2048), padding=0.15, max_contours=20000,
+                 max_finders=400):
+        """
+        Args:
+            min_side: 圖像長邊超過此值才進行定位 (小圖直接整圖解碼)
+            levels: 金字塔各層的長邊尺寸, 由小到大, 在較小層找不到時才嘗試較大層
+            padding: 裁剪區域相對於區域尺寸的邊距比例
+            max_contours: 輪廓數超過此值時視為紋理/噪點, 跳過定位圖案搜索
+            max_finders: 定位圖案候選數上限 (超過同樣視為紋理)
+        """
+        self.min_side = min_side
+        self.max_contours = max_contours
+        self.max_finders = max_finders
+        self.levels = levels
+        self.padding = padding
+        self.detector = cv2.QRCodeDetector()
+    
+    def should_locate(self, image):
+        return max(image.shape[:2]) > self.min_side
+    
+    def locate(self, image):
+        """
+        返回候選區域 [(x, y, w, h), ...] (原圖座標), 找不到時返回空列表
+        """
+        height, width = image.shape[:2]
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        
+        for level in self.levels:
+            scale = level / max(height, width)
+            if scale >= 1:
+                small, scale = gray, 1.0
+            else:
+                small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            
+            boxes = self._finder_boxes(small) + self._detector_boxes(small)
+            if boxes:
+                boxes = [self._to_full(box, scale, width, height) for box in boxes]
+                return self._merge(boxes)
+            if scale == 1.0:
+                break
+        return []
+    
+    def _finder_boxes(self, gray):
+        """由定位圖案 (回字形三層嵌套輪廓) 聚類出的QR碼區域"""
+        finders = find_finder_patterns(gray, self.max_contours, self.max_finders)
+        return [self._box(group) for group in self._group_finders(finders)]
+    
+    @staticmethod
+    def _group_finders(finders):
+        """
+        將定位圖案分組, 每組對應一個QR碼
+        
+        先找三個一組、構成等腰直角 (兩邊相等、斜邊約為邊長的√2倍) 的定位圖案;
+        剩餘的 (如一個定位圖案受損) 再按距離兩兩配對
+        """
+        def similar(a, b):
+            return max(a[2], b[2]) / min(a[2], b[2]) <= 1.5
+        
+        def dist(a, b):
+            return float(np.hypot(a[0] - b[0], a[1] - b[1]))
+        
+        used = set()
+        groups = []
+        triples = []
+        for i, corner in enumerate(finders):
+            # 只考慮距離不超過QR碼最大尺寸的最近鄰 (版本40為177模塊, 約25倍定位圖案尺寸)
+            neighbours = sorted(
+                (dist(corner, finders[j]), j) for j in range(len(finders))
+                if j != i and similar(corner, finders[j]) and dist(corner, finders[j]) < 25 * corner[2]
+            )[:6]
+            for a in range(len(neighbours)):
+                for b in range(a + 1, len(neighbours)):
+                    (da, ja), (db, jb) = neighbours[a], neighbours[b]
+                    if max(da, db) / min(da, db) > 1.3:
+                        continue
+                    hyp = dist(finders[ja], finders[jb])
+                    if abs(hyp / (((da + db) / 2) * np.sqrt(2)) - 1) > 0.2:
+                        continue
+                    triples.append((da + db, (i, ja, jb)))
+        
+        # 邊長小的優先 (避免跨越相鄰的碼), 每個定位圖案只屬於一組
+        for _, triple in sorted(triples):
+            if used.isdisjoint(triple):
+                used.update(triple)
+                groups.append([finders[k] for k in triple])
+        
+        rest = [i for i in range(len(finders)) if i not in used]
+        pairs = sorted(
+            (dist(finders[i], finders[j]), i, j)
+            for x, i in enumerate(rest) for j in rest[x + 1:]
+            if similar(finders[i], finders[j]) and dist(finders[i], finders[j]) < 12 * finders[i][2]
+        )
+        for _, i, j in pairs:
+            if i not in used and j not in used:
+                used.update((i, j))
+                groups.append([finders[i], finders[j]])
+        return groups
+    
+    @staticmethod
+    def _box(group):
+        """定位圖案中心 -> 包含整個碼的矩形"""
+        size = max(f[2] for f in group)
+        xs = [f[0] for f in group]
+        ys = [f[1] for f in group]
+        x0, y0 = min(xs) - size, min(ys) - size
+        x1, y1 = max(xs) + size, max(ys) + size
+        if len(group) == 2:
+            # 只有兩個定位圖案時無法確定第三個角, 向兩側擴展
+            span = max(x1 - x0, y1 - y0)
+            x0, y0, x1, y1 = x0 - span / 2, y0 - span / 2, x1 + span / 2, y1 + span / 2
+        return (x0, y0, x1 - x0, y1 - y0)
+    
+    def _detector_boxes(self, gray):
+        """OpenCV 檢測 (只定位, 不解碼)"""
+        try:
+            found, points = self.detector.detectMulti(gray)
+        except cv2.error:
+            return []
+        if not found or points is None:
+            return []
+        boxes = []
+        for quad in points:
+            x, y, w, h = cv2.boundingRect(quad.astype(np.float32))
+            boxes.append((x, y, w, h))
+        return boxes
+    
+    def _to_full(self, box, scale, width, height):
+        """縮小層座標 -> 原圖座標, 加邊距並限制在圖像範圍內"""
+        x, y, w, h = (v / scale for v in box)
+        pad = max(w, h) * self.padding + 8 / scale
+        x0 = int(max(0, x - pad))
+        y0 = int(max(0, y - pad))
+        x1 = int(min(width, x + w + pad))
+        y1 = int(min(height, y + h + pad))
+        return (x0, y0, x1 - x0, y1 - y0)
+    
+    @staticmethod
+    def _merge(boxes):
+        """合併重疊的區域"""
+        merged = []
+        for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+            x, y, w, h = box
+            for i, (mx, my, mw, mh) in enumerate(merged):
+                ix = max(0, min(x + w, mx + mw) - max(x, mx))
+                iy = max(0, min(y + h, my + mh) - max(y, my))
+                if ix * iy > 0.5 * min(w * h, mw * mh):
+                    nx, ny = min(x, mx), min(y, my)
+                    merged[i] = (nx, ny, max(x + w, mx + mw) - nx, max(y + h, my + mh) - ny)
+                    break
+            else:
+                merged.append(box)
+        return merged
+
+
+class QRDecoder:
+    """多引擎QR碼解碼器 - 增強版"""
+    
+    def __init__(self, adaptive=True, stats_path=DEFAULT_STATS_PATH, localize=True,
+                 max_cached_results=256, race=True, race_delay=0.05):
+        """
+        Args:
+            adaptive: 按學習到的成功率與耗時調整嘗試順序
+            stats_path: 策略統計文件 (None 則只在內存中學習)
+            localize: 大圖先定位QR碼區域, 只在裁剪區域上解碼
+            max_cached_results: 進程內結果緩存的條目上限 (LRU), 批量處理時內存不再無限增長
+            race: 早停模式下, 慢速引擎 (QReader, Java版ZXing) 與快速引擎並行競速
+            race_delay: 快速引擎嘗試超過此秒數仍未成功時才啟動慢速引擎
+        """
+        self.detection_engines = {}
+        self._engine_factories = {}
+        self._engine_lock = threading.Lock()
+        self.decode_cache = OrderedDict()
+        self.max_cached_results = max_cached_results
+        self._cache_lock = threading.Lock()
+        self.preprocessor = ImagePreprocessor()
+        self.scheduler = StrategyScheduler(stats_path) if adaptive else None
+        self.locator = QRLocator() if localize else None
+        self.race = race
+        self.race_delay = race_delay
+        self._race_executor = None
+        self.engine_funcs = {
+            'opencv': self.decode_with_opencv,
+            'pyzbar': self.decode_with_pyzbar,
+            'zxing': self.decode_with_zxing,
+            'qreader': self.decode_with_qreader,
+        }
+        # 競速中每個慢速引擎同時只有一條通道在執行
+        self._race_busy = {name: threading.Lock() for name in self.engine_funcs}
+        # 多碼模式: OpenCV改用 detectAndDecodeMulti, 其他引擎本身即返回所有結果
+        self.multi_engine_funcs = dict(self.engine_funcs, opencv=self.decode_with_opencv_multi)
+        self.initialize_engines()
+    
+    def initialize_engines(self):
+        """
+        初始化檢測引擎
+        
+        輕量引擎 (OpenCV, pyzbar, zxing-cpp) 立即建立;
+        pyzxing 與 QReader 只登記建立函數, 首次使用或 warm_up() 時才建立
+        """
+        # OpenCV QRCodeDetector
+        try:
+            self.detection_engines['opencv'] = cv2.QRCodeDetector()
+        except:
+            self.detection_engines['opencv'] = None
+        
+        # pyzbar
+        try:
+            from pyzbar import pyzbar
+            self.detection_engines['pyzbar'] = pyzbar
+        except:
+            self.detection_engines['pyzbar'] = None
+        
+        # ZXing (優先 zxing-cpp, 其次 pyzxing)
+        if ZXINGCPP_AVAILABLE:
+            self.detection_engines['zxing'] = zxingcpp
+        elif ZXING_AVAILABLE:
+            self._engine_factories['zxing'] = _create_pyzxing
+        
+        # QReader
+        if QREADER_AVAILABLE:
+            self._engine_factories['qreader'] = _create_qreader
+    
+    def get_engine(self, name):
+        """取得引擎實例 (延遲引擎在首次調用時建立, 建立失敗返回 None)"""
+        if name in self.detection_engines:
+            return self.detection_engines[name]
+        factory = self._engine_factories.get(name)
+        if factory is None:
+            return None
+        with self._engine_lock:
+            if name not in self.detection_engines:
+                try:
+                    self.detection_engines[name] = factory()
+                except Exception:
+                    self.detection_engines[name] = None
+        return self.detection_engines[name]
+    
+    def engine_available(self, name):
+        """引擎是否可用 (已安裝但尚未建立的延遲引擎視為可用)"""
+        if name in self.detection_engines:
+            return self.detection_engines[name] is not None
+        return name in self._engine_factories
+    
+    def warm_up(self, background=True):
+        """
+        預先建立延遲引擎
+        
+        Args:
+            background: 在背景線程中建立 (不阻塞調用方), 返回該線程; 無需預熱時返回 None
+        """
+        pending = [name for name in self._engine_factories if name not in self.detection_engines]
+        if not pending:
+            return None
+        
+        def build():
+            for name in pending:
+                self.get_engine(name)
+        
+        if not background:
+            build()
+            return None
+        thread = threading.Thread(target=build, name='qr-engine-warmup', daemon=True)
+        thread.start()
+        return thread
+    
+    def get_image_hash(self, image):
+        """計算圖像哈希用於緩存 (直接讀取數組緩衝區, 不複製整張圖像)"""
+        hasher = new_hasher()
+        hasher.update(f"{image.shape}{image.dtype}".encode())
+        hasher.update(np.ascontiguousarray(image).data)
+        return hasher.hexdigest()
+    
+    def decode_with_opencv(self, image):
+        """使用OpenCV檢測QR碼"""
+        results = []
+        detector = self.get_engine('opencv')
+        if detector:
+            try:
+                data, points, _ = detector.detectAndDecode(image)
+                if data:
+                    results.append({
+                        'engine': 'opencv',
+                        'data': data,
+                        'confidence': 1.0,
+                        'points': _quad(points)
+                    })
+            except:
+                pass
+        return results
+    
+    def decode_with_opencv_multi(self, image):
+        """使用OpenCV檢測圖像中的所有QR碼"""
+        results = []
+        detector = self.get_engine('opencv')
+        if detector:
+            try:
+                ok, decoded, points, _ = detector.detectAndDecodeMulti(image)
+                if ok:
+                    for data, quad in zip(decoded, points):
+                        if data:
+                            results.append({
+                                'engine': 'opencv',
+                                'data': data,
+                                'confidence': 1.0,
+                                'points': _quad(quad)
+                            })
+            except:
+                pass
+        return results
+    
+    def decode_with_pyzbar(self, image):
+        """使用pyzbar檢測QR碼"""
+        results = []
+        pyzbar = self.get_engine('pyzbar')
+        if pyzbar:
+            try:
+                if len(image.shape) == 2:
+                    pil_img = Image.fromarray(image)
+                else:
+                    pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                
+                barcodes = pyzbar.decode(pil_img)
+                for barcode in barcodes:
+                    if barcode.type == 'QRCODE':
+                        results.append({
+                            'engine': 'pyzbar',
+                            'data': barcode.data.decode('utf-8'),
+                            'confidence': 0.9,
+                            'points': [[p.x, p.y] for p in barcode.polygon] or None
+                        })
+            except:
+                pass
+        return results
+    
+    def decode_with_zxing(self, image):
+        """使用ZXing檢測QR碼"""
+        reader = self.get_engine('zxing')
+        if reader is None:
+            return []
+        try:
+            if ZXINGCPP_AVAILABLE and reader is zxingcpp:
+                decoded = self._zxingcpp_decode(image)
+            else:
+                decoded = self._pyzxing_decode(reader, image)
+        except:
+            return []
+        return [
+            {'engine': 'zxing', 'data': text, 'confidence': 0.85, 'points': points}
+            for text, points in decoded if text
+        ]
+    
+    def _zxingcpp_decode(self, image):
+        """zxing-cpp: 直接傳入內存中的灰度數組, 無編碼與文件讀寫"""
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        barcodes = zxingcpp.read_barcodes(
+            np.ascontiguousarray(image), formats=zxingcpp.BarcodeFormat.QRCode
+        )
+        decoded = []
+        for barcode in barcodes:
+            if barcode.valid:
+                pos = barcode.position
+                corners = (pos.top_left, pos.top_right, pos.bottom_right, pos.bottom_left)
+                decoded.append((barcode.text, [[p.x, p.y] for p in corners]))
+        return decoded
+    
+    def _pyzxing_decode(self, reader, image):
+        """
+        pyzxing: 需經由文件交給Java讀取
+        
+        每次調用使用獨立的臨時文件 (並行時互不覆蓋), 並寫成無壓縮的BMP以省去PNG編碼
+        """
+        fd, temp_path = tempfile.mkstemp(prefix='qr_zxing_', suffix='.bmp')
+        os.close(fd)
+        try:
+            cv2.imwrite(temp_path, image)
+            decoded = reader.decode(temp_path)
+        finally:
+            os.remove(temp_path)
+        
+        # pyzxing 依版本返回單個字典或字典列表, parsed 可能為 bytes
+        if isinstance(decoded, dict):
+            decoded = [decoded]
+        texts = []
+        for barcode in decoded or []:
+            parsed = barcode.get('parsed')
+            if isinstance(parsed, bytes):
+                parsed = parsed.decode('utf-8', errors='replace')
+            points = barcode.get('points')
+            texts.append((parsed, [list(map(float, p)) for p in points] if points else None))
+        return texts
+    
+    def decode_with_qreader(self, image):
+        """使用QReader檢測QR碼"""
+        results = []
+        reader = self.get_engine('qreader')
+        if reader:
+            try:
+                
+                # QReader需要RGB格式
+                if len(image.shape) == 2:
+                    rgb_image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+                else:
+                    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                
+                decoded, detections = reader.detect_and_decode(image=rgb_image, return_detections=True)
+                
+                if decoded:
+                    for data, detection in zip(decoded, detections):
+                        if data:
+                            x1, y1, x2, y2 = (float(v) for v in detection['bbox_xyxy'])
+                            results.append({
+                                'engine': 'qreader',
+                                'data': data,
+                                'confidence': 0.95,
+                                'points': [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+                            })
+            except:
+                pass
+        return results
+    
+    def decode_multi_strategy(self, image, early_stop=True, multi=False):
+        """
+        多策略解碼 - 優化版
+        
+        大圖先由定位器找出候選區域, 只在原解析度的裁剪區域上嘗試各策略,
+        區域內都無法解碼時才退回整圖;
+        早停模式下, (預處理策略, 引擎) 組合按調度器學到的 "預期每毫秒成功次數" 排序嘗試,
+        同一預處理結果在本次解碼內只計算一次;
+        非早停模式仍按固定順序嘗試全部組合
+        
+        multi=True 時解碼圖像中的所有QR碼 (見 decode_all)
+        
+        每個結果的 points 為QR碼四角在輸入圖像中的座標 (引擎無法提供或經透視校正時為 None)
+        """
+        # 檢查緩存
+        img_hash = self.get_image_hash(image)
+        cache_key = (img_hash, early_stop, multi)
+        with self._cache_lock:
+            cached = self.decode_cache.get(cache_key)
+            if cached is not None:
+                self.decode_cache.move_to_end(cache_key)
+        if cached is not None:
+            return cached
+        
+        if multi:
+            unique_results = self.decode_all(image, early_stop)
+        else:
+            results = []
+            if self.locator and self.locator.should_locate(image):
+                for region in self.locator.locate(image):
+                    results.extend(self._decode_region(image, region, early_stop))
+                    if early_stop and results:
+                        break
+            
+            if not results:
+                results = self._decode_strategies(image, early_stop)
+            unique_results = self._deduplicate_results(results)
+        
+        # 緩存結果
+        with self._cache_lock:
+            self.decode_cache[cache_key] = unique_results
+            while len(self.decode_cache) > self.max_cached_results:
+                self.decode_cache.popitem(last=False)
+        
+        return unique_results
+    
+    def decode_all(self, image, early_stop=True):
+        """
+        多碼模式: 一次解碼整張圖像中的所有QR碼 (如一頁多張的貨運標籤)
+        
+        - 各預處理版本上使用能返回多個結果的引擎, 跨引擎、跨版本按位置合併
+          (內容相同但位置不同的視為不同的碼)
+        - 早停模式下, 已解出的碼數達到定位器找到的區域數即停止
+        - 之後對尚未解出的定位區域逐一裁剪單獨解碼
+        
+        Returns:
+            按位置 (由上到下、由左到右) 排序的結果列表, 每個結果含 points 與 bbox
+        """
+        regions = self.locator.locate(image) if self.locator else []
+        expected = max(len(regions), 1)
+        engines = self.available_engines()
+        variants = VariantTree(self.preprocessor, image, [m for m in STRATEGIES for _ in engines])
+        
+        merged = []
+        for methods in STRATEGIES:
+            # 引擎按調度器的得分排序, 較快且常成功的引擎先嘗試
+            plan = [(methods, engine) for engine in engines]
+            if self.scheduler:
+                plan = self.scheduler.order(plan)
+            for _, engine in plan:
+                variant = variants.get(methods)
+                engine_results = self.multi_engine_funcs[engine](variant)
+                variants.done(methods)
+                merged = merge_by_position(
+                    merged, self._to_source_coords(engine_results, methods, variant, image)
+                )
+                if early_stop and len(merged) >= expected:
+                    break
+            if early_stop and len(merged) >= expected:
+                break
+        
+        for region in regions:
+            if any(_overlap(result.get('bbox'), region) > 0.3 for result in merged):
+                continue
+            merged = merge_by_position(merged, self._decode_region(image, region, early_stop))
+        
+        return sorted(merged, key=lambda r: (r['bbox'][1], r['bbox'][0]) if r.get('bbox') else (float('inf'), 0))
+    
+    def frame_engines(self):
+        """
+        視頻幀解碼使用的引擎: 有 zxing-cpp 時只用它 (720p幀約2-3ms, 且一次返回所有碼);
+        否則依次使用 pyzbar、OpenCV (OpenCV的多碼檢測每幀近100ms, 只作最後選擇)
+        """
+        available = self.available_engines()
+        if ZXINGCPP_AVAILABLE and 'zxing' in available:
+            return ['zxing']
+        return [engine for engine in ('pyzbar', 'opencv') if engine in available]
+    
+    def decode_frame(self, image, strategies=FRAME_STRATEGIES, engines=None):
+        """
+        解碼一個視頻幀中的所有QR碼
+        
+        與 decode_multi_strategy 不同: 不使用結果緩存 (連續幀各不相同, 哈希整幀只是浪費)、
+        不做大圖定位、不記錄策略統計, 只按少量策略嘗試快速引擎, 任一引擎解出即停止
+        
+        Args:
+            image: BGR或灰階幀
+            strategies: 預處理策略列表
+            engines: 引擎列表 (None 則使用 frame_engines())
+        
+        Returns:
+            按位置合併的結果列表 (含 points/bbox)
+        """
+        engines = engines or self.frame_engines()
+        variants = VariantTree(self.preprocessor, image, [methods for methods in strategies for _ in engines])
+        for methods in strategies:
+            for engine in engines:
+                variant = variants.get(methods)
+                results = self.multi_engine_funcs[engine](variant)
+                variants.done(methods)
+                if results:
+                    return merge_by_position([], self._to_source_coords(results, methods, variant, image))
+        return []
+    
+    def _decode_region(self, image, region, early_stop):
+        """在原圖的一個區域上解碼, 結果座標換算回原圖"""
+        x, y, w, h = region
+        results = self._decode_strategies(image[y:y+h, x:x+w], early_stop)
+        for result in results:
+            result['region'] = region
+            if result.get('points'):
+                result['points'] = [[px + x, py + y] for px, py in result['points']]
+                result['bbox'] = _bbox(result['points'])
+        return results
+    
+    @staticmethod
+    def _to_source_coords(results, methods, variant, image):
+        """
+        將預處理版本上的座標換算回輸入圖像座標
+        
+        放大等縮放按尺寸比例換算; 透視校正後的座標無法直接換算, 改為 None
+        """
+        if 'perspective' in methods:
+            for result in results:
+                result['points'] = None
+            return results
+        
+        sx = image.shape[1] / variant.shape[1]
+        sy = image.shape[0] / variant.shape[0]
+        for result in results:
+            if result.get('points'):
+                result['points'] = [[round(px * sx, 1), round(py * sy, 1)] for px, py in result['points']]
+                result['bbox'] = _bbox(result['points'])
+        return results
+    
+    def _decode_strategies(self, image, early_stop):
+        """在一張圖像 (或裁剪區域) 上按策略嘗試各引擎"""
+        engines = self.available_engines()
+        candidates = [(methods, engine) for methods in STRATEGIES for engine in engines]
+        if early_stop and self.scheduler:
+            candidates = self.scheduler.order(candidates)
+        variants = VariantTree(self.preprocessor, image, [methods for methods, _ in candidates])
+        
+        def attempt(methods, engine):
+            """嘗試一個組合並記錄統計 (耗時含首次計算該預處理版本的時間)"""
+            start = time.perf_counter()
+            variant = variants.get(methods)
+            engine_results = self.engine_funcs[engine](variant)
+            variants.done(methods)
+            if self.scheduler:
+                self.scheduler.record(methods, engine, bool(engine_results),
+                                      (time.perf_counter() - start) * 1000)
+            return self._to_source_coords(engine_results, methods, variant, image)
+        
+        results = []
+        if early_stop:
+            lanes = self._race_lanes(candidates) if self.race else None
+            if lanes:
+                results = self._race(*lanes, attempt)
+            else:
+                for methods, engine in candidates:
+                    results = attempt(methods, engine)
+                    if results:
+                        break
+        else:
+            # 直接解碼 - 嘗試所有引擎, 成功則不再嘗試預處理版本
+            for engine in engines:
+                results.extend(attempt((), engine))
+            if not results:
+                for methods in STRATEGIES[1:]:
+                    for engine in engines:
+                        results.extend(attempt(methods, engine))
+        return results
+    
+    def slow_engines(self):
+        """單次調用耗時遠高於其他引擎的引擎 (QReader神經網絡, 經JVM與臨時文件的pyzxing)"""
+        slow = {'qreader'}
+        if not ZXINGCPP_AVAILABLE:
+            slow.add('zxing')
+        return slow
+    
+    def _race_lanes(self, candidates):
+        """
+        將嘗試計劃分為競速通道: (快速引擎通道, [每個慢速引擎一條通道]), 各自保持原有順序
+        
+        沒有快速引擎或沒有可用的慢速引擎時返回 None
+        """
+        slow = self.slow_engines()
+        fast, slow_lanes = [], {}
+        for methods, engine in candidates:
+            if engine in slow:
+                slow_lanes.setdefault(engine, []).append((methods, engine))
+            else:
+                fast.append((methods, engine))
+        return (fast, list(slow_lanes.values())) if fast and slow_lanes else None
+    
+    def _race(self, fast, slow_lanes, attempt):
+        """
+        快速引擎通道在當前線程中依次嘗試, 超過 race_delay 秒仍未成功時慢速引擎通道才在背景線程中並行嘗試,
+        任一通道解碼成功即返回
+        
+        - 簡單圖像在延遲內由快速引擎解出, 不調用慢速引擎; 延遲在每次快速嘗試之間檢查
+        - 同一慢速引擎同時只有一條通道: 上一張圖像落敗的通道仍在執行其最後一次調用時不啟動新通道 (不排隊),
+          快速引擎全部失敗後才在當前線程中等待該引擎空閒並依次嘗試
+        - 其他通道在下一次嘗試前檢查到停止標記後退出 (正在執行的單次引擎調用無法中斷, 其結果被忽略)
+        """
+        if self._race_executor is None:
+            with self._engine_lock:
+                if self._race_executor is None:
+                    self._race_executor = ThreadPoolExecutor(
+                        max_workers=4, thread_name_prefix='qr-race'
+                    )
+        stop = threading.Event()
+        waiting = list(slow_lanes)
+        futures = []
+        
+        def run_lane(lane, busy):
+            try:
+                for methods, engine in lane:
+                    if stop.is_set():
+                        return []
+                    engine_results = attempt(methods, engine)
+                    if engine_results:
+                        return engine_results
+                return []
+            finally:
+                busy.release()
+        
+        def launch():
+            """啟動引擎空閒的慢速通道"""
+            for lane in list(waiting):
+                busy = self._race_busy[lane[0][1]]
+                if busy.acquire(blocking=False):
+                    waiting.remove(lane)
+                    futures.append(self._race_executor.submit(run_lane, lane, busy))
+        
+        def finished_results():
+            for future in futures:
+                if future.done() and future.result():
+                    return future.result()
+            return []
+        
+        start = time.perf_counter()
+        try:
+            for methods, engine in fast:
+                results = finished_results()
+                if results:
+                    return results
+                if waiting and time.perf_counter() - start >= self.race_delay:
+                    launch()
+                results = attempt(methods, engine)
+                if results:
+                    return results
+            
+            launch()
+            for lane in waiting:
+                busy = self._race_busy[lane[0][1]]
+                busy.acquire()
+                results = run_lane(lane, busy)
+                if results:
+                    return results
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results = future.result()
+                    if results:
+                        return results
+            return []
+        finally:
+            stop.set()
+    
+    def available_engines(self):
+        """已成功初始化的引擎名稱 (按預設優先順序)"""
+        return [name for name in self.engine_funcs if self.engine_available(name)]
+    
+    def result_options(self):
+        """
+        影響解碼結果的解碼器設定 (持久化緩存鍵的一部分)
+        
+        安裝新引擎 (如 QReader, zxing-cpp) 或改變定位/競速設定後, 不再沿用之前的結果
+        """
+        return {
+            'engines': self.available_engines(),
+            'adaptive': self.scheduler is not None,
+            'localize': self.locator is not None,
+            'race': self.race,
+        }
+    
+    def save_strategy_stats(self):
+        """保存策略統計到磁碟"""
+        if self.scheduler:
+            self.scheduler.save()
+    
+    def _deduplicate_results(self, results):
+        """去重結果"""
+        unique_results = []
+        seen_data = set()
+        for result in results:
+            if result['data'] not in seen_data:
+                unique_results.append(result)
+                seen_data.add(result['data'])
+        return unique_results
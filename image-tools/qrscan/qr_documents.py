@@ -0,0 +1,181 @@
+"""
+QR碼多頁文件輸入模塊
+逐頁讀取多頁 TIFF 與 PDF (掃描的送貨單等), 按指定 DPI 柵格化為灰階圖像並按頁碼順序產出;
+多頁文件在子進程中並行柵格化, 任一時刻只有少數幾頁在內存中
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+# 可選依賴: PDF 柵格化 (優先 pypdfium2, 其次 PyMuPDF)
+try:
+    import pypdfium2
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+PDF_AVAILABLE = PDFIUM_AVAILABLE or PYMUPDF_AVAILABLE
+
+DOCUMENT_FORMATS = ('.pdf', '.tif', '.tiff')
+
+# 預設柵格化解析度 (掃描件上的QR碼在 200 DPI 下模塊通常已有數個像素)
+DEFAULT_DPI = 200
+
+
+def is_document(path):
+    """
+    是否按多頁文件讀取: PDF, 以及多於一頁的 TIFF
+
+    單頁 TIFF 仍由 cv2.imread 讀取 (保留原有的色彩與位深處理)
+    """
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        return True
+    if not lower.endswith(DOCUMENT_FORMATS):
+        return False
+    try:
+        return page_count(path) > 1
+    except (OSError, ValueError):
+        return False
+
+
+def _is_pdf(path):
+    return path.lower().endswith('.pdf')
+
+
+def page_count(path):
+    """文件頁數"""
+    if _is_pdf(path):
+        if PDFIUM_AVAILABLE:
+            pdf = pypdfium2.PdfDocument(path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+        if PYMUPDF_AVAILABLE:
+            with fitz.open(path) as doc:
+                return doc.page_count
+        raise RuntimeError("讀取PDF需要安裝 pypdfium2 或 PyMuPDF")
+    with Image.open(path) as image:
+        return getattr(image, 'n_frames', 1)
+
+
+# 本進程中已打開的文件 {路徑: 文件對象}; 同一文件的連續頁不必重複打開與解析
+_open_documents = {}
+
+
+def _open(path):
+    document = _open_documents.get(path)
+    if document is None:
+        close_documents()
+        if not _is_pdf(path):
+            document = Image.open(path)
+        elif PDFIUM_AVAILABLE:
+            document = pypdfium2.PdfDocument(path)
+        elif PYMUPDF_AVAILABLE:
+            document = fitz.open(path)
+        else:
+            raise RuntimeError("讀取PDF需要安裝 pypdfium2 或 PyMuPDF")
+        _open_documents[path] = document
+    return document
+
+
+def close_documents():
+    """關閉本進程中已打開的文件"""
+    for document in _open_documents.values():
+        document.close()
+    _open_documents.clear()
+
+
+def render_page(path, index, dpi=DEFAULT_DPI):
+    """
+    柵格化一頁 (index 從 0 開始) 為灰階 uint8 數組
+
+    TIFF 頁保持原解析度 (dpi 只用於 PDF); 連續讀取 TIFF 的所有頁請用 iter_pages
+    """
+    document = _open(path)
+    if not _is_pdf(path):
+        document.seek(index)
+        frame = document if document.mode == 'L' else document.convert('L')
+        return np.array(frame)
+    if PDFIUM_AVAILABLE:
+        array = document[index].render(scale=dpi / 72, grayscale=True).to_numpy()
+        if array.ndim == 3:
+            array = array[..., 0]
+        # 位圖緩衝區屬於渲染庫, 需要複製
+        return np.array(array)
+    pixmap = document[index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    array = np.frombuffer(pixmap.samples, dtype=np.uint8)
+    return array.reshape(pixmap.height, pixmap.stride)[:, :pixmap.width].copy()
+
+
+def _iter_tiff_pages(path):
+    """單進程依次讀取 TIFF 各頁 (只打開一次文件)"""
+    with Image.open(path) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            gray = frame if frame.mode == 'L' else frame.convert('L')
+            yield index + 1, np.array(gray)
+
+
+def iter_pages(path, dpi=DEFAULT_DPI, workers=None, prefetch=None):
+    """
+    按頁碼順序逐頁產出 (頁碼, 灰階圖像)
+
+    Args:
+        path: PDF 或 TIFF 文件
+        dpi: PDF 柵格化解析度
+        workers: PDF 並行柵格化的子進程數 (預設為 min(CPU核心數, 4)); 1 則在當前進程中依次讀取。
+                 在進程池的子進程 (守護進程不能再建立子進程) 中自動改為依次讀取;
+                 TIFF 頁只需解壓, 總是在當前進程中依次讀取 (PIL 定位到第 n 頁需從頭解析頁目錄)
+        prefetch: 已提交但尚未產出的頁數上限 (預設 workers*2), 決定內存中最多同時存在的頁數
+
+    Yields:
+        (page, image): page 從 1 開始
+    """
+    if not _is_pdf(path):
+        yield from _iter_tiff_pages(path)
+        return
+
+    count = page_count(path)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 4)
+    workers = min(workers, count)
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    if workers <= 1:
+        try:
+            for index in range(count):
+                yield index + 1, render_page(path, index, dpi)
+        finally:
+            close_documents()
+        return
+
+    # 每個子進程各自打開文件 (PDF 渲染庫不支持跨線程共用同一文件)
+    prefetch = max(prefetch or workers * 2, workers)
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        pending = deque()
+        next_index = 0
+        page = 0
+        try:
+            while next_index < count or pending:
+                while next_index < count and len(pending) < prefetch:
+                    pending.append(executor.submit(render_page, path, next_index, dpi))
+                    next_index += 1
+                image = pending.popleft().result()
+                page += 1
+                yield page, image
+        finally:
+            for future in pending:
+                future.cancel()
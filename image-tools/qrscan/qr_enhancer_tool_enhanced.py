@@ -3,501 +3,28 @@ QR碼圖像增強工具 - 增強版
 整合圖像預處理、透視校正、多引擎解碼、批量處理和性能優化功能
 """
 import cv2
-import numpy as np
 import os
 from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import json
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
 import time
-from datetime import datetime
-import hashlib
-import webbrowser
 
-# 可選依賴
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+from qr_core import ImageCache, ImagePreprocessor, QRDecoder
+from qr_batch import WorkerPool, process_image_file, run_batch, scan_directory
+from qr_documents import close_documents, is_document, render_page
+from qr_jobs import JobManifest
+from qr_results import OPENPYXL_AVAILABLE, PYARROW_AVAILABLE, ResultWriter, convert_results
 
-try:
-    from pyzxing import BarCodeReader
-    ZXING_AVAILABLE = True
-except ImportError:
-    ZXING_AVAILABLE = False
+# 批量結果文件 (位於輸出目錄, 每處理完一張即追加一行)
+BATCH_RESULTS_FILE = 'batch_results.jsonl'
 
-try:
-    from qreader import QReader
-    QREADER_AVAILABLE = True
-except ImportError:
-    QREADER_AVAILABLE = False
+# 批量任務清單 (位於輸出目錄, 記錄每個文件的狀態與指紋, 用於續傳)
+BATCH_JOB_FILE = 'batch_job.sqlite'
 
-
-class ImageCache:
-    """圖像緩存管理器"""
-    
-    def __init__(self, max_size=50):
-        self.cache = {}
-        self.max_size = max_size
-        self.access_count = {}
-    
-    def get_hash(self, image_path):
-        """計算圖像文件的哈希值"""
-        with open(image_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
-    
-    def get(self, image_path):
-        """從緩存獲取圖像"""
-        img_hash = self.get_hash(image_path)
-        if img_hash in self.cache:
-            self.access_count[img_hash] = self.access_count.get(img_hash, 0) + 1
-            return self.cache[img_hash]
-        return None
-    
-    def put(self, image_path, image):
-        """將圖像放入緩存"""
-        if len(self.cache) >= self.max_size:
-            # 移除最少使用的圖像
-            least_used = min(self.access_count.items(), key=lambda x: x[1])[0]
-            del self.cache[least_used]
-            del self.access_count[least_used]
-        
-        img_hash = self.get_hash(image_path)
-        self.cache[img_hash] = image
-        self.access_count[img_hash] = 1
-    
-    def clear(self):
-        """清空緩存"""
-        self.cache.clear()
-        self.access_count.clear()
-
-
-class ImagePreprocessor:
-    """圖像預處理模塊 - 增強版"""
-    
-    def __init__(self):
-        self.debug_mode = True
-    
-    def assess_quality(self, image):
-        """評估圖像質量"""
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
-        
-        # 計算清晰度 (拉普拉斯方差)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        
-        # 計算對比度
-        contrast = gray.std()
-        
-        # 計算亮度
-        brightness = gray.mean()
-        
-        # 評估等級
-        if laplacian_var < 50:
-            clarity = "嚴重模糊"
-            clarity_score = laplacian_var / 50 * 30
-        elif laplacian_var < 100:
-            clarity = "模糊"
-            clarity_score = 30 + (laplacian_var - 50) / 50 * 20
-        elif laplacian_var < 500:
-            clarity = "一般"
-            clarity_score = 50 + (laplacian_var - 100) / 400 * 30
-        else:
-            clarity = "清晰"
-            clarity_score = min(100, 80 + (laplacian_var - 500) / 500 * 20)
-        
-        return {
-            'clarity': clarity,
-            'clarity_score': round(clarity_score, 2),
-            'laplacian_var': round(laplacian_var, 2),
-            'contrast': round(contrast, 2),
-            'brightness': round(brightness, 2),
-            'recommendation': self._get_recommendation(laplacian_var, contrast, brightness)
-        }
-    
-    def _get_recommendation(self, laplacian_var, contrast, brightness):
-        """根據圖像質量給出處理建議"""
-        recommendations = []
-        
-        if laplacian_var < 100:
-            recommendations.append("建議重新拍攝或使用銳化處理")
-        
-        if contrast < 30:
-            recommendations.append("對比度過低,建議使用對比度增強")
-        
-        if brightness < 50:
-            recommendations.append("亮度過低,建議增加亮度")
-        elif brightness > 200:
-            recommendations.append("亮度過高,建議降低亮度")
-        
-        if not recommendations:
-            recommendations.append("圖像質量良好,可直接解碼")
-        
-        return " | ".join(recommendations)
-    
-    def smart_preprocess(self, image):
-        """智能預處理 - 根據圖像質量自動選擇最佳方法"""
-        quality = self.assess_quality(image)
-        methods = ['grayscale']
-        
-        # 根據質量評估選擇處理方法
-        if quality['laplacian_var'] < 100:
-            methods.extend(['denoise', 'sharpen', 'contrast'])
-        elif quality['laplacian_var'] < 500:
-            methods.extend(['denoise', 'binarize'])
-        
-        if quality['contrast'] < 30:
-            if 'contrast' not in methods:
-                methods.append('contrast')
-        
-        if quality['brightness'] < 50 or quality['brightness'] > 200:
-            methods.append('brightness_adjust')
-        
-        return self.preprocess_pipeline(image, methods), methods
-    
-    def to_grayscale(self, image):
-        """轉換為灰階圖像"""
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
-        return gray
-    
-    def adaptive_binarization(self, image, block_size=11, C=2):
-        """自適應二值化"""
-        binary = cv2.adaptiveThreshold(
-            image, 255, 
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 
-            block_size, C
-        )
-        return binary
-    
-    def otsu_binarization(self, image):
-        """Otsu自動閾值二值化"""
-        _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        return binary
-    
-    def gaussian_denoise(self, image, kernel_size=(5, 5)):
-        """高斯濾波去噪"""
-        denoised = cv2.GaussianBlur(image, kernel_size, 0)
-        return denoised
-    
-    def median_denoise(self, image, kernel_size=5):
-        """中值濾波去噪"""
-        denoised = cv2.medianBlur(image, kernel_size)
-        return denoised
-    
-    def sharpen_image(self, image):
-        """圖像銳化"""
-        kernel = np.array([[-1,-1,-1], 
-                          [-1, 9,-1],
-                          [-1,-1,-1]])
-        sharpened = cv2.filter2D(image, -1, kernel)
-        return sharpened
-    
-    def enhance_contrast(self, image, alpha=1.5, beta=0):
-        """增強對比度"""
-        enhanced = cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
-        return enhanced
-    
-    def adjust_brightness(self, image):
-        """自動調整亮度"""
-        if len(image.shape) == 2:
-            mean_brightness = image.mean()
-        else:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            mean_brightness = gray.mean()
-        
-        target_brightness = 128
-        adjustment = target_brightness - mean_brightness
-        
-        adjusted = cv2.convertScaleAbs(image, alpha=1.0, beta=adjustment)
-        return adjusted
-    
-    def invert_image(self, image):
-        """反轉圖像顏色 (處理黑底白碼)"""
-        return cv2.bitwise_not(image)
-    
-    def upscale_image(self, image, factor=2.0):
-        """放大圖像 (處理過小的QR碼)"""
-        height, width = image.shape[:2]
-        new_size = (int(width * factor), int(height * factor))
-        return cv2.resize(image, new_size, interpolation=cv2.INTER_CUBIC)
-    
-    def perspective_correction(self, image):
-        """透視校正"""
-        try:
-            gray = self.to_grayscale(image)
-            _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-            
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                contour = max(contours, key=cv2.contourArea)
-                rect = cv2.minAreaRect(contour)
-                box = cv2.boxPoints(rect)
-                box = np.int0(box)
-                
-                width = int(rect[1][0])
-                height = int(rect[1][1])
-                
-                src_points = box.astype(np.float32)
-                dst_points = np.array([[0, 0], [width-1, 0], [width-1, height-1], [0, height-1]], np.float32)
-                
-                matrix = cv2.getPerspectiveTransform(src_points, dst_points)
-                corrected = cv2.warpPerspective(image, matrix, (width, height))
-                
-                return corrected
-            else:
-                return image
-        except:
-            return image
-    
-    def preprocess_pipeline(self, image, methods):
-        """完整預處理流水線"""
-        processed = image.copy()
-        
-        for method in methods:
-            if method == 'grayscale':
-                processed = self.to_grayscale(processed)
-            elif method == 'denoise':
-                processed = self.gaussian_denoise(processed)
-            elif method == 'median_denoise':
-                processed = self.median_denoise(processed)
-            elif method == 'binarize':
-                processed = self.adaptive_binarization(processed)
-            elif method == 'otsu':
-                processed = self.otsu_binarization(processed)
-            elif method == 'sharpen':
-                processed = self.sharpen_image(processed)
-            elif method == 'contrast':
-                processed = self.enhance_contrast(processed)
-            elif method == 'brightness_adjust':
-                processed = self.adjust_brightness(processed)
-            elif method == 'perspective':
-                processed = self.perspective_correction(processed)
-            elif method == 'invert':
-                processed = self.invert_image(processed)
-            elif method == 'upscale':
-                processed = self.upscale_image(processed)
-        
-        return processed
-
-
-class QRDecoder:
-    """多引擎QR碼解碼器 - 增強版"""
-    
-    def __init__(self):
-        self.detection_engines = {}
-        self.decode_cache = {}
-        self.initialize_engines()
-    
-    def initialize_engines(self):
-        """初始化所有可用的檢測引擎"""
-        # OpenCV QRCodeDetector
-        try:
-            self.detection_engines['opencv'] = cv2.QRCodeDetector()
-        except:
-            self.detection_engines['opencv'] = None
-        
-        # pyzbar
-        try:
-            from pyzbar import pyzbar
-            self.detection_engines['pyzbar'] = pyzbar
-        except:
-            self.detection_engines['pyzbar'] = None
-        
-        # ZXing
-        if ZXING_AVAILABLE:
-            try:
-                self.detection_engines['zxing'] = BarCodeReader()
-            except:
-                self.detection_engines['zxing'] = None
-        
-        # QReader
-        if QREADER_AVAILABLE:
-            try:
-                self.detection_engines['qreader'] = QReader()
-            except:
-                self.detection_engines['qreader'] = None
-    
-    def get_image_hash(self, image):
-        """計算圖像哈希用於緩存"""
-        return hashlib.md5(image.tobytes()).hexdigest()
-    
-    def decode_with_opencv(self, image):
-        """使用OpenCV檢測QR碼"""
-        results = []
-        if self.detection_engines['opencv']:
-            try:
-                detector = self.detection_engines['opencv']
-                data, points, _ = detector.detectAndDecode(image)
-                if data:
-                    results.append({
-                        'engine': 'opencv',
-                        'data': data,
-                        'confidence': 1.0
-                    })
-            except:
-                pass
-        return results
-    
-    def decode_with_pyzbar(self, image):
-        """使用pyzbar檢測QR碼"""
-        results = []
-        if self.detection_engines['pyzbar']:
-            try:
-                pyzbar = self.detection_engines['pyzbar']
-                if len(image.shape) == 2:
-                    pil_img = Image.fromarray(image)
-                else:
-                    pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-                
-                barcodes = pyzbar.decode(pil_img)
-                for barcode in barcodes:
-                    if barcode.type == 'QRCODE':
-                        results.append({
-                            'engine': 'pyzbar',
-                            'data': barcode.data.decode('utf-8'),
-                            'confidence': 0.9
-                        })
-            except:
-                pass
-        return results
-    
-    def decode_with_zxing(self, image):
-        """使用ZXing檢測QR碼"""
-        results = []
-        if self.detection_engines.get('zxing'):
-            try:
-                # 保存臨時文件
-                temp_path = 'temp_qr.png'
-                cv2.imwrite(temp_path, image)
-                
-                reader = self.detection_engines['zxing']
-                barcode = reader.decode(temp_path)
-                
-                if barcode and barcode.get('parsed'):
-                    results.append({
-                        'engine': 'zxing',
-                        'data': barcode['parsed'],
-                        'confidence': 0.85
-                    })
-                
-                # 刪除臨時文件
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except:
-                pass
-        return results
-    
-    def decode_with_qreader(self, image):
-        """使用QReader檢測QR碼"""
-        results = []
-        if self.detection_engines.get('qreader'):
-            try:
-                reader = self.detection_engines['qreader']
-                
-                # QReader需要RGB格式
-                if len(image.shape) == 2:
-                    rgb_image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-                else:
-                    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                
-                decoded = reader.detect_and_decode(image=rgb_image)
-                
-                if decoded:
-                    for data in decoded:
-                        if data:
-                            results.append({
-                                'engine': 'qreader',
-                                'data': data,
-                                'confidence': 0.95
-                            })
-            except:
-                pass
-        return results
-    
-    def decode_multi_strategy(self, image, early_stop=True):
-        """多策略解碼 - 優化版"""
-        # 檢查緩存
-        img_hash = self.get_image_hash(image)
-        if img_hash in self.decode_cache:
-            return self.decode_cache[img_hash]
-        
-        results = []
-        
-        # 直接解碼 - 嘗試所有引擎
-        engines = [
-            self.decode_with_opencv,
-            self.decode_with_pyzbar,
-            self.decode_with_zxing,
-            self.decode_with_qreader
-        ]
-        
-        for engine_func in engines:
-            engine_results = engine_func(image)
-            results.extend(engine_results)
-            
-            # 早停機制
-            if early_stop and results:
-                break
-        
-        # 如果直接解碼成功,返回結果
-        if results:
-            self.decode_cache[img_hash] = results
-            return self._deduplicate_results(results)
-        
-        # 嘗試不同預處理版本
-        preprocessor = ImagePreprocessor()
-        preprocess_methods = [
-            ['grayscale'],
-            ['grayscale', 'upscale'],
-            ['grayscale', 'denoise', 'binarize'],
-            ['grayscale', 'invert'],
-            ['grayscale', 'invert', 'binarize'],
-            ['grayscale', 'sharpen'],
-            ['grayscale', 'upscale', 'sharpen'],
-            ['grayscale', 'contrast'],
-            ['grayscale', 'brightness_adjust', 'contrast'],
-            ['grayscale', 'perspective'],
-            ['grayscale', 'perspective', 'binarize']
-        ]
-        
-        for methods in preprocess_methods:
-            processed = preprocessor.preprocess_pipeline(image, methods)
-            
-            for engine_func in engines:
-                engine_results = engine_func(processed)
-                results.extend(engine_results)
-                
-                # 早停機制
-                if early_stop and results:
-                    self.decode_cache[img_hash] = results
-                    return self._deduplicate_results(results)
-        
-        # 緩存結果
-        unique_results = self._deduplicate_results(results)
-        self.decode_cache[img_hash] = unique_results
-        
-        return unique_results
-    
-    def _deduplicate_results(self, results):
-        """去重結果"""
-        unique_results = []
-        seen_data = set()
-        for result in results:
-            if result['data'] not in seen_data:
-                unique_results.append(result)
-                seen_data.add(result['data'])
-        return unique_results
+# 結果表格最多保留的行數 (更早的行只保存在結果文件中)
+MAX_TREE_ROWS = 2000
 
 
 class QRCodeEnhancerGUI:
@@ -514,6 +41,10 @@ class QRCodeEnhancerGUI:
         self.preprocessor = ImagePreprocessor()
         self.decoder = QRDecoder()
         self.image_cache = ImageCache()
+        self.worker_pool = None
+        
+        # 在背景建立代價高的引擎 (pyzxing/QReader), 不阻塞界面啟動
+        self.decoder.warm_up(background=True)
         
         # 變量
         self.input_image_path = tk.StringVar()
@@ -529,10 +60,18 @@ class QRCodeEnhancerGUI:
         }
         self.use_smart_preprocess = tk.BooleanVar(value=True)
         self.early_stop = tk.BooleanVar(value=True)
-        self.max_workers = tk.IntVar(value=4)
-        
-        # 批量處理結果
-        self.batch_results = []
+        self.multi_code = tk.BooleanVar(value=False)
+        self.max_workers = tk.IntVar(value=os.cpu_count() or 4)
+        self.batch_backend = tk.StringVar(value='進程')
+        self.batch_resume = tk.BooleanVar(value=False)
+        self.batch_recursive = tk.BooleanVar(value=True)
+        self.batch_include = tk.StringVar()
+        self.batch_exclude = tk.StringVar(value='*_enhanced.png')
+        
+        # 批量處理結果: 流式寫入輸出目錄中的結果文件並記入任務清單, 內存中只保留計數
+        self.batch_results_path = None
+        self.batch_job_path = None
+        self.batch_counts = {'success': 0, 'failure': 0}
         
         # 檢查引擎狀態
         self.engine_status = self.check_engines()
@@ -546,10 +85,10 @@ class QRCodeEnhancerGUI:
     def check_engines(self):
         """檢查解碼引擎可用性"""
         status = {
-            'opencv': self.decoder.detection_engines.get('opencv') is not None,
-            'pyzbar': self.decoder.detection_engines.get('pyzbar') is not None,
-            'zxing': self.decoder.detection_engines.get('zxing') is not None,
-            'qreader': self.decoder.detection_engines.get('qreader') is not None
+            'opencv': self.decoder.engine_available('opencv'),
+            'pyzbar': self.decoder.engine_available('pyzbar'),
+            'zxing': self.decoder.engine_available('zxing'),
+            'qreader': self.decoder.engine_available('qreader')
         }
         return status
     
@@ -659,6 +198,8 @@ class QRCodeEnhancerGUI:
         
         ttk.Checkbutton(perf_frame, text="早停機制(解碼成功後立即停止)", 
                        variable=self.early_stop).grid(row=0, column=0, sticky=tk.W, padx=10, pady=5)
+        ttk.Checkbutton(perf_frame, text="多碼模式(解碼圖中所有QR碼,無需手動框選)", 
+                       variable=self.multi_code).grid(row=0, column=1, sticky=tk.W, padx=10, pady=5)
         
         # 圖像預覽
         image_frame = ttk.LabelFrame(parent, text="圖像預覽")
@@ -710,8 +251,23 @@ class QRCodeEnhancerGUI:
         ttk.Entry(file_frame, textvariable=self.output_dir, width=50).grid(row=1, column=1, padx=5, pady=5)
         ttk.Button(file_frame, text="瀏覽", command=self.browse_output_dir).grid(row=1, column=2, padx=5, pady=5)
         
-        ttk.Label(file_frame, text="並行線程數:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
-        ttk.Spinbox(file_frame, from_=1, to=16, textvariable=self.max_workers, width=10).grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(file_frame, text="並行數:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Spinbox(file_frame, from_=1, to=32, textvariable=self.max_workers, width=10).grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(file_frame, text="並行方式:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Combobox(file_frame, textvariable=self.batch_backend, values=['進程', '線程'],
+                     state='readonly', width=8).grid(row=3, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Checkbutton(file_frame, text="續傳 (只處理新增、已修改或上次失敗的文件)",
+                        variable=self.batch_resume).grid(row=4, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Checkbutton(file_frame, text="包含子目錄",
+                        variable=self.batch_recursive).grid(row=5, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(file_frame, text="只包含:").grid(row=6, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(file_frame, textvariable=self.batch_include, width=50).grid(row=6, column=1, padx=5, pady=5)
+        ttk.Label(file_frame, text="排除:").grid(row=7, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(file_frame, textvariable=self.batch_exclude, width=50).grid(row=7, column=1, padx=5, pady=5)
+        ttk.Label(file_frame, text="glob模式, 以分號分隔").grid(row=7, column=2, sticky=tk.W, padx=5, pady=5)
         
         # 進度顯示
         progress_frame = ttk.LabelFrame(parent, text="處理進度")
@@ -748,19 +304,26 @@ class QRCodeEnhancerGUI:
         
         ttk.Button(button_frame, text="開始批量處理", command=self.start_batch_processing).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="導出結果(CSV)", command=self.export_results_csv).pack(side=tk.LEFT, padx=5)
-        if PANDAS_AVAILABLE:
+        if OPENPYXL_AVAILABLE:
             ttk.Button(button_frame, text="導出結果(Excel)", command=self.export_results_excel).pack(side=tk.LEFT, padx=5)
+        if PYARROW_AVAILABLE:
+            ttk.Button(button_frame, text="導出結果(Parquet)", command=self.export_results_parquet).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="清空結果", command=self.clear_batch_results).pack(side=tk.LEFT, padx=5)
     
     def browse_input_image(self):
         """瀏覽選擇輸入圖像"""
         file_path = filedialog.askopenfilename(
-            filetypes=[("圖像文件", "*.png;*.jpg;*.jpeg;*.bmp;*.tiff"), ("所有文件", "*.*")]
+            filetypes=[("圖像文件", "*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff;*.pdf"), ("所有文件", "*.*")]
         )
         if file_path:
             self.input_image_path.set(file_path)
             self.display_image(file_path, canvas='original')
             
+            # 多頁文件 (PDF/多頁TIFF) 直接逐頁判讀, 不做整體質量評估
+            if is_document(file_path):
+                self.start_processing()
+                return
+            
             # 自動評估並嘗試讀取
             quality = self.assess_image_quality()
             if quality and quality.get('laplacian_var', 0) >= 50:
@@ -785,7 +348,7 @@ class QRCodeEnhancerGUI:
             messagebox.showerror("錯誤", "請先選擇有效的輸入圖像")
             return
         
-        image = cv2.imread(input_path)
+        image = self.image_cache.load(input_path)
         if image is None:
             messagebox.showerror("錯誤", "無法讀取圖像")
             return
@@ -854,7 +417,12 @@ class QRCodeEnhancerGUI:
     def display_image(self, image_path, canvas='original'):
         """在畫布上顯示圖像"""
         try:
-            image = Image.open(image_path)
+            if is_document(image_path):
+                # 多頁文件只預覽第一頁
+                image = Image.fromarray(render_page(image_path, 0, dpi=72))
+                close_documents()
+            else:
+                image = Image.open(image_path)
             image.thumbnail((400, 250))
             photo = ImageTk.PhotoImage(image)
             
@@ -869,6 +437,12 @@ class QRCodeEnhancerGUI:
         except Exception as e:
             messagebox.showerror("錯誤", f"無法顯示圖像: {e}")
     
+    def cache_stats_text(self):
+        """圖像緩存統計 (命中/未命中/淘汰/佔用)"""
+        stats = self.image_cache.stats()
+        return (f"圖像緩存: 命中 {stats['hits']} / 未命中 {stats['misses']} / 淘汰 {stats['evictions']}, "
+                f"{stats['entries']} 張, {stats['bytes'] / 1024 / 1024:.1f} MB\n")
+    
     def assess_image_quality(self):
         """評估圖像質量"""
         input_path = self.input_image_path.get()
@@ -877,7 +451,7 @@ class QRCodeEnhancerGUI:
             return
         
         try:
-            image = cv2.imread(input_path)
+            image = self.image_cache.load(input_path)
             if image is None:
                 raise ValueError("無法讀取圖像")
             
@@ -888,7 +462,8 @@ class QRCodeEnhancerGUI:
             self.result_text.insert(tk.END, f"清晰度: {quality['clarity']} ({quality['clarity_score']}/100)\n")
             self.result_text.insert(tk.END, f"拉普拉斯方差: {quality['laplacian_var']}\n")
             self.result_text.insert(tk.END, f"對比度: {quality['contrast']}\n")
-            self.result_text.insert(tk.END, f"亮度: {quality['brightness']}\n\n")
+            self.result_text.insert(tk.END, f"亮度: {quality['brightness']}\n")
+            self.result_text.insert(tk.END, f"噪聲估計: {quality['noise']}\n\n")
             self.result_text.insert(tk.END, f"建議: {quality['recommendation']}\n")
             
             return quality
@@ -910,7 +485,7 @@ class QRCodeEnhancerGUI:
         
         # 在後台線程中處理
         threading.Thread(
-            target=self.process_single_image,
+            target=self.process_single_document if is_document(input_path) else self.process_single_image,
             args=(input_path, output_dir),
             daemon=True
         ).start()
@@ -924,15 +499,13 @@ class QRCodeEnhancerGUI:
             start_time = time.time()
             
             # 讀取圖像 (使用緩存)
-            cached_image = self.image_cache.get(input_path)
-            if cached_image is not None:
-                image = cached_image
+            hits_before = self.image_cache.hits
+            image = self.image_cache.load(input_path)
+            if image is None:
+                raise ValueError("無法讀取圖像")
+            if self.image_cache.hits > hits_before:
                 self.result_text.insert(tk.END, "從緩存讀取圖像\n")
-            else:
-                image = cv2.imread(input_path)
-                if image is None:
-                    raise ValueError("無法讀取圖像")
-                self.image_cache.put(input_path, image)
+            self.result_text.insert(tk.END, self.cache_stats_text())
             
             # 評估質量
             quality = self.preprocessor.assess_quality(image)
@@ -971,7 +544,8 @@ class QRCodeEnhancerGUI:
             available_engines = [name for name, av in self.engine_status.items() if av]
             self.result_text.insert(tk.END, f"使用引擎: {', '.join(available_engines)}\n")
             
-            results = self.decoder.decode_multi_strategy(processed, early_stop=self.early_stop.get())
+            results = self.decoder.decode_multi_strategy(processed, early_stop=self.early_stop.get(),
+                                                         multi=self.multi_code.get())
             
             processing_time = time.time() - start_time
             
@@ -989,6 +563,9 @@ class QRCodeEnhancerGUI:
                     self.result_text.insert(tk.END, f"  引擎: {result['engine']}\n")
                     self.result_text.insert(tk.END, f"  數據: {result['data']}\n")
                     self.result_text.insert(tk.END, f"  置信度: {result['confidence']}\n")
+                    if result.get('bbox'):
+                        x, y, w, h = (int(v) for v in result['bbox'])
+                        self.result_text.insert(tk.END, f"  位置: x={x}, y={y}, 寬={w}, 高={h}\n")
                 
                 # 保存解碼結果
                 result_data = {
@@ -1016,6 +593,59 @@ class QRCodeEnhancerGUI:
             self.result_text.insert(tk.END, f"\n判讀失敗: {str(e)}")
             messagebox.showerror("錯誤", f"判讀失敗: {str(e)}")
 
+    def process_single_document(self, input_path, output_dir):
+        """逐頁處理多頁文件 (PDF/多頁TIFF), 每頁的預處理圖像分別保存"""
+        try:
+            self.result_text.delete(1.0, tk.END)
+            self.result_text.insert(tk.END, "開始逐頁處理文件...\n")
+            
+            if self.use_smart_preprocess.get():
+                preprocess, methods = 'smart', None
+            else:
+                preprocess = 'custom'
+                methods = [method for method, var in self.preprocess_methods.items() if var.get()]
+                if not methods:
+                    messagebox.showwarning("警告", "請至少選擇一種預處理方法")
+                    return
+            
+            result = process_image_file(input_path, self.decoder, self.preprocessor,
+                                        preprocess=preprocess, methods=methods,
+                                        early_stop=self.early_stop.get(), output_dir=output_dir,
+                                        multi=self.multi_code.get())
+            if result['status'] == '錯誤':
+                raise ValueError(result['data'])
+            
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            first_page = os.path.join(output_dir, f"{base_name}_p1_enhanced.png")
+            if os.path.exists(first_page):
+                self.root.after(0, self.display_image, first_page, 'processed')
+            
+            pages = result.get('pages', 0)
+            codes = result.get('qr_codes', [])
+            self.result_text.insert(tk.END, f"共 {pages} 頁, 預處理方法: {', '.join(result['preprocess_methods'])}\n")
+            self.result_text.insert(tk.END, f"每頁預處理圖像已保存到: {output_dir}\n")
+            
+            if codes:
+                self.result_text.insert(tk.END, f"\n✅ 成功判讀 {len(codes)} 個內容 "
+                                                f"(耗時: {result['processing_time']:.2f}秒):\n")
+                self.root.clipboard_clear()
+                self.root.clipboard_append(codes[0]['data'])
+                for i, code in enumerate(codes):
+                    self.result_text.insert(tk.END, f"\n內容 #{i+1} (第 {code.get('page', 1)} 頁):\n")
+                    self.result_text.insert(tk.END, f"  引擎: {code['engine']}\n")
+                    self.result_text.insert(tk.END, f"  數據: {code['data']}\n")
+                
+                result_path = os.path.join(output_dir, f"{base_name}_results.json")
+                with open(result_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+                self.result_text.insert(tk.END, f"\n結果已保存到: {result_path}")
+            else:
+                self.result_text.insert(tk.END, f"\n❌ 所有頁面均未檢測到QR碼 (耗時: {result['processing_time']:.2f}秒)\n")
+        
+        except Exception as e:
+            self.result_text.insert(tk.END, f"\n判讀失敗: {str(e)}")
+            messagebox.showerror("錯誤", f"判讀失敗: {str(e)}")
+    
     def start_batch_processing(self):
         """開始批量處理"""
         input_dir = self.batch_input_dir.get()
@@ -1026,10 +656,17 @@ class QRCodeEnhancerGUI:
         output_dir = self.output_dir.get()
         os.makedirs(output_dir, exist_ok=True)
         
-        # 清空之前的結果
-        self.batch_results = []
+        # 清空之前的結果 (續傳時保留結果文件與任務清單)
+        self.batch_counts = {'success': 0, 'failure': 0}
         for item in self.batch_tree.get_children():
             self.batch_tree.delete(item)
+        self.batch_results_path = os.path.join(output_dir, BATCH_RESULTS_FILE)
+        self.batch_job_path = os.path.join(output_dir, BATCH_JOB_FILE)
+        if not self.batch_resume.get():
+            if os.path.exists(self.batch_results_path):
+                os.remove(self.batch_results_path)
+            with JobManifest(self.batch_job_path) as job:
+                job.reset()
         
         # 在後台線程中處理
         threading.Thread(
@@ -1041,112 +678,74 @@ class QRCodeEnhancerGUI:
     def process_batch_images(self, input_dir, output_dir):
         """批量處理圖像"""
         try:
-            # 獲取所有圖像文件
-            supported_formats = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']
-            image_files = [
-                os.path.join(input_dir, f) for f in os.listdir(input_dir)
-                if any(f.lower().endswith(fmt) for fmt in supported_formats)
-            ]
-            
-            if not image_files:
-                messagebox.showwarning("警告", "目錄中沒有找到圖像文件")
-                return
+            # 邊遍歷目錄邊處理: 找到第一張圖像即開始, 不預先列出整個目錄
+            include = [p.strip() for p in self.batch_include.get().split(';') if p.strip()]
+            exclude = [p.strip() for p in self.batch_exclude.get().split(';') if p.strip()]
+            # 輸出目錄位於輸入目錄之內時不處理其中的輸出文件
+            try:
+                rel_output = os.path.relpath(os.path.abspath(output_dir), os.path.abspath(input_dir))
+            except ValueError:  # Windows 上位於不同磁碟
+                rel_output = '..'
+            if not rel_output.startswith('..') and rel_output != '.':
+                exclude.append(rel_output.replace(os.sep, '/'))
+            recursive = self.batch_recursive.get()
+            
+            # 任務清單: 指紋未變且已成功的文件略過, 其餘標記為待處理
+            job = JobManifest(self.batch_job_path)
+            discovered = 0
+            
+            def discover():
+                nonlocal discovered
+                files = scan_directory(input_dir, recursive=recursive, include=include, exclude=exclude)
+                for path in job.plan(files):
+                    discovered += 1
+                    yield path
             
-            total_files = len(image_files)
             self.progress_var.set(0)
-            self.progress_label.config(text=f"準備處理 {total_files} 個文件...")
+            self.progress_label.config(text="正在搜尋圖像文件...")
             
-            # 使用線程池並行處理
+            # 預設使用進程池並行處理 (解碼受GIL限制, 線程數增加後吞吐量不再提升)
             max_workers = self.max_workers.get()
+            backend = 'process' if self.batch_backend.get() == '進程' else 'thread'
             completed = 0
             
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交所有任務
-                future_to_file = {
-                    executor.submit(self.process_single_image_batch, file_path, output_dir): file_path
-                    for file_path in image_files
-                }
-                
-                # 處理完成的任務
-                for future in as_completed(future_to_file):
-                    file_path = future_to_file[future]
-                    try:
-                        result = future.result()
-                        self.batch_results.append(result)
-                        
-                        # 更新表格
-                        self.root.after(0, self.update_batch_tree, result)
-                        
-                        # 更新進度
-                        completed += 1
-                        progress = (completed / total_files) * 100
-                        self.progress_var.set(progress)
-                        self.progress_label.config(
-                            text=f"已處理 {completed}/{total_files} ({progress:.1f}%)"
-                        )
+            pool = self.get_worker_pool(max_workers) if backend == 'process' else None
+            
+            with job, ResultWriter(self.batch_results_path) as writer:
+                for result in run_batch(discover(), self.decoder, self.preprocessor,
+                                        max_workers=max_workers, backend=backend, pool=pool,
+                                        output_dir=output_dir, multi=self.multi_code.get()):
+                    writer.write(result)
+                    job.record(result)
+                    self.batch_counts['success' if result['success'] else 'failure'] += 1
+                    
+                    # 更新表格
+                    self.root.after(0, self.update_batch_tree, result)
                     
-                    except Exception as e:
-                        print(f"處理 {file_path} 時出錯: {e}")
+                    # 更新進度 (搜尋仍在進行時, 總數為目前已發現的文件數)
+                    completed += 1
+                    progress = (completed / max(discovered, completed)) * 100
+                    self.progress_var.set(progress)
+                    self.progress_label.config(
+                        text=f"已處理 {completed}/{discovered} ({progress:.1f}%)"
+                    )
+            
+            total_files = completed
+            if not total_files and not job.skipped:
+                messagebox.showwarning("警告", "目錄中沒有找到圖像文件")
+                return
             
             # 完成
-            self.progress_label.config(text=f"✅ 批量處理完成! 共處理 {total_files} 個文件")
-            messagebox.showinfo("完成", f"批量處理完成!\n成功: {sum(1 for r in self.batch_results if r['success'])} 個\n失敗: {sum(1 for r in self.batch_results if not r['success'])} 個")
+            self.progress_label.config(
+                text=f"✅ 批量處理完成! 共處理 {total_files} 個文件 (略過已完成的 {job.skipped} 個)"
+            )
+            messagebox.showinfo("完成", f"批量處理完成!\n成功: {self.batch_counts['success']} 個\n"
+                                      f"失敗: {self.batch_counts['failure']} 個\n"
+                                      f"結果文件: {self.batch_results_path}")
         
         except Exception as e:
             messagebox.showerror("錯誤", f"批量處理失敗: {str(e)}")
     
-    def process_single_image_batch(self, input_path, output_dir):
-        """處理單張圖像(批量模式)"""
-        start_time = time.time()
-        
-        try:
-            # 讀取圖像
-            image = cv2.imread(input_path)
-            if image is None:
-                raise ValueError("無法讀取圖像")
-            
-            # 智能預處理
-            processed, methods_used = self.preprocessor.smart_preprocess(image)
-            
-            # 保存處理後的圖像
-            base_name = os.path.splitext(os.path.basename(input_path))[0]
-            processed_path = os.path.join(output_dir, f"{base_name}_enhanced.png")
-            cv2.imwrite(processed_path, processed)
-            
-            # 解碼
-            results = self.decoder.decode_multi_strategy(processed, early_stop=True)
-            
-            processing_time = time.time() - start_time
-            
-            if results:
-                return {
-                    'filename': os.path.basename(input_path),
-                    'success': True,
-                    'status': '成功',
-                    'data': results[0]['data'],
-                    'engine': results[0]['engine'],
-                    'processing_time': f"{processing_time:.2f}s"
-                }
-            else:
-                return {
-                    'filename': os.path.basename(input_path),
-                    'success': False,
-                    'status': '失敗',
-                    'data': '未檢測到QR碼',
-                    'engine': '-',
-                    'processing_time': f"{processing_time:.2f}s"
-                }
-        
-        except Exception as e:
-            return {
-                'filename': os.path.basename(input_path),
-                'success': False,
-                'status': '錯誤',
-                'data': str(e),
-                'engine': '-',
-                'processing_time': f"{time.time() - start_time:.2f}s"
-            }
-    
     def update_batch_tree(self, result):
         """更新批量處理結果表格"""
         tag = 'success' if result['success'] else 'failure'
@@ -1154,63 +753,60 @@ class QRCodeEnhancerGUI:
             result['filename'],
             result['status'],
             result['data'][:50] + '...' if len(result['data']) > 50 else result['data'],
-            result['processing_time'],
+            f"{result['processing_time']:.2f}s",
             result['engine']
         ), tags=(tag,))
         
+        # 只保留最近的行, 表格佔用的內存不隨批量大小增長
+        rows = self.batch_tree.get_children()
+        if len(rows) > MAX_TREE_ROWS:
+            self.batch_tree.delete(*rows[:len(rows) - MAX_TREE_ROWS])
+        
         # 設置顏色
         self.batch_tree.tag_configure('success', background='#d4edda')
         self.batch_tree.tag_configure('failure', background='#f8d7da')
     
     def export_results_csv(self):
         """導出結果為CSV"""
-        if not self.batch_results:
-            messagebox.showwarning("警告", "沒有可導出的結果")
-            return
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")]
-        )
-        
-        if file_path:
-            try:
-                import csv
-                with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.DictWriter(f, fieldnames=['filename', 'status', 'data', 'engine', 'processing_time'])
-                    writer.writeheader()
-                    writer.writerows(self.batch_results)
-                
-                messagebox.showinfo("成功", f"結果已導出到: {file_path}")
-            except Exception as e:
-                messagebox.showerror("錯誤", f"導出失敗: {str(e)}")
+        self.export_results("CSV文件", ".csv")
     
     def export_results_excel(self):
         """導出結果為Excel"""
-        if not PANDAS_AVAILABLE:
-            messagebox.showerror("錯誤", "需要安裝pandas和openpyxl庫")
-            return
+        self.export_results("Excel文件", ".xlsx")
+    
+    def export_results_parquet(self):
+        """導出結果為Parquet"""
+        self.export_results("Parquet文件", ".parquet")
+    
+    def export_results(self, description, extension):
+        """
+        將結果逐行轉換為指定格式 (不把全部結果載入內存)
         
-        if not self.batch_results:
+        優先從任務清單導出 (續傳多次後每個文件仍只有一條最新結果), 否則從結果文件導出
+        """
+        if not self.batch_results_path or not os.path.exists(self.batch_results_path):
             messagebox.showwarning("警告", "沒有可導出的結果")
             return
         
         file_path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel文件", "*.xlsx"), ("所有文件", "*.*")]
+            defaultextension=extension,
+            filetypes=[(description, f"*{extension}"), ("所有文件", "*.*")]
         )
         
         if file_path:
             try:
-                df = pd.DataFrame(self.batch_results)
-                df.to_excel(file_path, index=False, engine='openpyxl')
-                messagebox.showinfo("成功", f"結果已導出到: {file_path}")
+                if os.path.exists(self.batch_job_path):
+                    with JobManifest(self.batch_job_path) as job:
+                        rows = convert_results(job.iter_results(), file_path)
+                else:
+                    rows = convert_results(self.batch_results_path, file_path)
+                messagebox.showinfo("成功", f"{rows} 條結果已導出到: {file_path}")
             except Exception as e:
                 messagebox.showerror("錯誤", f"導出失敗: {str(e)}")
     
     def clear_batch_results(self):
-        """清空批量處理結果"""
-        self.batch_results = []
+        """清空批量處理結果 (結果文件保留在輸出目錄中)"""
+        self.batch_counts = {'success': 0, 'failure': 0}
         for item in self.batch_tree.get_children():
             self.batch_tree.delete(item)
         self.progress_var.set(0)
@@ -1223,9 +819,26 @@ class QRCodeEnhancerGUI:
         self.processed_canvas.delete('all')
         self.result_text.delete(1.0, tk.END)
     
+    def get_worker_pool(self, max_workers):
+        """
+        取得常駐的解碼進程池
+        
+        子進程及其中已預熱的引擎在多次批量處理之間重複使用, 並行數改變時才重建
+        """
+        if self.worker_pool is not None and not self.worker_pool.matches(max_workers):
+            self.worker_pool.close()
+            self.worker_pool = None
+        if self.worker_pool is None:
+            self.worker_pool = WorkerPool(max_workers)
+        return self.worker_pool
+    
     def run(self):
         """運行工具"""
         self.root.mainloop()
+        # 關閉窗口後保存學習到的策略統計並結束子進程
+        self.decoder.save_strategy_stats()
+        if self.worker_pool is not None:
+            self.worker_pool.close()
 
 
 def main():
@@ -0,0 +1,151 @@
+"""
+QR碼批量任務清單模塊
+以 SQLite 記錄批量任務中每個文件的狀態 (pending / done / failed)、文件指紋與結果,
+處理過程中定期提交 (checkpoint); 中斷後重新執行時只處理新增、已修改或上次失敗的文件
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from qr_cache import file_fingerprint
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobManifest:
+    """
+    批量任務清單
+
+    用法:
+        with JobManifest('job.sqlite') as job:
+            for result in run_batch(job.plan(files), ...):
+                job.record(result)
+    """
+
+    def __init__(self, path, checkpoint_every=50, checkpoint_interval=2.0):
+        """
+        Args:
+            path: 清單文件路徑
+            checkpoint_every: 每記錄多少個結果提交一次
+            checkpoint_interval: 距上次提交超過多少秒也提交一次
+        """
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.skipped = 0
+        self._uncommitted = 0
+        self._last_commit = time.time()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 清單只在主進程中使用; 進程池的任務派發線程會迭代 plan(), 與收集結果的線程共用連接, 以鎖串行化
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_files (
+                    path TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    fingerprint TEXT,
+                    result TEXT,
+                    updated REAL NOT NULL
+                )
+            ''')
+
+    @staticmethod
+    def _key(path):
+        return os.path.normpath(os.path.abspath(path))
+
+    def plan(self, files):
+        """
+        逐一產出需要處理的文件 (惰性, 不展開輸入)
+
+        指紋與上次相同且狀態為 done 的文件被略過 (計入 self.skipped);
+        其餘文件標記為 pending 並記下當前指紋
+        """
+        for path in files:
+            key = self._key(path)
+            try:
+                fingerprint = file_fingerprint(path)
+            except OSError:
+                fingerprint = None
+            with self._lock:
+                row = self.conn.execute(
+                    'SELECT state, fingerprint FROM job_files WHERE path = ?', (key,)
+                ).fetchone()
+                if row and row[0] == DONE and fingerprint and row[1] == fingerprint:
+                    self.skipped += 1
+                    continue
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO job_files (path, state, fingerprint, result, updated) '
+                    'VALUES (?, ?, ?, NULL, ?)',
+                    (key, PENDING, fingerprint, time.time())
+                )
+                self._maybe_checkpoint()
+            yield path
+
+    def record(self, result):
+        """記錄一個結果: 解碼成功為 done, 未檢測到或出錯為 failed (下次重新處理)"""
+        state = DONE if result.get('success') else FAILED
+        data = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            self.conn.execute(
+                'UPDATE job_files SET state = ?, result = ?, updated = ? WHERE path = ?',
+                (state, data, time.time(), self._key(result['path']))
+            )
+            self._uncommitted += 1
+            self._maybe_checkpoint()
+
+    def _maybe_checkpoint(self):
+        if (self._uncommitted >= self.checkpoint_every
+                or time.time() - self._last_commit >= self.checkpoint_interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """提交目前為止的狀態"""
+        with self._lock:
+            self.conn.commit()
+            self._uncommitted = 0
+            self._last_commit = time.time()
+
+    def counts(self):
+        """各狀態的文件數"""
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM job_files GROUP BY state').fetchall()
+        for state, count in rows:
+            counts[state] = count
+        return counts
+
+    def iter_results(self):
+        """逐一讀取每個文件最近一次的結果 (每個文件一條; 使用獨立連接, 不佔用寫入連接)"""
+        self.checkpoint()
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            rows = conn.execute('SELECT result FROM job_files WHERE result IS NOT NULL ORDER BY path')
+            for (data,) in rows:
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def reset(self):
+        """清空清單, 下次 plan() 時所有文件重新處理"""
+        with self._lock:
+            self.conn.execute('DELETE FROM job_files')
+            self.checkpoint()
+
+    def close(self):
+        with self._lock:
+            self.checkpoint()
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,157 @@
+"""
+QR碼圖像質量評估模塊
+一次計算清晰度 (拉普拉斯方差)、對比度、亮度與噪聲估計, 代價與圖像大小無關:
+- 亮度與對比度在長邊約固定的均勻取樣圖上計算
+- 清晰度與噪聲依賴像素尺度, 縮小會改變其數值, 因此在原解析度上均勻取若干小塊計算,
+  閾值仍與整圖計算的結果一致
+- 同一圖像對象的結果會被記住, 評估、智能預處理與GUI顯示共用一次計算
+"""
+import math
+import threading
+import weakref
+
+import cv2
+import numpy as np
+
+# 取樣圖的長邊 (像素)
+ANALYSIS_SIDE = 512
+
+# 原解析度取樣塊: 塊邊長與每邊塊數 (12x12 = 144 塊, 共約 59 萬像素);
+# 小塊多取比大塊少取更能覆蓋只佔畫面一小部分的QR碼
+TILE_SIZE = 64
+TILES_PER_SIDE = 12
+
+# Immerkær 快速噪聲估計卷積核
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+
+def _to_gray(image):
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _downsample(image, side):
+    """
+    按整數步長均勻取樣到長邊約 side (已不超過時直接返回)
+
+    均勻取樣的均值與標準差是整圖的無偏估計 (區域平均縮小會壓低標準差), 且只觸及取樣到的像素
+    """
+    step = -(-max(image.shape[:2]) // side)
+    if step <= 1:
+        return image
+    return np.ascontiguousarray(image[::step, ::step])
+
+
+def _tiles(image, tile, per_side):
+    """在原解析度上均勻分佈的取樣塊 (圖像不大時返回整圖)"""
+    height, width = image.shape[:2]
+    if height <= tile * per_side and width <= tile * per_side:
+        return [image]
+    ys = np.linspace(0, max(height - tile, 0), per_side).astype(int)
+    xs = np.linspace(0, max(width - tile, 0), per_side).astype(int)
+    return [image[y:y + tile, x:x + tile] for y in ys for x in xs]
+
+
+def _laplacian_var(tiles):
+    """各取樣塊拉普拉斯響應的合併方差 (CV_16S, 不建立 float64 副本)"""
+    count = total = total_sq = 0.0
+    for tile in tiles:
+        lap = cv2.Laplacian(tile, cv2.CV_16S)
+        mean, std = cv2.meanStdDev(lap)
+        n = lap.size
+        count += n
+        total += mean[0, 0] * n
+        total_sq += (std[0, 0] ** 2 + mean[0, 0] ** 2) * n
+    mean = total / count
+    return max(total_sq / count - mean * mean, 0.0)
+
+
+def _noise_sigma(tiles):
+    """Immerkær 噪聲標準差估計: sqrt(pi/2) * mean|I * N| / 6"""
+    total = count = 0.0
+    for tile in tiles:
+        if tile.shape[0] < 3 or tile.shape[1] < 3:
+            continue
+        response = cv2.filter2D(tile, cv2.CV_32F, _NOISE_KERNEL, borderType=cv2.BORDER_REPLICATE)
+        inner = response[1:-1, 1:-1]
+        total += cv2.norm(inner, cv2.NORM_L1)
+        count += inner.size
+    if not count:
+        return 0.0
+    return math.sqrt(math.pi / 2) * total / (6 * count)
+
+
+class QualityAnalyzer:
+    """
+    圖像質量指標計算器
+
+    用法:
+        analyzer = QualityAnalyzer()
+        metrics = analyzer.analyze(image)
+        metrics['laplacian_var'], metrics['contrast'], metrics['brightness'], metrics['noise']
+    """
+
+    def __init__(self, analysis_side=ANALYSIS_SIDE, tile_size=TILE_SIZE, tiles_per_side=TILES_PER_SIDE):
+        """
+        Args:
+            analysis_side: 計算亮度/對比度的取樣圖長邊
+            tile_size: 清晰度/噪聲取樣塊邊長
+            tiles_per_side: 每邊取樣塊數
+        """
+        self.analysis_side = analysis_side
+        self.tile_size = tile_size
+        self.tiles_per_side = tiles_per_side
+        # id(圖像) -> (弱引用, 指標); 圖像被釋放時自動移除
+        self._memo = {}
+        # 弱引用回調可能在持鎖期間的垃圾回收中觸發, 使用可重入鎖
+        self._lock = threading.RLock()
+
+    def analyze(self, image):
+        """
+        計算質量指標 (同一圖像對象只計算一次; 本項目的預處理步驟都不原地修改輸入)
+
+        Returns:
+            {'laplacian_var', 'contrast', 'brightness', 'noise'}
+        """
+        key = id(image)
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0]() is image:
+                return dict(entry[1])
+
+        metrics = self._compute(image)
+
+        try:
+            ref = weakref.ref(image, lambda _, key=key: self._forget(key))
+        except TypeError:
+            return metrics
+        with self._lock:
+            self._memo[key] = (ref, metrics)
+        return dict(metrics)
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0]() is None:
+                del self._memo[key]
+
+    def _compute(self, image):
+        # 先取樣再轉灰階, 不對原解析度整圖做任何轉換
+        small = _to_gray(_downsample(image, self.analysis_side))
+        mean, std = cv2.meanStdDev(small)
+        tiles = [_to_gray(tile) for tile in _tiles(image, self.tile_size, self.tiles_per_side)]
+        return {
+            'laplacian_var': float(_laplacian_var(tiles)),
+            'contrast': float(std[0, 0]),
+            'brightness': float(mean[0, 0]),
+            'noise': float(_noise_sigma(tiles)),
+        }
+
+
+_default_analyzer = QualityAnalyzer()
+
+
+def measure_quality(image):
+    """使用共用的計算器計算質量指標"""
+    return _default_analyzer.analyze(image)
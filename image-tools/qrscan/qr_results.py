@@ -0,0 +1,266 @@
+"""
+QR碼批量結果輸出模塊
+- 流式寫入: 每處理完一張即追加一行到 JSONL 或 CSV 文件並刷新, 內存佔用與批量大小無關,
+  進程崩潰時已完成的結果不會丟失
+- 續傳: 讀取已記錄的文件路徑, 重新執行時略過
+- 轉換: 處理結束後將結果文件轉換為 CSV / Excel / Parquet (逐行讀取, 不整批載入內存)
+"""
+import csv
+import json
+import os
+
+# 可選依賴: Excel (openpyxl) 與 Parquet (pyarrow) 導出
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# 表格格式 (CSV/Excel/Parquet) 的欄位; JSONL 保存完整結果
+EXPORT_FIELDS = ['path', 'filename', 'success', 'status', 'data', 'engine',
+                 'processing_time', 'preprocess_methods', 'qr_count', 'all_data']
+
+# Parquet 每批寫入的行數
+PARQUET_BATCH_ROWS = 10000
+
+
+def result_format(path):
+    """按副檔名判斷格式: 'csv' / 'xlsx' / 'parquet', 其餘為 'jsonl'"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'jsonl'
+
+
+def flatten_result(result):
+    """完整結果 -> 表格行 (多碼模式下所有內容以換行連接)"""
+    codes = result.get('qr_codes')
+    methods = result.get('preprocess_methods') or []
+    if codes is None:
+        # 已是表格行 (讀自CSV結果文件)
+        qr_count = int(result.get('qr_count') or 0)
+        all_data = result.get('all_data', '')
+    else:
+        qr_count = len(codes)
+        all_data = '\n'.join(str(code.get('data', '')) for code in codes)
+    success = result.get('success')
+    if isinstance(success, str):
+        success = success == 'True'
+    return {
+        'path': result.get('path', ''),
+        'filename': result.get('filename', ''),
+        'success': bool(success),
+        'status': result.get('status', ''),
+        'data': result.get('data', ''),
+        'engine': result.get('engine', ''),
+        'processing_time': round(float(result.get('processing_time') or 0), 4),
+        'preprocess_methods': '+'.join(methods) if isinstance(methods, list) else str(methods),
+        'qr_count': qr_count,
+        'all_data': all_data,
+    }
+
+
+class ResultWriter:
+    """
+    流式結果寫入器 (追加模式)
+
+    用法:
+        with ResultWriter('results.jsonl') as writer:
+            for result in run_batch(...):
+                writer.write(result)
+    """
+
+    def __init__(self, path, sync_every=64):
+        """
+        Args:
+            path: 結果文件 (.csv 寫表格欄位, 其餘寫完整 JSONL); 已存在時在末尾追加
+            sync_every: 每寫入多少條結果調用一次 fsync (0 則只在關閉時)
+        """
+        self.path = path
+        self.format = result_format(path)
+        if self.format not in ('jsonl', 'csv'):
+            raise ValueError(f"流式寫入只支持 JSONL/CSV, 其他格式請在結束後用 convert_results 轉換: {path}")
+        self.sync_every = sync_every
+        self.count = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        if not is_new:
+            self._repair_tail()
+
+        self._csv = None
+        if self.format == 'csv':
+            # 忽略不在欄位列表中的鍵 (結果字典含 qr_codes 等額外欄位)
+            self._csv = csv.DictWriter(self._file, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+            if is_new:
+                self._csv.writeheader()
+
+    def _repair_tail(self):
+        """上次寫入在行中途中斷時補上換行, 殘缺的行在讀取時被略過"""
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                self._file.write('\n')
+
+    def write(self, result):
+        """追加一條結果並刷新到操作系統"""
+        if self._csv is not None:
+            self._csv.writerow(flatten_result(result))
+        else:
+            self._file.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        self.count += 1
+        if self.sync_every and self.count % self.sync_every == 0:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_results(path):
+    """逐條讀取 JSONL/CSV 結果文件 (略過崩潰時寫了一半的行)"""
+    if not os.path.exists(path):
+        return
+    if result_format(path) == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                # 崩潰時寫了一半的行缺少末尾欄位
+                if row.get('path') and row.get(EXPORT_FIELDS[-1]) is not None:
+                    yield row
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def recorded_paths(path):
+    """結果文件中已記錄的圖像路徑 (正規化後), 用於續傳時略過"""
+    return {os.path.normpath(result['path']) for result in iter_results(path) if result.get('path')}
+
+
+def skip_recorded(files, recorded):
+    """略過已記錄的文件 (惰性過濾, 不展開輸入)"""
+    for path in files:
+        if os.path.normpath(path) not in recorded:
+            yield path
+
+
+def convert_results(src, dst):
+    """
+    將 JSONL/CSV 結果文件 (或結果的可迭代對象, 如 JobManifest.iter_results()) 轉換為 CSV / Excel / Parquet
+
+    逐行讀取並寫出 (Excel 使用 openpyxl 的只寫模式, Parquet 按批寫入), 內存佔用與結果數無關
+
+    Returns:
+        轉換的行數
+    """
+    fmt = check_export(dst)
+    results = iter_results(src) if isinstance(src, str) else src
+    rows = (flatten_result(result) for result in results)
+    if fmt == 'csv':
+        return _write_csv(rows, dst)
+    if fmt == 'xlsx':
+        return _write_xlsx(rows, dst)
+    return _write_parquet(rows, dst)
+
+
+def check_export(dst):
+    """
+    檢查導出格式是否可用 (批量處理開始前調用, 避免處理完才發現缺少依賴)
+
+    Returns:
+        格式名稱
+    """
+    fmt = result_format(dst)
+    if fmt == 'xlsx' and not OPENPYXL_AVAILABLE:
+        raise RuntimeError("導出Excel需要安裝 openpyxl")
+    if fmt == 'parquet' and not PYARROW_AVAILABLE:
+        raise RuntimeError("導出Parquet需要安裝 pyarrow")
+    if fmt == 'jsonl':
+        raise ValueError(f"不支持的導出格式: {dst}")
+    return fmt
+
+
+def _write_csv(rows, dst):
+    count = 0
+    with open(dst, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_xlsx(rows, dst):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('results')
+    sheet.append(EXPORT_FIELDS)
+    count = 0
+    for row in rows:
+        sheet.append([row[field] for field in EXPORT_FIELDS])
+        count += 1
+    workbook.save(dst)
+    return count
+
+
+def _write_parquet(rows, dst):
+    writer = None
+    batch = []
+    count = 0
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer = _flush_parquet(batch, dst, writer)
+                count += len(batch)
+                batch = []
+        if batch or writer is None:
+            writer = _flush_parquet(batch, dst, writer)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _flush_parquet(batch, dst, writer):
+    table = pyarrow.Table.from_pylist(batch, schema=_parquet_schema())
+    if writer is None:
+        writer = pyarrow.parquet.ParquetWriter(dst, table.schema)
+    writer.write_table(table)
+    return writer
+
+
+def _parquet_schema():
+    types = {'success': pyarrow.bool_(), 'processing_time': pyarrow.float64(), 'qr_count': pyarrow.int64()}
+    return pyarrow.schema([(field, types.get(field, pyarrow.string())) for field in EXPORT_FIELDS])
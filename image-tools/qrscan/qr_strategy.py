@@ -0,0 +1,214 @@
+"""
+QR碼解碼策略調度模塊
+記錄每個 (預處理策略, 引擎) 組合的成功率與耗時, 並持久化到磁碟;
+解碼時按 "預期每毫秒成功次數" 排序嘗試順序 (Thompson 抽樣的多臂賭博機),
+同類圖像的批量處理中, 最常成功的組合會被最先嘗試
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# 跨進程文件鎖: POSIX 使用 fcntl, Windows 使用 msvcrt
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 預設統計文件位置
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser('~'), '.qrscan', 'strategy_stats.json')
+
+# 原圖直接解碼 (不做預處理) 的策略鍵
+ORIGINAL = 'original'
+
+# 尚無耗時記錄時假定的單次嘗試耗時 (毫秒)
+DEFAULT_LATENCY_MS = 20.0
+
+
+def strategy_key(methods):
+    """預處理方法列表 -> 策略鍵, 如 ['grayscale', 'invert'] -> 'grayscale+invert'"""
+    return '+'.join(methods) if methods else ORIGINAL
+
+
+@contextmanager
+def _locked(path):
+    """在 path + '.lock' 上持有跨進程的排他鎖"""
+    with open(f"{path}.lock", 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            return
+        # msvcrt.locking 重試約10秒後拋出 OSError, 其他進程持鎖較久時繼續等待
+        while True:
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StrategyScheduler:
+    """
+    策略調度器
+
+    用法:
+        scheduler = StrategyScheduler()
+        for methods, engine in scheduler.order(candidates):
+            ...
+            scheduler.record(methods, engine, success, elapsed_ms)
+        scheduler.save()
+    """
+
+    def __init__(self, stats_path=DEFAULT_STATS_PATH, autosave_every=200, rng=None):
+        """
+        Args:
+            stats_path: 統計文件路徑 (None 則只在內存中學習)
+            autosave_every: 每記錄多少次嘗試自動保存一次 (0 則只在 save() 時保存)
+            rng: 隨機數生成器 (測試時可傳入固定種子)
+        """
+        self.stats_path = stats_path
+        self.autosave_every = autosave_every
+        self.rng = rng or random.Random()
+        self.stats = {}     # 累計統計 (含磁碟上已有的)
+        self._pending = {}  # 上次保存後新增的統計, 保存時與磁碟上的合併
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def _key(methods, engine):
+        return f"{strategy_key(methods)}|{engine}"
+
+    def load(self):
+        """從磁碟讀取統計 (文件不存在或損壞時從零開始)"""
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+        except (OSError, ValueError):
+            self.stats = {}
+
+    def save(self):
+        """
+        將新增統計合併寫回磁碟
+
+        多個批量子進程共用同一文件, 因此保存時先讀取磁碟上的最新內容再疊加本進程的增量,
+        以臨時文件替換的方式寫入; 讀取、合併與替換在跨進程文件鎖內進行, 各進程的增量不會互相覆蓋。
+        寫入失敗時增量放回待保存的統計, 下次保存時重試
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not self.stats_path or not pending:
+            return
+
+        try:
+            directory = os.path.dirname(self.stats_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _locked(self.stats_path):
+                merged = {}
+                try:
+                    with open(self.stats_path, 'r', encoding='utf-8') as f:
+                        merged = json.load(f)
+                except (OSError, ValueError):
+                    pass
+
+                for key, delta in pending.items():
+                    entry = merged.setdefault(key, {'attempts': 0, 'successes': 0, 'total_ms': 0.0})
+                    for field, value in delta.items():
+                        entry[field] = entry.get(field, 0) + value
+
+                tmp_path = f"{self.stats_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(merged, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.stats_path)
+        except OSError:
+            with self._lock:
+                for key, delta in pending.items():
+                    entry = self._pending.setdefault(key, {'attempts': 0, 'successes': 0, 'total_ms': 0.0})
+                    for field, value in delta.items():
+                        entry[field] += value
+            return
+
+        with self._lock:
+            self.stats = merged
+            # 保存期間其他線程新增的記錄也要反映到累計統計中
+            for key, delta in self._pending.items():
+                entry = self.stats.setdefault(key, {'attempts': 0, 'successes': 0, 'total_ms': 0.0})
+                for field, value in delta.items():
+                    entry[field] += value
+
+    def record(self, methods, engine, success, elapsed_ms):
+        """記錄一次嘗試"""
+        key = self._key(methods, engine)
+        with self._lock:
+            for table in (self.stats, self._pending):
+                entry = table.setdefault(key, {'attempts': 0, 'successes': 0, 'total_ms': 0.0})
+                entry['attempts'] += 1
+                entry['successes'] += int(bool(success))
+                entry['total_ms'] += elapsed_ms
+            pending_attempts = sum(e['attempts'] for e in self._pending.values())
+
+        if self.autosave_every and pending_attempts >= self.autosave_every:
+            self.save()
+
+    def score(self, methods, engine):
+        """
+        抽樣得分: 成功率從 Beta(成功+1, 失敗+1) 抽樣, 再除以平均耗時
+
+        未嘗試過的組合成功率方差大, 仍有機會被排到前面 (探索);
+        樣本多的組合得分趨於穩定 (利用)
+        """
+        entry = self.stats.get(self._key(methods, engine))
+        if entry and entry['attempts']:
+            successes = entry['successes']
+            failures = entry['attempts'] - successes
+            latency = max(entry['total_ms'] / entry['attempts'], 0.1)
+        else:
+            successes = failures = 0
+            latency = DEFAULT_LATENCY_MS
+        return self.rng.betavariate(successes + 1, failures + 1) / latency
+
+    def order(self, candidates):
+        """
+        為本次解碼排列 (預處理方法, 引擎) 的嘗試順序
+
+        Args:
+            candidates: [(methods, engine), ...] 候選組合
+
+        Returns:
+            按得分由高到低排序的新列表
+        """
+        with self._lock:
+            scored = [(self.score(methods, engine), i) for i, (methods, engine) in enumerate(candidates)]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [candidates[i] for _, i in scored]
+
+    def summary(self, top=10):
+        """按成功率排列的統計摘要 (用於顯示)"""
+        rows = []
+        for key, entry in self.stats.items():
+            if not entry['attempts']:
+                continue
+            strategy, engine = key.rsplit('|', 1)
+            rows.append({
+                'strategy': strategy,
+                'engine': engine,
+                'attempts': entry['attempts'],
+                'success_rate': entry['successes'] / entry['attempts'],
+                'avg_ms': entry['total_ms'] / entry['attempts'],
+            })
+        rows.sort(key=lambda r: (-r['success_rate'] / max(r['avg_ms'], 0.1), -r['attempts']))
+        return rows[:top]
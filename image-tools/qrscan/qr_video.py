@@ -0,0 +1,294 @@
+"""
+QR碼視頻/攝像頭解碼模塊
+從視頻文件或攝像頭串流 (cv2.VideoCapture) 逐幀讀取, 以幀差略過畫面沒有變化的幀,
+由多個解碼線程並行處理, 按位置追蹤已出現的碼, 每個新出現的碼輸出一次 (含時間戳)
+
+範例:
+    python qr_video.py conveyor.mp4                  # 視頻文件
+    python qr_video.py 0 --realtime                  # 攝像頭 0, 處理不及時丟棄舊幀
+    python qr_video.py rtsp://cam/stream -o codes.jsonl --stats
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from qr_core import QRDecoder, FRAME_STRATEGIES
+
+# 幀差比較用的縮小圖長邊 (像素)
+GATE_SIDE = 160
+
+
+class FrameGate:
+    """
+    幀差閘門: 與上一個送去解碼的幀相比, 畫面平均變化不足閾值的幀被略過
+
+    比較在按整數步長取樣的小灰階圖上進行, 每幀代價遠小於一次解碼;
+    畫面靜止時每隔 keyframe_interval 幀仍放行一幀, 避免首次解碼失敗 (如模糊) 後不再重試
+    """
+
+    def __init__(self, threshold=2.0, keyframe_interval=30, side=GATE_SIDE):
+        """
+        Args:
+            threshold: 平均灰階差 (0-255) 超過此值才視為畫面有變化
+            keyframe_interval: 畫面靜止時最多略過的連續幀數 (0 則不強制放行)
+            side: 比較用縮小圖的長邊
+        """
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.side = side
+        self._reference = None
+        self._skipped = 0
+
+    def _thumbnail(self, frame):
+        step = max(1, -(-max(frame.shape[:2]) // self.side))
+        small = np.ascontiguousarray(frame[::step, ::step])
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_process(self, frame):
+        """是否需要解碼此幀 (放行時同時更新參考幀)"""
+        thumbnail = self._thumbnail(frame)
+        if self._reference is not None and self._reference.shape == thumbnail.shape:
+            diff = cv2.mean(cv2.absdiff(thumbnail, self._reference))[0]
+            forced = self.keyframe_interval and self._skipped >= self.keyframe_interval
+            if diff < self.threshold and not forced:
+                self._skipped += 1
+                return False
+        self._reference = thumbnail
+        self._skipped = 0
+        return True
+
+
+class CodeTracker:
+    """
+    按位置追蹤已出現的碼
+
+    內容相同且位置接近 (中心距離不超過碼邊長的 max_shift 倍, 允許傳送帶上逐幀移動) 的結果視為同一個碼;
+    超過 ttl 秒未再出現的碼被移除, 之後再次出現時視為新的碼。
+    內容相同但位置相距很遠 (如同時出現兩張相同的標籤) 則分別追蹤
+    """
+
+    def __init__(self, ttl=2.0, max_shift=3.0):
+        self.ttl = ttl
+        self.max_shift = max_shift
+        self.tracks = []
+
+    def _near(self, track, bbox):
+        if not bbox or not track['bbox']:
+            return True
+        tx, ty, tw, th = track['bbox']
+        x, y, w, h = bbox
+        distance = ((tx + tw / 2 - x - w / 2) ** 2 + (ty + th / 2 - y - h / 2) ** 2) ** 0.5
+        return distance <= self.max_shift * max(tw, th, w, h, 1)
+
+    def update(self, results, timestamp):
+        """
+        以一幀的結果更新追蹤狀態
+
+        Returns:
+            此幀中新出現的結果列表
+        """
+        self.tracks = [t for t in self.tracks if timestamp - t['last_seen'] <= self.ttl]
+        new = []
+        matched = set()
+        for result in results:
+            bbox = result.get('bbox')
+            track = next((t for i, t in enumerate(self.tracks)
+                          if i not in matched and t['data'] == result['data'] and self._near(t, bbox)), None)
+            if track is None:
+                track = {'data': result['data'], 'bbox': bbox, 'first_seen': timestamp}
+                self.tracks.append(track)
+                new.append(result)
+            matched.add(self.tracks.index(track))
+            track['bbox'] = bbox or track['bbox']
+            track['last_seen'] = timestamp
+        return new
+
+
+class VideoScanner:
+    """
+    視頻/攝像頭QR碼掃描器
+
+    用法:
+        scanner = VideoScanner(workers=4)
+        for event in scanner.scan('conveyor.mp4'):
+            print(event['timestamp'], event['data'])
+    """
+
+    def __init__(self, workers=4, decoder_options=None, diff_threshold=2.0, keyframe_interval=30,
+                 ttl=2.0, engines=None, strategies=FRAME_STRATEGIES):
+        """
+        Args:
+            workers: 解碼線程數 (OpenCV 與 zxing-cpp 解碼時釋放GIL)
+            decoder_options: 建立 QRDecoder 的參數 (每個解碼線程一個解碼器, 引擎物件不跨線程共用)
+            diff_threshold / keyframe_interval: 幀差閘門參數 (見 FrameGate)
+            ttl: 碼消失多少秒後再出現視為新的碼
+            engines: 解碼引擎 (None 則使用 QRDecoder.frame_engines())
+            strategies: 每幀嘗試的預處理策略
+        """
+        self.workers = workers
+        self.decoder_options = dict({'adaptive': False, 'stats_path': None, 'localize': False},
+                                    **(decoder_options or {}))
+        self.diff_threshold = diff_threshold
+        self.keyframe_interval = keyframe_interval
+        self.ttl = ttl
+        self.engines = engines
+        self.strategies = strategies
+        self._local = threading.local()
+        self.stats = {}
+
+    def _decoder(self):
+        decoder = getattr(self._local, 'decoder', None)
+        if decoder is None:
+            decoder = QRDecoder(**self.decoder_options)
+            self._local.decoder = decoder
+        return decoder
+
+    def _decode(self, frame):
+        return self._decoder().decode_frame(frame, strategies=self.strategies, engines=self.engines)
+
+    @staticmethod
+    def open(source):
+        """打開視頻源: 整數或純數字字串為攝像頭編號, 其餘為文件路徑或串流URL"""
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise ValueError(f"無法打開視頻源: {source}")
+        return capture, isinstance(source, int)
+
+    def scan(self, source, realtime=None):
+        """
+        掃描視頻源, 每個新出現的碼產出一個事件
+
+        Args:
+            source: 視頻文件、串流URL或攝像頭編號
+            realtime: True 時解碼線程全忙則丟棄當前幀 (適合攝像頭/直播, 延遲不累積);
+                      False 時等待, 每個通過幀差閘門的幀都會解碼 (適合視頻文件)。
+                      None 則攝像頭為 True, 其餘為 False
+
+        Yields:
+            {'data', 'timestamp' (秒, 視頻內時間或自開始掃描起的時間), 'wall_time', 'frame',
+             'engine', 'points', 'bbox'}
+        """
+        capture, is_camera = self.open(source)
+        if realtime is None:
+            realtime = is_camera
+        gate = FrameGate(self.diff_threshold, self.keyframe_interval)
+        tracker = CodeTracker(self.ttl)
+        stats = self.stats = {'frames': 0, 'decoded': 0, 'skipped': 0, 'dropped': 0, 'codes': 0}
+        pending = deque()
+        start = time.time()
+
+        def collect(future, frame_index, timestamp, wall_time):
+            results = future.result()
+            for result in tracker.update(results, timestamp):
+                stats['codes'] += 1
+                yield {
+                    'data': result['data'],
+                    'timestamp': round(timestamp, 3),
+                    'wall_time': wall_time,
+                    'frame': frame_index,
+                    'engine': result['engine'],
+                    'points': result.get('points'),
+                    'bbox': result.get('bbox'),
+                }
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='qr-video') as executor:
+                frame_index = -1
+                while True:
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    frame_index += 1
+                    stats['frames'] += 1
+                    wall_time = time.time()
+                    if is_camera:
+                        timestamp = wall_time - start
+                    else:
+                        timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+                    # 按提交順序取回已完成的結果, 追蹤器看到的時間單調遞增
+                    while pending and pending[0][0].done():
+                        yield from collect(*pending.popleft())
+
+                    if len(pending) >= self.workers:
+                        if realtime:
+                            stats['dropped'] += 1
+                            continue
+                        yield from collect(*pending.popleft())
+
+                    if not gate.should_process(frame):
+                        stats['skipped'] += 1
+                        continue
+                    stats['decoded'] += 1
+                    pending.append((executor.submit(self._decode, frame), frame_index, timestamp, wall_time))
+
+                while pending:
+                    yield from collect(*pending.popleft())
+        finally:
+            capture.release()
+            stats['elapsed'] = time.time() - start
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="QR碼視頻/攝像頭解碼 (每個新出現的碼輸出一行JSON)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('source', help="視頻文件、串流URL, 或攝像頭編號 (如 0)")
+    parser.add_argument('-o', '--output', help="結果輸出文件 (預設輸出到標準輸出)")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="解碼線程數 (預設4)")
+    parser.add_argument('--realtime', action='store_true', default=None,
+                        help="解碼跟不上時丟棄幀 (攝像頭預設開啟)")
+    parser.add_argument('--no-realtime', dest='realtime', action='store_false',
+                        help="每個有變化的幀都解碼 (視頻文件預設)")
+    parser.add_argument('--diff-threshold', type=float, default=2.0,
+                        help="幀差閘門閾值, 平均灰階差低於此值的幀被略過 (預設2.0, 0則每幀都解碼)")
+    parser.add_argument('--ttl', type=float, default=2.0, help="碼消失多少秒後再出現視為新的碼 (預設2秒)")
+    parser.add_argument('--engines', help="解碼引擎, 逗號分隔 (預設: 有 zxing-cpp 時只用 zxing)")
+    parser.add_argument('--stats', action='store_true', help="結束時在標準錯誤輸出幀率統計")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()] if args.engines else None
+    scanner = VideoScanner(workers=args.workers, diff_threshold=args.diff_threshold,
+                           ttl=args.ttl, engines=engines)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for event in scanner.scan(args.source, realtime=args.realtime):
+            out.write(json.dumps(event, ensure_ascii=False) + '\n')
+            out.flush()
+    except KeyboardInterrupt:
+        print("已中斷", file=sys.stderr)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.stats:
+        stats = scanner.stats
+        elapsed = stats.get('elapsed', 0)
+        fps = stats['frames'] / elapsed if elapsed > 0 else 0
+        print(f"讀取 {stats['frames']} 幀 ({fps:.1f} fps), 解碼 {stats['decoded']}, "
+              f"幀差略過 {stats['skipped']}, 丟棄 {stats['dropped']}, 新碼 {stats['codes']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
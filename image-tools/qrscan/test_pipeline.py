@@ -0,0 +1,76 @@
+"""
+預處理流水線測試: 融合後的流水線與逐步執行的結果逐像素相同
+
+執行: python -m pytest test_pipeline.py (或 python test_pipeline.py)
+"""
+import numpy as np
+import pytest
+
+from qr_core import ImagePreprocessor, PIPELINE_STEPS, STRATEGIES
+
+# 每條融合規則: 被融合的相鄰步驟 (前面加上 grayscale, 與實際策略相同)
+FUSION_RULES = [
+    ('brightness_adjust', 'contrast'),
+    ('invert', 'otsu'),
+]
+
+
+def _random_images(count=200, seed=0):
+    """大小、亮度與對比度各異的隨機灰階/彩色圖像 (含平滑區域, 使閾值附近有大量取整情況)"""
+    rng = np.random.RandomState(seed)
+    for _ in range(count):
+        height, width = rng.randint(16, 97, size=2)
+        channels = (3,) if rng.rand() < 0.5 else ()
+        low, high = sorted(rng.randint(0, 256, size=2))
+        image = rng.randint(low, high + 1, size=(height, width) + channels).astype(np.uint8)
+        if rng.rand() < 0.5:
+            image = np.ascontiguousarray(np.sort(image, axis=1))
+        yield image
+
+
+def _stepwise(preprocessor, image, methods):
+    """不經編譯, 逐步調用各方法 (每步分配新圖像)"""
+    for method in methods:
+        image = getattr(preprocessor, PIPELINE_STEPS[method][0])(image)
+    return image
+
+
+@pytest.mark.parametrize('rule', FUSION_RULES, ids='+'.join)
+def test_fusion_matches_stepwise(rule):
+    preprocessor = ImagePreprocessor()
+    methods = ('grayscale',) + rule
+    pipeline = preprocessor.compile(methods)
+    assert len(pipeline.steps) == 2, "規則未被融合"
+    # 單一灰階 (含全黑、全白) 的圖像是閾值類融合的邊界情況
+    uniform = [np.full((8, 8), value, np.uint8) for value in (0, 128, 255)]
+    for image in list(_random_images()) + uniform:
+        np.testing.assert_array_equal(pipeline.run(image), _stepwise(preprocessor, image, methods))
+
+
+def test_invert_binarize_not_fused():
+    """自適應閾值對均值取整, 反向閾值與先反色後二值化不完全相同, 因此不融合"""
+    pipeline = ImagePreprocessor().compile(['grayscale', 'invert', 'binarize'])
+    assert len(pipeline.steps) == 3
+
+
+@pytest.mark.parametrize('methods', [tuple(m) for m in STRATEGIES if m and 'perspective' not in m],
+                         ids='+'.join)
+def test_strategies_match_stepwise(methods):
+    """所有內建策略 (含暫存緩衝區的交替使用) 與逐步執行相同"""
+    preprocessor = ImagePreprocessor()
+    pipeline = preprocessor.compile(methods)
+    for image in _random_images(count=20, seed=1):
+        np.testing.assert_array_equal(pipeline.run(image), _stepwise(preprocessor, image, methods))
+
+
+def test_run_does_not_modify_input():
+    preprocessor = ImagePreprocessor()
+    image = next(_random_images(count=1))
+    original = image.copy()
+    for methods in STRATEGIES:
+        preprocessor.compile(methods).run(image)
+    np.testing.assert_array_equal(image, original)
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
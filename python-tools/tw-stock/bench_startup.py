@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+啟動時間基準測試
+
+以 `python -X importtime` 量測 `import main` 的耗時，並確認重型依賴
+(pandas / yfinance / google.generativeai) 沒有在啟動時被載入。
+
+用法:
+    python bench_startup.py            # 量測並與基準比較 (退步時 exit 1)
+    python bench_startup.py --save     # 量測並寫入新基準
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+BASELINE_FILE = PROJECT_ROOT / 'startup_baseline.json'
+
+# 啟動時不應載入的重型模組 (應在第一次使用時才載入)
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance', 'google.generativeai', 'requests', 'sqlalchemy')
+
+
+def measure_once(target: str = 'main') -> dict:
+    """
+    執行一次 `python -X importtime -c "import <target>"`
+
+    Returns:
+        {'wall_ms', 'import_ms', 'modules'}
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} 失敗:\n{proc.stderr[-2000:]}")
+
+    import_us = 0
+    modules = []
+    for line in proc.stderr.splitlines():
+        # 格式: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        name = name.strip()
+        modules.append(name)
+        if name == target:
+            import_us = int(cumulative)
+
+    return {'wall_ms': wall_ms, 'import_ms': import_us / 1000, 'modules': modules}
+
+
+def run_benchmark(runs: int = 5, target: str = 'main') -> dict:
+    """重複量測並取中位數 (第一次作為預熱不計入)"""
+    measure_once(target)
+    samples = [measure_once(target) for _ in range(runs)]
+
+    loaded = set(samples[-1]['modules'])
+    heavy_loaded = sorted(
+        m for m in loaded
+        if any(m == heavy or m.startswith(heavy + '.') for heavy in HEAVY_MODULES)
+    )
+
+    return {
+        'target': target,
+        'runs': runs,
+        'wall_ms': round(statistics.median(s['wall_ms'] for s in samples), 1),
+        'import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'module_count': len(loaded),
+        'heavy_loaded': heavy_loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="台股分析系統啟動時間基準測試")
+    parser.add_argument('--runs', type=int, default=5, help="量測次數 (取中位數)")
+    parser.add_argument('--save', action='store_true', help="將本次結果寫入基準檔")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允許超出基準的比例")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.runs)
+
+    print("=" * 60)
+    print("啟動時間基準測試")
+    print("=" * 60)
+    print(f"import main: {result['import_ms']:.1f} ms (中位數, {result['runs']} 次)")
+    print(f"進程總耗時: {result['wall_ms']:.1f} ms")
+    print(f"載入模組數: {result['module_count']}")
+
+    failed = False
+
+    if result['heavy_loaded']:
+        failed = True
+        print(f"❌ 啟動時載入了重型模組: {', '.join(result['heavy_loaded'])}")
+    else:
+        print("✅ 未載入重型模組")
+
+    if args.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"基準已保存到: {BASELINE_FILE.name}")
+    elif BASELINE_FILE.exists():
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        limit = baseline['import_ms'] * (1 + args.tolerance)
+        if result['import_ms'] > limit:
+            failed = True
+            print(f"❌ 啟動時間退步: {result['import_ms']:.1f} ms > 基準 {baseline['import_ms']:.1f} ms "
+                  f"(+{args.tolerance:.0%})")
+        else:
+            print(f"✅ 基準: {baseline['import_ms']:.1f} ms (容許 +{args.tolerance:.0%})")
+    else:
+        print("⚠️ 尚無基準，使用 --save 建立")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,16 @@
 """
 數據源基礎類
 """
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict, Any
-import pandas as pd
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
 from datetime import datetime, timedelta
 
+# pandas 只用於型別標註，實際在數據源取數時才載入
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class BaseFetcher(ABC):
     """
@@ -2,17 +2,26 @@
 """
 Yahoo Finance 台股數據源
 """
+from __future__ import annotations
+
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from datetime import datetime, timedelta
-import pandas as pd
-import yfinance as yf
 
 from .base import BaseFetcher
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
+def _yf():
+    """延遲載入 yfinance (連帶載入 pandas)，首次取數時才付出 import 成本"""
+    import yfinance as yf
+    return yf
+
+
 class YFinanceTaiwanFetcher(BaseFetcher):
     """
     Yahoo Finance 台股數據源
@@ -79,7 +88,8 @@ class YFinanceTaiwanFetcher(BaseFetcher):
             start_date = end_date - timedelta(days=days + 100)
             
             # 獲取數據
-            ticker = yf.Ticker(yf_code)
+            import pandas as pd
+            ticker = _yf().Ticker(yf_code)
             df = ticker.history(start=start_date, end=end_date)
             
             if df.empty:
@@ -144,7 +154,7 @@ class YFinanceTaiwanFetcher(BaseFetcher):
             yf_code = self._convert_code(stock_code)
             logger.info(f"獲取 {stock_code} ({yf_code}) 即時報價")
             
-            ticker = yf.Ticker(yf_code)
+            ticker = _yf().Ticker(yf_code)
             info = ticker.info
             
             # 獲取最新數據
@@ -199,7 +209,7 @@ class YFinanceTaiwanFetcher(BaseFetcher):
         """
         try:
             yf_code = self._convert_code(stock_code)
-            ticker = yf.Ticker(yf_code)
+            ticker = _yf().Ticker(yf_code)
             info = ticker.info
             
             return {
@@ -3,13 +3,19 @@
 台股智能分析系統 - 主程式
 """
 import sys
+import argparse
 import logging
+import multiprocessing
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
 from src.config import get_config
 from data_provider import DataFetcherManager, YFinanceTaiwanFetcher
 from src.analyzer import StockAnalyzer
+from src.report import ReportRenderer, RenderedReport
+from src.notification import NotificationService
+from src.news import NewsService
+from src.storage import AnalysisArchive
 
 # 配置日誌
 logging.basicConfig(
@@ -27,34 +33,70 @@ logger = logging.getLogger(__name__)
 class StockAnalysisApp:
     """台股分析應用主類"""
     
-    def __init__(self):
+    # 分片模式下每收到多少筆結果就寫入一次存檔
+    ARCHIVE_BATCH_SIZE = 50
+    
+    def __init__(self, worker: bool = False):
+        """
+        Args:
+            worker: 作為分片子進程使用，只初始化數據源與 AI 分析器；
+                    新聞、存檔、報告與推送統一由主進程負責
+        """
         # 載入配置
         self.config = get_config()
         
-        # 驗證配置
-        is_valid, errors = self.config.validate()
-        if not is_valid:
-            logger.error("配置驗證失敗:")
-            for error in errors:
-                logger.error(f"  {error}")
-            raise ValueError("配置不完整")
+        # 驗證配置 (子進程沿用主進程已驗證的配置)
+        if not worker:
+            is_valid, errors = self.config.validate()
+            if not is_valid:
+                logger.error("配置驗證失敗:")
+                for error in errors:
+                    logger.error(f"  {error}")
+                raise ValueError("配置不完整")
         
         # 初始化數據源管理器
         self.fetcher_manager = DataFetcherManager()
         self.fetcher_manager.add_fetcher(YFinanceTaiwanFetcher())
         
-        # 初始化 AI 分析器
-        self.analyzer = StockAnalyzer()
+        # AI 分析器在第一次分析時才建立 (僅數據模式下永不建立)
+        self._analyzer = None
+        
+        if worker:
+            self.news = None
+            return
+        
+        # 新聞檢索 (僅數據模式不需要)
+        self.news = NewsService() if not self.config.data_only else None
+        
+        # 歷史分析存檔
+        self.archive = AnalysisArchive(self.config.database_url)
+        
+        # 初始化報告渲染與推送
+        self.renderer = ReportRenderer(self.config.report_type)
+        self.notifier = NotificationService()
         
         logger.info("系統初始化完成")
         logger.info(f"數據源: {', '.join(self.fetcher_manager.available_fetchers)}")
+        logger.info(f"通知渠道: {', '.join(self.notifier.channel_names) or '無'}")
+        if self.config.data_only:
+            logger.info("僅數據模式: 跳過 AI 分析")
+        if self.config.workers > 1:
+            logger.info(f"分片模式: {self.config.workers} 個子進程")
+    
+    @property
+    def analyzer(self) -> StockAnalyzer:
+        """AI 分析器 (延遲初始化)"""
+        if self._analyzer is None:
+            self._analyzer = StockAnalyzer()
+        return self._analyzer
     
-    def analyze_stock(self, stock_code: str) -> Dict[str, Any]:
+    def analyze_stock(self, stock_code: str, news: Optional[str] = None) -> Dict[str, Any]:
         """
         分析單隻股票
         
         Args:
             stock_code: 股票代碼
+            news: 新聞摘要 (未提供時從新聞檢索服務取得)
             
         Returns:
             分析結果字典
@@ -67,7 +109,7 @@ class StockAnalysisApp:
             df, source = self.fetcher_manager.get_daily_data(stock_code, days=60)
             if df is None or df.empty:
                 logger.error(f"{stock_code} 無數據")
-                return {'success': False, 'error': '無數據'}
+                return {'success': False, 'code': stock_code, 'error': '無數據'}
             
             logger.info(f"獲取到 {len(df)} 天數據 (來源: {source})")
             
@@ -76,21 +118,27 @@ class StockAnalysisApp:
             
             # 3. 準備分析數據
             latest_data = df.iloc[-1].to_dict()
+            ma_status = self._check_ma_status(latest_data)
             
             analysis_data = {
                 'current': quote if quote else {},
                 'latest': latest_data,
-                'ma_status': self._check_ma_status(latest_data),
+                'ma_status': ma_status,
                 'history': df.tail(20).to_dict('records')
             }
             
-            # 4. AI 分析
+            # 4. AI 分析 (僅數據模式跳過)
             stock_name = quote.get('name', stock_code) if quote else stock_code
-            analysis = self.analyzer.analyze_stock(
-                stock_code=stock_code,
-                stock_name=stock_name,
-                data=analysis_data
-            )
+            analysis = None
+            if not self.config.data_only:
+                if news is None and self.news:
+                    news = self.news.get_news(stock_code)
+                analysis = self.analyzer.analyze_stock(
+                    stock_code=stock_code,
+                    stock_name=stock_name,
+                    data=analysis_data,
+                    news=news
+                )
             
             result = {
                 'success': True,
@@ -98,6 +146,8 @@ class StockAnalysisApp:
                 'name': stock_name,
                 'quote': quote,
                 'technical': latest_data,
+                'ma_status': ma_status,
+                'source': source,
                 'analysis': analysis
             }
             
@@ -106,7 +156,7 @@ class StockAnalysisApp:
             
         except Exception as e:
             logger.error(f"分析 {stock_code} 失敗: {e}", exc_info=True)
-            return {'success': False, 'error': str(e)}
+            return {'success': False, 'code': stock_code, 'error': str(e)}
     
     def _check_ma_status(self, data: Dict) -> Dict[str, Any]:
         """
@@ -160,53 +210,150 @@ class StockAnalysisApp:
         logger.info("=" * 60)
         
         results = []
+        pending = []
         
-        # 分析每隻股票
-        for stock_code in self.config.stock_list:
-            result = self.analyze_stock(stock_code)
-            results.append(result)
+        # 新聞在背景並行搜索，與行情取數重疊
+        if self.news:
+            self.news.prefetch(self.config.stock_list)
+        
+        # 分析每隻股票 (結果逐筆流回，分批存檔)
+        try:
+            for result in self._analyze_all(self.config.stock_list):
+                results.append(result)
+                pending.append(result)
+                if len(pending) >= self.ARCHIVE_BATCH_SIZE:
+                    self._archive(pending)
+                    pending = []
+        finally:
+            if self.news:
+                self.news.close()
         
-        # 生成匯總報告
-        self._print_summary(results)
+        self._archive(pending)
+        
+        # 分片模式下結果亂序到達，報告按自選股順序排列
+        order = {code: i for i, code in enumerate(self.config.stock_list)}
+        results.sort(key=lambda r: order.get(r.get('code'), len(order)))
+        
+        # 生成匯總報告 (只渲染一次，終端與各渠道共用)
+        report = self.renderer.render(results)
+        self._print_summary(report)
+        
+        # 推送到所有已配置的渠道
+        self.notifier.send_report(report)
         
         logger.info("=" * 60)
         logger.info("分析完成")
         
         return results
     
-    def _print_summary(self, results: List[Dict[str, Any]]):
-        """打印分析摘要"""
-        print("\n" + "=" * 60)
-        print("📊 台股分析報告")
-        print(f"時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 60)
-        
-        for result in results:
-            if not result.get('success'):
-                print(f"\n❌ {result.get('code', 'Unknown')}: {result.get('error', '未知錯誤')}")
-                continue
-            
-            code = result['code']
-            name = result['name']
-            quote = result.get('quote', {})
-            
-            print(f"\n📈 {name} ({code})")
-            print("-" * 60)
-            
-            if quote:
-                print(f"當前價格: {quote.get('price')} 元")
-                change_pct = quote.get('change_pct', 0)
-                change_symbol = "📈" if change_pct > 0 else "📉" if change_pct < 0 else "➡️"
-                print(f"漲跌幅: {change_symbol} {change_pct:+.2f}%")
-            
-            print(f"\n{result['analysis']}")
+    def _analyze_all(self, stock_codes: List[str]) -> Iterator[Dict[str, Any]]:
+        """依配置選擇單進程或多進程分片執行，逐筆產出結果"""
+        workers = min(self.config.workers, len(stock_codes))
+        if workers <= 1:
+            for stock_code in stock_codes:
+                yield self.analyze_stock(stock_code)
+            return
         
-        print("\n" + "=" * 60)
+        yield from self._analyze_sharded(stock_codes, workers)
+    
+    def _analyze_sharded(self, stock_codes: List[str], workers: int) -> Iterator[Dict[str, Any]]:
+        """
+        多進程分片執行
+        
+        每個子進程擁有自己的數據源、AI 分析器與緩存，指標計算不受主進程 GIL 限制；
+        股票代碼以 chunksize 為單位分片派發，結果以完成順序流回主進程
+        """
+        chunksize = max(1, len(stock_codes) // (workers * 4))
+        
+        # 新聞由主進程統一檢索 (已去重、截斷)，隨任務傳給子進程
+        tasks = (
+            (code, self.news.get_news(code) if self.news else None)
+            for code in stock_codes
+        )
+        
+        # 使用 spawn 避免在已有背景線程 (新聞檢索) 的進程中 fork
+        ctx = multiprocessing.get_context('spawn')
+        completed = 0
+        with ctx.Pool(
+            processes=workers,
+            initializer=_init_shard_worker,
+            initargs=(self.config.data_only,)
+        ) as pool:
+            for result in pool.imap_unordered(_analyze_in_worker, tasks, chunksize=chunksize):
+                completed += 1
+                if completed % 50 == 0 or completed == len(stock_codes):
+                    logger.info(f"分片進度: {completed}/{len(stock_codes)}")
+                yield result
+    
+    def _archive(self, results: List[Dict[str, Any]]):
+        """存檔 (失敗不影響報告推送)"""
+        if not results:
+            return
+        try:
+            self.archive.append_results(results)
+        except Exception as e:
+            logger.error(f"分析結果存檔失敗: {e}", exc_info=True)
+    
+    def _print_summary(self, report: RenderedReport):
+        """打印分析摘要"""
+        print("\n" + report.text)
+
+
+# ------------------------------------------------------------
+# 分片子進程
+# ------------------------------------------------------------
+
+_worker_app: Optional[StockAnalysisApp] = None
+
+
+def _init_shard_worker(data_only: bool):
+    """子進程初始化: 建立該進程專屬的數據源與 AI 分析器"""
+    global _worker_app
+    config = get_config()
+    config.data_only = data_only
+    _worker_app = StockAnalysisApp(worker=True)
+
+
+def _analyze_in_worker(task) -> Dict[str, Any]:
+    """子進程中分析單隻股票"""
+    stock_code, news = task
+    return _worker_app.analyze_stock(stock_code, news=news)
+
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description="台股智能分析系統")
+    parser.add_argument(
+        '--flush-outbox',
+        action='store_true',
+        help="只重送 outbox 中推送失敗的報告，不執行分析"
+    )
+    parser.add_argument(
+        '--data-only',
+        action='store_true',
+        help="僅數據模式: 只取行情與技術指標，不載入 AI SDK"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help="分片子進程數 (預設讀取 WORKERS，1 表示單進程)"
+    )
+    return parser.parse_args()
 
 
 def main():
     """主函數"""
+    args = parse_args()
     try:
+        if args.flush_outbox:
+            NotificationService().flush_outbox()
+            return
+        
+        if args.data_only:
+            get_config().data_only = True
+        if args.workers:
+            get_config().workers = args.workers
+        
         app = StockAnalysisApp()
         app.run()
     except KeyboardInterrupt:
@@ -4,7 +4,6 @@ AI 分析器模組 (使用 Google Gemini)
 """
 import logging
 from typing import Optional, Dict, Any
-import google.generativeai as genai
 from src.config import get_config
 
 logger = logging.getLogger(__name__)
@@ -15,6 +14,9 @@ class StockAnalyzer:
     股票 AI 分析器
     
     使用 Google Gemini 進行智能分析
+    
+    Gemini SDK 在第一次分析時才載入並配置，
+    沒有股票需要分析的執行 (如休市日) 不會付出 SDK 的啟動成本
     """
     
     def __init__(self):
@@ -23,11 +25,21 @@ class StockAnalyzer:
         if not config.gemini_api_key:
             raise ValueError("未配置 GEMINI_API_KEY")
         
-        # 配置 Gemini
-        genai.configure(api_key=config.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        
-        logger.info("AI 分析器初始化成功")
+        self._api_key = config.gemini_api_key
+        self._model = None
+    
+    @property
+    def model(self):
+        """Gemini 模型 (延遲初始化)"""
+        if self._model is None:
+            import google.generativeai as genai
+            
+            # 配置 Gemini
+            genai.configure(api_key=self._api_key)
+            self._model = genai.GenerativeModel('gemini-pro')
+            
+            logger.info("AI 分析器初始化成功")
+        return self._model
     
     def analyze_stock(
         self, 
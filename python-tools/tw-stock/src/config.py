@@ -29,10 +29,23 @@ class Config:
         self.email_sender = os.getenv('EMAIL_SENDER', '')
         self.email_password = os.getenv('EMAIL_PASSWORD', '')
         self.email_receivers = os.getenv('EMAIL_RECEIVERS', '')
+        self.email_smtp_server = os.getenv('EMAIL_SMTP_SERVER', '')
+        self.email_smtp_port = int(os.getenv('EMAIL_SMTP_PORT', '0') or 0)
+        self.notify_max_retries = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
         
         # 新聞搜索
         self.google_cse_key = os.getenv('GOOGLE_CSE_KEY', '')
         self.google_cse_id = os.getenv('GOOGLE_CSE_ID', '')
+        self.news_backend = os.getenv('NEWS_BACKEND', 'auto').lower()
+        self.news_stub_file = os.getenv('NEWS_STUB_FILE', '')
+        self.news_token_budget = int(os.getenv('NEWS_TOKEN_BUDGET', '600'))
+        self.news_max_results = int(os.getenv('NEWS_MAX_RESULTS', '5'))
+        
+        # 只取數據不做 AI 分析 (不載入 Gemini SDK，也不要求 GEMINI_API_KEY)
+        self.data_only = os.getenv('DATA_ONLY', 'false').lower() in ('1', 'true', 'yes')
+        
+        # 分片子進程數 (大量股票時按 CPU 核心數設定，1 表示單進程)
+        self.workers = max(1, int(os.getenv('WORKERS', '1')))
         
         # 進階配置
         self.report_type = os.getenv('REPORT_TYPE', 'simple')
@@ -41,6 +54,12 @@ class Config:
         
         # 項目根目錄
         self.project_root = Path(__file__).parent.parent
+        
+        # 待發送報告目錄 (推送失敗時保留，可重送)
+        self.outbox_dir = Path(os.getenv('OUTBOX_DIR', '') or self.project_root / 'outbox')
+        
+        # 新聞緩存目錄 (按日期/股票代碼存放)
+        self.news_cache_dir = Path(os.getenv('NEWS_CACHE_DIR', '') or self.project_root / 'cache' / 'news')
     
     def validate(self) -> tuple[bool, List[str]]:
         """
@@ -52,7 +71,7 @@ class Config:
         errors = []
         
         # 檢查 AI API Key
-        if not self.gemini_api_key:
+        if not self.gemini_api_key and not self.data_only:
             errors.append("❌ 未配置 GEMINI_API_KEY")
         
         # 檢查股票列表
@@ -76,7 +95,7 @@ class Config:
         return f"""
 配置摘要:
   股票列表: {', '.join(self.stock_list)}
-  AI 模型: {'✓ Gemini' if self.gemini_api_key else '✗ 未配置'}
+  AI 模型: {'- 僅數據模式' if self.data_only else '✓ Gemini' if self.gemini_api_key else '✗ 未配置'}
   通知渠道:
     - Line Notify: {'✓' if self.line_notify_token else '✗'}
     - Telegram: {'✓' if self.telegram_bot_token else '✗'}
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+新聞檢索模組
+
+為 AI 分析的 `news` 提示詞欄位準備市場情報:
+- 所有股票的搜索並行執行，與行情取數重疊，不增加串行延遲
+- 結果按 (股票代碼, 日期) 緩存到磁碟，同日重跑不重複搜索
+- 同一篇文章出現在多隻股票下時去重
+- 依 token 預算截斷後才放入提示詞
+"""
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import date
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from src.config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class SearchBackend:
+    """
+    搜索後端基類
+
+    search() 返回文章列表，每篇文章包含:
+    - title: 標題
+    - link: 連結
+    - snippet: 摘要
+    - source: 來源網站
+    """
+
+    name: str = "base"
+
+    def search(self, query: str, num: int = 5) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class GoogleCSEBackend(SearchBackend):
+    """Google Custom Search JSON API"""
+
+    name = "google"
+    api_url = "https://www.googleapis.com/customsearch/v1"
+
+    def __init__(self, api_key: str, cse_id: str, timeout: float = 10):
+        self.api_key = api_key
+        self.cse_id = cse_id
+        self.timeout = timeout
+
+    def search(self, query: str, num: int = 5) -> List[Dict[str, Any]]:
+        import requests
+        response = requests.get(
+            self.api_url,
+            params={
+                'key': self.api_key,
+                'cx': self.cse_id,
+                'q': query,
+                'num': min(num, 10),
+                'dateRestrict': 'd3',
+                'gl': 'tw',
+                'lr': 'lang_zh-TW',
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+        return [
+            {
+                'title': item.get('title', ''),
+                'link': item.get('link', ''),
+                'snippet': item.get('snippet', ''),
+                'source': item.get('displayLink', ''),
+            }
+            for item in response.json().get('items', [])
+        ]
+
+
+class StubSearchBackend(SearchBackend):
+    """
+    本地搜索後端 (離線測試用)
+
+    - 指定 fixture_path 時從 JSON 檔讀取 {股票代碼: [文章, ...]}
+    - 否則產生固定的假新聞，其中包含一篇所有股票共用的大盤新聞
+    """
+
+    name = "stub"
+
+    def __init__(self, fixture_path: Optional[str] = None, latency: float = 0.0):
+        self.latency = latency
+        self.fixtures: Dict[str, List[Dict[str, Any]]] = {}
+        if fixture_path:
+            with open(fixture_path, 'r', encoding='utf-8') as f:
+                self.fixtures = json.load(f)
+        self.calls = 0
+
+    def search(self, query: str, num: int = 5) -> List[Dict[str, Any]]:
+        import time
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        code = query.split()[0]
+        if self.fixtures:
+            return self.fixtures.get(code, [])[:num]
+
+        articles = [
+            {
+                'title': f"{code} 法說會釋出正向展望 第{i + 1}則",
+                'link': f"https://news.example.com/tw/{code}/{i + 1}?utm_source=stub",
+                'snippet': f"{code} 公布最新營運數據，市場關注後續動能。",
+                'source': 'news.example.com',
+            }
+            for i in range(max(num - 1, 0))
+        ]
+        articles.append({
+            'title': "台股大盤收盤速報",
+            'link': "https://news.example.com/tw/market/close",
+            'snippet': "加權指數今日震盪整理，成交量較前日略減。",
+            'source': 'news.example.com',
+        })
+        return articles[:num]
+
+
+def build_backend(config) -> Optional[SearchBackend]:
+    """
+    根據配置建立搜索後端
+
+    NEWS_BACKEND:
+    - auto: 有 GOOGLE_CSE_KEY/ID 時使用 Google，否則停用
+    - google / stub / none
+    """
+    backend = config.news_backend
+    if backend == 'stub':
+        return StubSearchBackend(config.news_stub_file or None)
+    if backend in ('google', 'auto') and config.google_cse_key and config.google_cse_id:
+        return GoogleCSEBackend(config.google_cse_key, config.google_cse_id)
+    if backend == 'google':
+        logger.warning("NEWS_BACKEND=google 但未配置 GOOGLE_CSE_KEY/GOOGLE_CSE_ID，停用新聞檢索")
+    return None
+
+
+def canonical_key(article: Dict[str, Any]) -> str:
+    """
+    文章去重用的鍵
+
+    去掉協議、www、追蹤參數與結尾斜線；無連結時使用正規化後的標題
+    """
+    link = article.get('link', '')
+    if link:
+        parts = urlsplit(link)
+        host = parts.netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parts.query)
+            if not k.startswith('utm_') and k not in ('fbclid', 'gclid')
+        ))
+        return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else '')
+
+    return re.sub(r'\s+', '', article.get('title', '')).lower()
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數: 中日韓文字每字約 1 token，其他字元約 4 字元 1 token"""
+    cjk = len(re.findall(r'[\u3000-\u9fff\uff00-\uffef]', text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class NewsService:
+    """
+    新聞檢索服務
+
+    用法:
+        news = NewsService()
+        news.prefetch(['2330', '2454'])   # 背景並行搜索
+        text = news.get_news('2330')      # 取得已去重、已截斷的新聞摘要
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SearchBackend] = None,
+        cache_dir: Optional[Path] = None,
+        token_budget: Optional[int] = None,
+        max_results: Optional[int] = None,
+        max_workers: int = 8
+    ):
+        config = get_config()
+        self.backend = backend if backend is not None else build_backend(config)
+        self.cache_dir = Path(cache_dir or config.news_cache_dir)
+        self.token_budget = token_budget or config.news_token_budget
+        self.max_results = max_results or config.news_max_results
+        self.max_workers = max_workers
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._resolved: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def prefetch(self, stock_codes: List[str]) -> None:
+        """在背景並行搜索所有股票的新聞"""
+        if not self.enabled:
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, min(self.max_workers, len(stock_codes))),
+                thread_name_prefix='news'
+            )
+
+        for code in stock_codes:
+            if code not in self._futures:
+                self._futures[code] = self._executor.submit(self._fetch, code)
+        self._resolved = None
+
+        logger.info(f"新聞檢索已在背景啟動 ({self.backend.name}, {len(self._futures)} 隻股票)")
+
+    def get_news(self, stock_code: str) -> Optional[str]:
+        """
+        取得單隻股票的新聞摘要
+
+        Args:
+            stock_code: 股票代碼
+
+        Returns:
+            已截斷到 token 預算的新聞文字，無新聞時返回 None
+        """
+        if not self.enabled:
+            return None
+
+        if stock_code not in self._futures:
+            self.prefetch([stock_code])
+
+        articles = self._resolve().get(stock_code, [])
+        return self._format(articles) if articles else None
+
+    def close(self) -> None:
+        """關閉背景線程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ------------------------------------------------------------
+    # 搜索與緩存
+    # ------------------------------------------------------------
+
+    def _cache_path(self, stock_code: str) -> Path:
+        return self.cache_dir / date.today().isoformat() / f"{stock_code}.json"
+
+    def _fetch(self, stock_code: str) -> List[Dict[str, Any]]:
+        """搜索單隻股票 (優先讀取當日緩存)"""
+        path = self._cache_path(stock_code)
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"{stock_code} 新聞緩存損壞，重新搜索: {e}")
+
+        try:
+            articles = self.backend.search(f"{stock_code} 股票 新聞", num=self.max_results)
+        except Exception as e:
+            logger.warning(f"{stock_code} 新聞搜索失敗: {e}")
+            return []
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(articles, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+        logger.info(f"{stock_code} 獲取 {len(articles)} 則新聞")
+        return articles
+
+    # ------------------------------------------------------------
+    # 去重與截斷
+    # ------------------------------------------------------------
+
+    def _resolve(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        等待所有搜索完成並做跨股票去重 (只計算一次)
+
+        搜索是並行的，等待時間為最慢的一次搜索，而非總和
+        """
+        if self._resolved is not None:
+            return self._resolved
+
+        raw = {code: future.result() for code, future in self._futures.items()}
+        self._resolved = self._deduplicate(raw)
+        return self._resolved
+
+    def _deduplicate(self, raw: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        去重規則:
+        - 同一股票下的重複文章只保留第一則
+        - 出現在多隻股票下的文章，只保留在標題/摘要提到該代碼的股票下；
+          都沒有提到的視為大盤泛新聞，不放入個股提示詞
+        """
+        owners: Dict[str, List[str]] = {}
+        unique: Dict[str, List[Dict[str, Any]]] = {}
+
+        for code, articles in raw.items():
+            seen = set()
+            unique[code] = []
+            for article in articles:
+                key = canonical_key(article)
+                if key in seen:
+                    continue
+                seen.add(key)
+                unique[code].append(article)
+                owners.setdefault(key, []).append(code)
+
+        resolved: Dict[str, List[Dict[str, Any]]] = {}
+        for code, articles in unique.items():
+            kept = []
+            for article in articles:
+                codes = owners[canonical_key(article)]
+                if len(codes) > 1:
+                    text = f"{article.get('title', '')} {article.get('snippet', '')}"
+                    if code not in text:
+                        continue
+                kept.append(article)
+            resolved[code] = kept
+
+        return resolved
+
+    def _format(self, articles: List[Dict[str, Any]]) -> Optional[str]:
+        """格式化為提示詞文字並截斷到 token 預算"""
+        lines = []
+        used = 0
+        for article in articles:
+            snippet = article.get('snippet', '').replace('\n', ' ').strip()
+            if len(snippet) > 120:
+                snippet = snippet[:120] + '…'
+            source = f" ({article['source']})" if article.get('source') else ''
+            line = f"- {article.get('title', '').strip()}{source}: {snippet}"
+
+            tokens = estimate_tokens(line)
+            if used + tokens > self.token_budget:
+                break
+            lines.append(line)
+            used += tokens
+
+        return "\n".join(lines) if lines else None
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+消息推送模組
+
+支援 Line Notify、Telegram、Email，所有已配置渠道並行推送。
+報告先寫入磁碟 outbox 再發送，發送失敗時保留在 outbox，
+之後可用 `python main.py --flush-outbox` 重送而不必重跑分析。
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from src.config import get_config, Config
+from src.report import RenderedReport
+
+logger = logging.getLogger(__name__)
+
+
+def split_message(text: str, limit: Optional[int]) -> List[str]:
+    """
+    將訊息切分為不超過 limit 字元的片段
+
+    優先在換行處切分，單行過長時才硬切
+
+    Args:
+        text: 原始訊息
+        limit: 單則訊息上限 (None 表示不限制)
+
+    Returns:
+        訊息片段列表
+    """
+    if not limit or len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        # 單行超長: 先送出目前累積的內容，再硬切該行
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        if len(current) + len(line) > limit:
+            chunks.append(current)
+            current = ''
+        current += line
+
+    if current:
+        chunks.append(current)
+
+    return [chunk.rstrip('\n') for chunk in chunks if chunk.strip()]
+
+
+class NotificationChannel:
+    """
+    通知渠道基類
+
+    子類需設定 name / format / max_length 並實現 send()
+    """
+
+    name: str = "base"
+    format: str = "text"              # 使用的報告格式: text / markdown / html
+    max_length: Optional[int] = None  # 單則訊息長度上限
+
+    def send(self, message: str, subject: str = '') -> None:
+        """發送單則訊息，失敗時拋出異常"""
+        raise NotImplementedError
+
+
+class LineNotifyChannel(NotificationChannel):
+    """Line Notify 推送"""
+
+    name = "line"
+    format = "text"
+    max_length = 1000
+    api_url = "https://notify-api.line.me/api/notify"
+
+    def __init__(self, token: str, timeout: float = 10):
+        self.token = token
+        self.timeout = timeout
+
+    def send(self, message: str, subject: str = '') -> None:
+        import requests
+        response = requests.post(
+            self.api_url,
+            headers={'Authorization': f'Bearer {self.token}'},
+            data={'message': message},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class TelegramChannel(NotificationChannel):
+    """
+    Telegram Bot 推送
+
+    以純文字發送 Markdown 報告，避免 AI 輸出中的符號導致 Telegram 解析失敗
+    """
+
+    name = "telegram"
+    format = "markdown"
+    max_length = 4096
+
+    def __init__(self, bot_token: str, chat_id: str, timeout: float = 10):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.timeout = timeout
+
+    def send(self, message: str, subject: str = '') -> None:
+        import requests
+        response = requests.post(
+            f"https://api.telegram.org/bot{self.bot_token}/sendMessage",
+            json={
+                'chat_id': self.chat_id,
+                'text': message,
+                'disable_web_page_preview': True
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class EmailChannel(NotificationChannel):
+    """Email (SMTP) 推送"""
+
+    name = "email"
+    format = "html"
+    max_length = None
+
+    # 常見信箱的 SMTP 伺服器
+    SMTP_SERVERS = {
+        'gmail.com': ('smtp.gmail.com', 465),
+        'outlook.com': ('smtp.office365.com', 587),
+        'hotmail.com': ('smtp.office365.com', 587),
+        'yahoo.com': ('smtp.mail.yahoo.com', 465),
+        'yahoo.com.tw': ('smtp.mail.yahoo.com', 465),
+    }
+
+    def __init__(
+        self,
+        sender: str,
+        password: str,
+        receivers: List[str],
+        smtp_server: str = '',
+        smtp_port: int = 0,
+        timeout: float = 30
+    ):
+        self.sender = sender
+        self.password = password
+        self.receivers = receivers or [sender]
+        self.timeout = timeout
+
+        domain = sender.split('@')[-1].lower()
+        default_server, default_port = self.SMTP_SERVERS.get(domain, (f"smtp.{domain}", 465))
+        self.smtp_server = smtp_server or default_server
+        self.smtp_port = smtp_port or default_port
+
+    def send(self, message: str, subject: str = '') -> None:
+        import smtplib
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject or "台股分析報告"
+        msg['From'] = self.sender
+        msg['To'] = ', '.join(self.receivers)
+        msg.attach(MIMEText(message, 'html', 'utf-8'))
+
+        if self.smtp_port == 465:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+            server.starttls()
+
+        try:
+            server.login(self.sender, self.password)
+            server.sendmail(self.sender, self.receivers, msg.as_string())
+        finally:
+            server.quit()
+
+
+def build_channels(config: Config) -> List[NotificationChannel]:
+    """根據配置建立所有已配置的通知渠道"""
+    channels: List[NotificationChannel] = []
+
+    if config.line_notify_token:
+        channels.append(LineNotifyChannel(config.line_notify_token))
+
+    if config.telegram_bot_token and config.telegram_chat_id:
+        channels.append(TelegramChannel(config.telegram_bot_token, config.telegram_chat_id))
+
+    if config.email_sender and config.email_password:
+        receivers = [r.strip() for r in config.email_receivers.split(',') if r.strip()]
+        channels.append(EmailChannel(
+            config.email_sender,
+            config.email_password,
+            receivers,
+            smtp_server=config.email_smtp_server,
+            smtp_port=config.email_smtp_port
+        ))
+
+    return channels
+
+
+class NotificationService:
+    """
+    通知服務
+
+    流程:
+    1. 報告按渠道格式切分後寫入 outbox (每個渠道一個 JSON 檔)
+    2. 各渠道並行發送，渠道內依序發送片段並帶重試
+    3. 全部片段發送成功後刪除 outbox 檔案；失敗則保留待重送
+    """
+
+    def __init__(
+        self,
+        channels: Optional[List[NotificationChannel]] = None,
+        outbox_dir: Optional[Path] = None,
+        max_retries: Optional[int] = None
+    ):
+        config = get_config()
+        self.channels = channels if channels is not None else build_channels(config)
+        self.outbox_dir = Path(outbox_dir or config.outbox_dir)
+        self.max_retries = max_retries or config.notify_max_retries
+
+    @property
+    def channel_names(self) -> List[str]:
+        """返回已配置渠道名稱列表"""
+        return [c.name for c in self.channels]
+
+    def send_report(self, report: RenderedReport) -> Dict[str, bool]:
+        """
+        推送報告到所有渠道
+
+        Args:
+            report: 已渲染的報告
+
+        Returns:
+            {渠道名稱: 是否成功}
+        """
+        if not self.channels:
+            logger.warning("未配置任何通知渠道，跳過推送")
+            return {}
+
+        entries = {self._enqueue(report, channel): channel.name for channel in self.channels}
+        outcome = self._deliver(list(entries))
+        return {entries[path]: ok for path, ok in outcome.items()}
+
+    def flush_outbox(self) -> Dict[str, bool]:
+        """
+        重送 outbox 中所有未完成的報告
+
+        Returns:
+            {outbox 檔名: 是否成功}
+        """
+        if not self.outbox_dir.exists():
+            return {}
+
+        entries = sorted(self.outbox_dir.glob('*.json'))
+        if not entries:
+            logger.info("outbox 為空，無需重送")
+            return {}
+
+        logger.info(f"重送 outbox 中 {len(entries)} 筆待發送報告")
+        return {path.name: ok for path, ok in self._deliver(entries).items()}
+
+    # ------------------------------------------------------------
+    # outbox
+    # ------------------------------------------------------------
+
+    def _enqueue(self, report: RenderedReport, channel: NotificationChannel) -> Path:
+        """將報告寫入 outbox"""
+        self.outbox_dir.mkdir(parents=True, exist_ok=True)
+        entry = {
+            'report_id': report.report_id,
+            'channel': channel.name,
+            'subject': f"{report.title} {report.created_at.strftime('%Y-%m-%d')}",
+            'chunks': split_message(report.get(channel.format), channel.max_length),
+            'sent': 0,
+            'attempts': 0,
+            'last_error': None,
+        }
+        path = self.outbox_dir / f"{report.report_id}_{channel.name}.json"
+        self._write_entry(path, entry)
+        return path
+
+    def _write_entry(self, path: Path, entry: Dict[str, Any]) -> None:
+        """原子寫入 outbox 檔案"""
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------
+    # 發送
+    # ------------------------------------------------------------
+
+    def _deliver(self, entries: List[Path]) -> Dict[Path, bool]:
+        """按渠道分組並行發送"""
+        channels = {c.name: c for c in self.channels}
+        groups: Dict[str, List[Path]] = {}
+
+        for path in entries:
+            with open(path, 'r', encoding='utf-8') as f:
+                channel_name = json.load(f)['channel']
+            if channel_name not in channels:
+                logger.warning(f"{path.name}: 渠道 {channel_name} 未配置，保留在 outbox")
+                continue
+            groups.setdefault(channel_name, []).append(path)
+
+        outcome: Dict[Path, bool] = {}
+        if not groups:
+            return outcome
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = [
+                executor.submit(self._deliver_channel, channels[name], paths)
+                for name, paths in groups.items()
+            ]
+            for future in futures:
+                outcome.update(future.result())
+
+        succeeded = sum(1 for ok in outcome.values() if ok)
+        logger.info(f"推送完成 ({time.time() - start:.2f}s): 成功 {succeeded}/{len(outcome)}")
+        return outcome
+
+    def _deliver_channel(self, channel: NotificationChannel, paths: List[Path]) -> Dict[Path, bool]:
+        """單一渠道依序發送其 outbox 檔案"""
+        return {path: self._deliver_entry(channel, path) for path in paths}
+
+    def _deliver_entry(self, channel: NotificationChannel, path: Path) -> bool:
+        """發送單個 outbox 檔案 (從上次成功的片段之後繼續)"""
+        from tenacity import Retrying, stop_after_attempt, wait_exponential
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+
+        chunks = entry['chunks']
+        while entry['sent'] < len(chunks):
+            chunk = chunks[entry['sent']]
+            try:
+                for attempt in Retrying(
+                    stop=stop_after_attempt(self.max_retries),
+                    wait=wait_exponential(multiplier=1, max=10),
+                    reraise=True
+                ):
+                    with attempt:
+                        entry['attempts'] += 1
+                        channel.send(chunk, subject=entry['subject'])
+            except Exception as e:
+                entry['last_error'] = str(e)
+                self._write_entry(path, entry)
+                logger.error(f"{channel.name} 推送失敗 ({entry['sent']}/{len(chunks)}): {e}")
+                return False
+
+            entry['sent'] += 1
+            self._write_entry(path, entry)
+
+        path.unlink()
+        logger.info(f"{channel.name} 推送成功 ({len(chunks)} 則)")
+        return True
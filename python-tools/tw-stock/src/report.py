@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+報告渲染模組
+
+將分析結果一次渲染為純文字、Markdown 與 HTML 三種格式，
+供終端輸出與各通知渠道共用
+"""
+import html
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+# 支援的報告類型
+REPORT_TYPES = ('simple', 'full')
+
+# 支援的輸出格式
+REPORT_FORMATS = ('text', 'markdown', 'html')
+
+
+class RenderedReport:
+    """
+    已渲染的報告
+
+    同一份分析結果的多種格式，渲染後不再變動
+    """
+
+    def __init__(self, report_id: str, title: str, created_at: datetime, contents: Dict[str, str]):
+        self.report_id = report_id
+        self.title = title
+        self.created_at = created_at
+        self.contents = contents
+
+    def get(self, fmt: str) -> str:
+        """取得指定格式的報告內容"""
+        if fmt not in self.contents:
+            raise ValueError(f"不支援的報告格式: {fmt}")
+        return self.contents[fmt]
+
+    @property
+    def text(self) -> str:
+        return self.contents['text']
+
+    @property
+    def markdown(self) -> str:
+        return self.contents['markdown']
+
+    @property
+    def html(self) -> str:
+        return self.contents['html']
+
+
+class ReportRenderer:
+    """
+    報告渲染器
+
+    - simple: 行情 + 均線狀態 + AI 結論段落
+    - full: 行情 + 技術指標 + 完整 AI 分析
+    """
+
+    def __init__(self, report_type: str = 'simple'):
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"不支援的報告類型: {report_type} (可選: {', '.join(REPORT_TYPES)})")
+        self.report_type = report_type
+
+    def render(self, results: List[Dict[str, Any]], created_at: Optional[datetime] = None) -> RenderedReport:
+        """
+        渲染分析結果
+
+        Args:
+            results: StockAnalysisApp.analyze_stock 的結果列表
+            created_at: 報告時間 (預設為現在)
+
+        Returns:
+            包含 text / markdown / html 的 RenderedReport
+        """
+        created_at = created_at or datetime.now()
+        title = "📊 台股分析報告"
+        contents = {
+            'text': self._render_text(title, created_at, results),
+            'markdown': self._render_markdown(title, created_at, results),
+            'html': self._render_html(title, created_at, results),
+        }
+        report_id = created_at.strftime('%Y%m%d-%H%M%S')
+        return RenderedReport(report_id, title, created_at, contents)
+
+    # ------------------------------------------------------------
+    # 共用欄位
+    # ------------------------------------------------------------
+
+    def _quote_lines(self, quote: Optional[Dict[str, Any]]) -> List[str]:
+        """行情欄位 (不含格式標記)"""
+        if not quote:
+            return []
+        change_pct = quote.get('change_pct') or 0
+        change_symbol = "📈" if change_pct > 0 else "📉" if change_pct < 0 else "➡️"
+        return [
+            f"當前價格: {quote.get('price')} 元",
+            f"漲跌幅: {change_symbol} {change_pct:+.2f}%",
+        ]
+
+    def _technical_lines(self, technical: Optional[Dict[str, Any]]) -> List[str]:
+        """技術指標欄位 (僅 full 報告)"""
+        if not technical:
+            return []
+        lines = []
+        for key, label in (('ma5', 'MA5'), ('ma10', 'MA10'), ('ma20', 'MA20'),
+                           ('ma60', 'MA60'), ('volume_ratio', '量比')):
+            value = technical.get(key)
+            if isinstance(value, (int, float)) and value == value:
+                lines.append(f"{label}: {value:.2f}")
+        return lines
+
+    def _analysis_body(self, analysis: Optional[str]) -> str:
+        """依報告類型截取 AI 分析內容"""
+        if not analysis:
+            return ''
+        analysis = analysis.strip()
+        if self.report_type == 'full':
+            return analysis
+        # simple: 只保留第一段 (通常為一句話結論)
+        return analysis.split('\n\n', 1)[0].strip()
+
+    # ------------------------------------------------------------
+    # 各格式渲染
+    # ------------------------------------------------------------
+
+    def _render_text(self, title: str, created_at: datetime, results: List[Dict[str, Any]]) -> str:
+        lines = ["=" * 60, title, f"時間: {created_at.strftime('%Y-%m-%d %H:%M:%S')}", "=" * 60]
+
+        for result in results:
+            if not result.get('success'):
+                lines.append(f"\n❌ {result.get('code', 'Unknown')}: {result.get('error', '未知錯誤')}")
+                continue
+
+            lines.append(f"\n📈 {result['name']} ({result['code']})")
+            lines.append("-" * 60)
+            lines.extend(self._quote_lines(result.get('quote')))
+
+            ma_status = result.get('ma_status') or {}
+            if ma_status.get('description'):
+                lines.append(f"均線狀態: {ma_status['description']}")
+
+            if self.report_type == 'full':
+                lines.extend(self._technical_lines(result.get('technical')))
+
+            body = self._analysis_body(result.get('analysis'))
+            if body:
+                lines.append(f"\n{body}")
+
+        lines.append("\n" + "=" * 60)
+        return "\n".join(lines)
+
+    def _render_markdown(self, title: str, created_at: datetime, results: List[Dict[str, Any]]) -> str:
+        lines = [f"# {title}", "", f"_時間: {created_at.strftime('%Y-%m-%d %H:%M:%S')}_"]
+
+        for result in results:
+            if not result.get('success'):
+                lines.append("")
+                lines.append(f"## ❌ {result.get('code', 'Unknown')}")
+                lines.append(f"{result.get('error', '未知錯誤')}")
+                continue
+
+            lines.append("")
+            lines.append(f"## {result['name']} ({result['code']})")
+            lines.extend(f"- {line}" for line in self._quote_lines(result.get('quote')))
+
+            ma_status = result.get('ma_status') or {}
+            if ma_status.get('description'):
+                lines.append(f"- 均線狀態: {ma_status['description']}")
+
+            if self.report_type == 'full':
+                lines.extend(f"- {line}" for line in self._technical_lines(result.get('technical')))
+
+            body = self._analysis_body(result.get('analysis'))
+            if body:
+                lines.append("")
+                lines.append(body)
+
+        return "\n".join(lines) + "\n"
+
+    def _render_html(self, title: str, created_at: datetime, results: List[Dict[str, Any]]) -> str:
+        esc = html.escape
+        parts = [
+            "<html><head><meta charset=\"utf-8\"></head><body>",
+            f"<h2>{esc(title)}</h2>",
+            f"<p><i>時間: {created_at.strftime('%Y-%m-%d %H:%M:%S')}</i></p>",
+        ]
+
+        for result in results:
+            if not result.get('success'):
+                parts.append(
+                    f"<h3>❌ {esc(str(result.get('code', 'Unknown')))}</h3>"
+                    f"<p>{esc(str(result.get('error', '未知錯誤')))}</p>"
+                )
+                continue
+
+            parts.append(f"<h3>{esc(str(result['name']))} ({esc(str(result['code']))})</h3>")
+
+            items = list(self._quote_lines(result.get('quote')))
+            ma_status = result.get('ma_status') or {}
+            if ma_status.get('description'):
+                items.append(f"均線狀態: {ma_status['description']}")
+            if self.report_type == 'full':
+                items.extend(self._technical_lines(result.get('technical')))
+            if items:
+                parts.append("<ul>" + "".join(f"<li>{esc(item)}</li>" for item in items) + "</ul>")
+
+            body = self._analysis_body(result.get('analysis'))
+            if body:
+                parts.append(f"<pre style=\"white-space: pre-wrap; font-family: inherit;\">{esc(body)}</pre>")
+
+        parts.append("</body></html>")
+        return "\n".join(parts)
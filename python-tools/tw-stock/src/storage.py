@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+數據存儲模組 - 歷史分析存檔
+
+每次執行的個股結果以只追加 (append-only) 方式寫入 DATABASE_URL 指定的數據庫:
+- 行情、技術指標快照、均線狀態、AI 分析 (zlib 壓縮)、數據源
+- 索引: (code, trade_date) 與 (signal, code, trade_date)
+- 前瞻報酬以之後第 N 筆存檔的收盤價計算，用於回測 AI 建議的命中率
+"""
+import json
+import logging
+import math
+import re
+import zlib
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+from src.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# AI 建議 -> 訊號
+SIGNAL_KEYWORDS = (
+    ('買入', 'buy'),
+    ('賣出', 'sell'),
+    ('觀望', 'hold'),
+)
+
+
+def extract_signal(analysis: Optional[str]) -> str:
+    """
+    從 AI 分析文字中提取操作訊號
+
+    優先讀取「操作方向」一行，否則取第一段中最先出現的關鍵詞
+
+    Returns:
+        buy / sell / hold / unknown
+    """
+    if not analysis:
+        return 'unknown'
+
+    match = re.search(r'操作方向\W*(買入|賣出|觀望)', analysis)
+    if match:
+        return dict(SIGNAL_KEYWORDS)[match.group(1)]
+
+    head = analysis.strip().split('\n\n', 1)[0]
+    positions = [(head.find(word), signal) for word, signal in SIGNAL_KEYWORDS if word in head]
+    return min(positions)[1] if positions else 'unknown'
+
+
+def _compact(data: Optional[Dict[str, Any]]) -> Optional[str]:
+    """將快照轉為緊湊 JSON (浮點數保留 4 位，NaN 轉為 null)"""
+    if not data:
+        return None
+
+    def convert(value):
+        if isinstance(value, float):
+            return None if math.isnan(value) or math.isinf(value) else round(value, 4)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if hasattr(value, 'item'):  # numpy 標量
+            return convert(value.item())
+        return value
+
+    return json.dumps({k: convert(v) for k, v in data.items()}, ensure_ascii=False, separators=(',', ':'))
+
+
+def _as_float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class AnalysisArchive:
+    """
+    歷史分析存檔
+
+    用法:
+        archive = AnalysisArchive()
+        archive.append_results(results)
+        rows = archive.query(code='2330', signal='buy', start=date(2026, 7, 1))
+        stats = archive.hit_rate(signal='buy', code='2330')
+    """
+
+    table_name = 'analysis_archive'
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url or get_config().database_url
+        self._engine = None
+        self._table = None
+
+    @property
+    def engine(self):
+        """數據庫引擎 (延遲建立，首次使用時建表)"""
+        if self._engine is None:
+            from sqlalchemy import create_engine
+
+            self._engine = create_engine(self.database_url)
+            self._table = self._define_table()
+            self._table.metadata.create_all(self._engine)
+        return self._engine
+
+    @property
+    def table(self):
+        self.engine
+        return self._table
+
+    def _define_table(self):
+        from sqlalchemy import (
+            MetaData, Table, Column, Integer, String, Float, Date, DateTime, Text, LargeBinary, Index
+        )
+
+        metadata = MetaData()
+        return Table(
+            self.table_name, metadata,
+            Column('id', Integer, primary_key=True, autoincrement=True),
+            Column('run_at', DateTime, nullable=False),
+            Column('trade_date', Date, nullable=False),
+            Column('code', String(16), nullable=False),
+            Column('name', String(64)),
+            Column('source', String(64)),
+            Column('signal', String(8), nullable=False),
+            Column('ma_status', String(16)),
+            Column('close', Float),
+            Column('change_pct', Float),
+            Column('quote', Text),
+            Column('technical', Text),
+            Column('analysis', LargeBinary),
+            Index('ix_archive_code_date', 'code', 'trade_date'),
+            Index('ix_archive_signal', 'signal', 'code', 'trade_date'),
+        )
+
+    # ------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------
+
+    def _to_row(self, result: Dict[str, Any], run_at: datetime) -> Dict[str, Any]:
+        quote = result.get('quote') or {}
+        technical = result.get('technical') or {}
+        ma_status = result.get('ma_status') or {}
+        analysis = result.get('analysis')
+
+        trade_date = technical.get('date')
+        if isinstance(trade_date, datetime):
+            trade_date = trade_date.date()
+        if not isinstance(trade_date, date):
+            trade_date = run_at.date()
+
+        close = _as_float(quote.get('price'))
+        if close is None:
+            close = _as_float(technical.get('close'))
+
+        return {
+            'run_at': run_at,
+            'trade_date': trade_date,
+            'code': result['code'],
+            'name': result.get('name'),
+            'source': result.get('source'),
+            'signal': extract_signal(analysis),
+            'ma_status': ma_status.get('status'),
+            'close': close,
+            'change_pct': _as_float(quote.get('change_pct')),
+            'quote': _compact(quote),
+            'technical': _compact(technical),
+            'analysis': zlib.compress(analysis.encode('utf-8'), 9) if analysis else None,
+        }
+
+    def append_results(self, results: List[Dict[str, Any]], run_at: Optional[datetime] = None) -> int:
+        """
+        追加一次執行的分析結果 (失敗的結果不存檔)
+
+        Args:
+            results: StockAnalysisApp.analyze_stock 的結果列表
+            run_at: 執行時間 (預設為現在)
+
+        Returns:
+            寫入筆數
+        """
+        run_at = run_at or datetime.now()
+        rows = [self._to_row(r, run_at) for r in results if r.get('success')]
+        if not rows:
+            return 0
+
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert(), rows)
+
+        logger.info(f"已存檔 {len(rows)} 筆分析結果")
+        return len(rows)
+
+    # ------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------
+
+    def query(
+        self,
+        code: Optional[str] = None,
+        signal: Optional[str] = None,
+        ma_status: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        forward_days: int = 5,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        查詢歷史分析與前瞻報酬
+
+        同一交易日多次執行只取最後一筆；前瞻報酬為之後第 forward_days 筆
+        存檔收盤價相對當日收盤價的漲跌幅 (%)，尚無足夠後續資料時為 None
+
+        Args:
+            code: 股票代碼
+            signal: buy / sell / hold / unknown
+            ma_status: bullish / bearish / neutral / unknown
+            start / end: 交易日區間 (含)
+            forward_days: 前瞻天數 (以存檔筆數計)
+            limit: 最多返回筆數 (按交易日新到舊)
+
+        Returns:
+            結果字典列表
+        """
+        from sqlalchemy import text, Date
+
+        # 代碼條件放在內層以利用 (code, trade_date) 索引；
+        # 日期與訊號條件放在外層，避免截掉計算前瞻報酬所需的後續資料
+        inner = ["1 = 1"]
+        outer = ["1 = 1"]
+        params: Dict[str, Any] = {'forward_days': forward_days}
+
+        if code:
+            inner.append("code = :code")
+            params['code'] = code
+        if signal:
+            outer.append("signal = :signal")
+            params['signal'] = signal
+        if ma_status:
+            outer.append("ma_status = :ma_status")
+            params['ma_status'] = ma_status
+        if start:
+            outer.append("trade_date >= :start")
+            params['start'] = start.isoformat()
+        if end:
+            outer.append("trade_date <= :end")
+            params['end'] = end.isoformat()
+
+        sql = f"""
+            WITH daily AS (
+                SELECT id, trade_date, code, name, signal, ma_status, close, change_pct,
+                       ROW_NUMBER() OVER (PARTITION BY code, trade_date ORDER BY id DESC) AS rn
+                FROM {self.table_name}
+                WHERE {' AND '.join(inner)}
+            ),
+            forward AS (
+                SELECT *,
+                       LEAD(close, :forward_days) OVER (PARTITION BY code ORDER BY trade_date) AS forward_close
+                FROM daily
+                WHERE rn = 1
+            )
+            SELECT id, trade_date, code, name, signal, ma_status, close, change_pct, forward_close
+            FROM forward
+            WHERE {' AND '.join(outer)}
+            ORDER BY trade_date DESC, code
+        """
+        if limit:
+            sql += " LIMIT :limit"
+            params['limit'] = limit
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql).columns(trade_date=Date), params).mappings().all()
+
+        records = []
+        for row in rows:
+            record = dict(row)
+            close, forward_close = record['close'], record.pop('forward_close')
+            record['forward_return'] = (
+                round((forward_close - close) / close * 100, 2)
+                if close and forward_close is not None else None
+            )
+            records.append(record)
+        return records
+
+    def hit_rate(
+        self,
+        signal: str = 'buy',
+        code: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        forward_days: int = 5
+    ) -> Dict[str, Any]:
+        """
+        計算訊號命中率
+
+        buy 命中: 前瞻報酬 > 0；sell 命中: 前瞻報酬 < 0；hold 命中: |前瞻報酬| < 2%
+
+        Returns:
+            {'signal', 'total', 'evaluated', 'hits', 'hit_rate', 'avg_return'}
+        """
+        records = self.query(code=code, signal=signal, start=start, end=end, forward_days=forward_days)
+        returns = [r['forward_return'] for r in records if r['forward_return'] is not None]
+
+        if signal == 'buy':
+            hits = sum(1 for r in returns if r > 0)
+        elif signal == 'sell':
+            hits = sum(1 for r in returns if r < 0)
+        else:
+            hits = sum(1 for r in returns if abs(r) < 2)
+
+        return {
+            'signal': signal,
+            'total': len(records),
+            'evaluated': len(returns),
+            'hits': hits,
+            'hit_rate': round(hits / len(returns) * 100, 2) if returns else None,
+            'avg_return': round(sum(returns) / len(returns), 2) if returns else None,
+        }
+
+    def get_analysis(self, record_id: int) -> Optional[str]:
+        """讀取單筆存檔的完整 AI 分析文字"""
+        from sqlalchemy import select
+
+        with self.engine.connect() as conn:
+            blob = conn.execute(
+                select(self.table.c.analysis).where(self.table.c.id == record_id)
+            ).scalar()
+        return zlib.decompress(blob).decode('utf-8') if blob else None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查詢歷史分析存檔")
+    parser.add_argument('--code', help="股票代碼")
+    parser.add_argument('--signal', default='buy', help="buy / sell / hold / unknown")
+    parser.add_argument('--days', type=int, default=90, help="回看天數")
+    parser.add_argument('--forward', type=int, default=5, help="前瞻天數")
+    args = parser.parse_args()
+
+    archive = AnalysisArchive()
+    start = date.today() - timedelta(days=args.days)
+
+    for record in archive.query(code=args.code, signal=args.signal, start=start, forward_days=args.forward):
+        forward = f"{record['forward_return']:+.2f}%" if record['forward_return'] is not None else 'N/A'
+        print(f"{record['trade_date']} {record['code']} {record['signal']:<5} "
+              f"收盤 {record['close']} -> {args.forward} 日後 {forward}")
+
+    stats = archive.hit_rate(signal=args.signal, code=args.code, start=start, forward_days=args.forward)
+    print(f"\n{args.signal} 訊號: 共 {stats['total']} 筆，可評估 {stats['evaluated']} 筆，"
+          f"命中率 {stats['hit_rate']}%，平均報酬 {stats['avg_return']}%")
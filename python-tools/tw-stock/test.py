@@ -123,6 +123,125 @@ def test_analyzer():
     print()
 
 
+def test_report():
+    """測試報告渲染與訊息切分 (離線)"""
+    print("=" * 60)
+    print("4. 測試報告渲染")
+    print("=" * 60)
+    
+    from src.report import ReportRenderer
+    from src.notification import split_message
+    
+    results = [
+        {
+            'success': True,
+            'code': '2330',
+            'name': '台積電',
+            'quote': {'price': 580, 'change_pct': 1.5},
+            'technical': {'ma5': 575, 'ma10': 570, 'ma20': 565, 'ma60': 560, 'volume_ratio': 1.2},
+            'ma_status': {'description': '✅ 多頭排列 (MA5 > MA10 > MA20)，乖離率 2.65%'},
+            'analysis': "一句話結論: 多頭趨勢明確，建議逢低布局\n\n" + "技術面分析...\n" * 300
+        },
+        {'success': False, 'code': '9999', 'error': '無數據'}
+    ]
+    
+    try:
+        for report_type in ('simple', 'full'):
+            report = ReportRenderer(report_type).render(results)
+            for fmt in ('text', 'markdown', 'html'):
+                content = report.get(fmt)
+                chunks = split_message(content, 1000)
+                assert all(len(chunk) <= 1000 for chunk in chunks)
+                print(f"✅ {report_type}/{fmt}: {len(content)} 字元, Line 切分 {len(chunks)} 則")
+        
+        print("\n精簡報告預覽:")
+        print(ReportRenderer('simple').render(results).text)
+    except Exception as e:
+        print(f"❌ 失敗: {e}")
+    
+    print()
+
+
+def test_news():
+    """測試新聞檢索 (使用本地 stub 後端，離線)"""
+    print("=" * 60)
+    print("5. 測試新聞檢索")
+    print("=" * 60)
+    
+    import tempfile
+    import time
+    from src.news import NewsService, StubSearchBackend
+    
+    codes = ['2330', '2454', '0050']
+    backend = StubSearchBackend(latency=0.2)
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            news = NewsService(backend=backend, cache_dir=cache_dir, token_budget=80)
+            start = time.time()
+            news.prefetch(codes)
+            texts = {code: news.get_news(code) for code in codes}
+            elapsed = time.time() - start
+            news.close()
+            
+            print(f"✅ {len(codes)} 隻股票搜索耗時 {elapsed:.2f}s (單次延遲 0.2s)")
+            assert all('大盤' not in (text or '') for text in texts.values()), "共用大盤新聞未去重"
+            print("✅ 跨股票共用新聞已去重")
+            print(f"\n2330 新聞:\n{texts['2330']}")
+            
+            # 同日第二次執行應命中緩存
+            news = NewsService(backend=backend, cache_dir=cache_dir)
+            news.prefetch(codes)
+            news.get_news('2330')
+            news.close()
+            assert backend.calls == len(codes), "緩存未命中"
+            print("✅ 當日緩存命中")
+    except Exception as e:
+        print(f"❌ 失敗: {e}")
+    
+    print()
+
+
+def test_archive():
+    """測試歷史分析存檔 (使用臨時 SQLite)"""
+    print("=" * 60)
+    print("6. 測試歷史分析存檔")
+    print("=" * 60)
+    
+    import os
+    import tempfile
+    from datetime import date, timedelta
+    from src.storage import AnalysisArchive
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive = AnalysisArchive(f"sqlite:///{os.path.join(tmp_dir, 'archive.db')}")
+            start = date(2026, 1, 5)
+            for i, price in enumerate([100, 102, 101, 105, 107, 110, 108]):
+                archive.append_results([{
+                    'success': True,
+                    'code': '2330',
+                    'name': '台積電',
+                    'quote': {'price': price, 'change_pct': 0.5},
+                    'technical': {'date': start + timedelta(days=i), 'close': price},
+                    'ma_status': {'status': 'bullish'},
+                    'analysis': "一句話結論: 趨勢向上，建議買入" if i % 2 == 0 else "觀望為宜"
+                }])
+            
+            rows = archive.query(code='2330', signal='buy', forward_days=5)
+            print(f"✅ buy 訊號 {len(rows)} 筆")
+            for row in rows:
+                print(f"  {row['trade_date']} 收盤 {row['close']} 5日報酬 {row['forward_return']}")
+            
+            stats = archive.hit_rate(signal='buy', code='2330', forward_days=5)
+            print(f"✅ 命中率: {stats['hit_rate']}% (可評估 {stats['evaluated']} 筆)")
+            archive.engine.dispose()
+    except Exception as e:
+        print(f"❌ 失敗: {e}")
+    
+    print()
+
+
 def main():
     """執行所有測試"""
     print("\n" + "=" * 60)
@@ -138,6 +257,15 @@ def main():
     # 3. 測試 AI 分析
     test_analyzer()
     
+    # 4. 測試報告渲染
+    test_report()
+    
+    # 5. 測試新聞檢索
+    test_news()
+    
+    # 6. 測試歷史分析存檔
+    test_archive()
+    
     print("=" * 60)
     print("測試完成")
     print("=" * 60)